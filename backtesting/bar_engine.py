@@ -0,0 +1,123 @@
+import numpy as np
+
+MAX_BARS   = 50          # how far ahead an open trade is followed
+CHUNK_CELLS = 4_000_000  # trades x bars evaluated per block (bounds memory)
+
+
+# === RESULT ===
+class BacktestResult:
+    __slots__ = ('entry_idx', 'direction', 'exit_idx', 'outcome', 'r', 'equity', 'max_drawdown')
+
+    def __init__(self, entry_idx, direction, exit_idx, outcome, r):
+        self.entry_idx = entry_idx
+        self.direction = direction
+        self.exit_idx = exit_idx     # bar of the SL/TP hit, -1 if neither within the window
+        self.outcome = outcome       # +1 TP, -1 SL, 0 unresolved
+        self.r = r                   # result in R multiples per trade
+        closed = r[outcome != 0]
+        self.equity = np.cumsum(closed)
+        self.max_drawdown = max_drawdown(self.equity)
+
+    @property
+    def trades(self):
+        return int(np.count_nonzero(self.outcome))
+
+    @property
+    def wins(self):
+        return int(np.count_nonzero(self.outcome > 0))
+
+    @property
+    def losses(self):
+        return int(np.count_nonzero(self.outcome < 0))
+
+    @property
+    def win_rate(self):
+        return self.wins / self.trades if self.trades else 0.0
+
+    @property
+    def net_r(self):
+        return float(self.equity[-1]) if len(self.equity) else 0.0
+
+    def __repr__(self):
+        return (f"BacktestResult(trades={self.trades}, win_rate={self.win_rate:.2%}, "
+                f"net_r={self.net_r:.2f}, max_dd={self.max_drawdown:.2f})")
+
+
+# === HELPERS ===
+def max_drawdown(equity, start=0.0):
+    """Largest peak-to-trough drop of an equity curve (same units as the curve)."""
+    if len(equity) == 0:
+        return 0.0
+    curve = np.concatenate(([start], np.asarray(equity, dtype=np.float64)))
+    return float((np.maximum.accumulate(curve) - curve).max())
+
+
+def signal_changes(signal):
+    """Bars where a non-zero signal starts or flips (risk.py's entry rule)."""
+    signal = np.asarray(signal)
+    prev = np.concatenate(([0], signal[:-1]))
+    return np.flatnonzero((signal != 0) & (signal != prev))
+
+
+# === FIRST TOUCH ===
+def first_touch(high, low, entry_idx, direction, sl, tp, max_bars=MAX_BARS):
+    """Exit bar and outcome of every trade at once.
+
+    Looks at bars entry+1 .. entry+max_bars. A bar that touches both levels
+    counts as a stop, matching the old loop that checked SL before TP.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    direction = np.asarray(direction)
+    sl = np.asarray(sl, dtype=np.float64)
+    tp = np.asarray(tp, dtype=np.float64)
+    n, m = len(high), len(entry_idx)
+    exit_idx = np.full(m, -1, dtype=np.int64)
+    outcome = np.zeros(m, dtype=np.int8)
+    if m == 0 or n == 0:
+        return exit_idx, outcome
+
+    offsets = np.arange(1, max_bars + 1)
+    step = max(1, CHUNK_CELLS // max_bars)
+    for a in range(0, m, step):
+        b = min(m, a + step)
+        idx = entry_idx[a:b, None] + offsets
+        valid = idx < n
+        idx = np.minimum(idx, n - 1)
+        hi, lo = high[idx], low[idx]
+        long_ = (direction[a:b] > 0)[:, None]
+        s, t = sl[a:b, None], tp[a:b, None]
+        sl_hit = valid & np.where(long_, lo <= s, hi >= s)
+        tp_hit = valid & np.where(long_, hi >= t, lo <= t)
+        any_sl, any_tp = sl_hit.any(axis=1), tp_hit.any(axis=1)
+        first_sl = np.where(any_sl, sl_hit.argmax(axis=1), max_bars)
+        first_tp = np.where(any_tp, tp_hit.argmax(axis=1), max_bars)
+        hit = first_sl <= first_tp
+        first = np.minimum(first_sl, first_tp)
+        resolved = first < max_bars
+        outcome[a:b] = np.where(resolved, np.where(hit, -1, 1), 0)
+        exit_idx[a:b] = np.where(resolved, entry_idx[a:b] + 1 + first, -1)
+    return exit_idx, outcome
+
+
+# === ENGINE ===
+def run_backtest(high, low, close, signal, sl, tp, max_bars=MAX_BARS, entries=None):
+    """Backtest bar signals (+1 buy / -1 sell / 0 flat) with per-bar SL/TP price arrays.
+
+    Entries fill at the signal bar's close. `entries` overrides which bars
+    trade (default: every non-zero signal bar).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    signal = np.asarray(signal)
+    entry_idx = np.flatnonzero(signal != 0) if entries is None else np.asarray(entries, dtype=np.int64)
+    direction = signal[entry_idx]
+    sl_e = np.asarray(sl, dtype=np.float64)[entry_idx]
+    tp_e = np.asarray(tp, dtype=np.float64)[entry_idx]
+    exit_idx, outcome = first_touch(high, low, entry_idx, direction, sl_e, tp_e, max_bars)
+
+    entry = close[entry_idx]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reward = np.abs(tp_e - entry) / np.abs(entry - sl_e)
+    r = np.where(outcome > 0, reward, np.where(outcome < 0, -1.0, 0.0))
+    return BacktestResult(entry_idx, direction, exit_idx, outcome, r)
@@ -0,0 +1,198 @@
+import os
+import sys
+import shutil
+import tempfile
+import itertools
+import time as ptime
+from concurrent.futures import ProcessPoolExecutor
+from datetime import time
+
+import numpy as np
+import pandas as pd
+
+from backtesting.vp_backtest import DEFAULTS, VPData, run_vp_backtest
+from indicators.volume_profile import calc_skew
+from tick_store import TickStore, bar_slices
+
+# === CONFIG ===
+SYMBOL      = "XAUUSDm"
+TIMEFRAME   = "M1"
+TRAIN_BARS  = 5 * 1440     # walk-forward: 5 days in, 1 day out
+TEST_BARS   = 1440
+METRIC      = 'net_usd'    # ranking column (trades exit on SL/TP, see vp_backtest's 'exit')
+SKEW_CHUNK  = 2000         # bars per profile task
+
+GRID = {
+    'price_step':       [0.01, 0.02, 0.05],
+    'atr_period':       [10, 14, 20],
+    'skew_threshold':   [0.05, 0.1, 0.15, 0.2],
+    'vol_spike_factor': [1.0, 1.25, 1.5, 2.0],
+    'trading_start':    [time(0, 0), time(7, 5)],
+    'trading_end':      [time(16, 0), time(20, 55)],
+}
+
+
+# === GRID / SPLITS ===
+def param_grid(grid):
+    """Every combination of a {name: [values]} grid, as parameter dicts."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def walk_forward_splits(n_bars, train_bars=TRAIN_BARS, test_bars=TEST_BARS, step=None):
+    """Rolling (train_lo, train_hi, test_lo, test_hi) bar windows; test follows train."""
+    step = step or test_bars
+    splits = []
+    lo = 0
+    while lo + train_bars + test_bars <= n_bars:
+        splits.append((lo, lo + train_bars, lo + train_bars, lo + train_bars + test_bars))
+        lo += step
+    return splits
+
+
+# === WORKERS ===
+# Ticks, bars and skews are written once as .npy files in a work directory and
+# memory-mapped read-only by every worker, so nothing big is pickled per task
+# and all processes share the same page cache.
+_data = None
+_workdir = None
+_loaded = set()
+
+
+def _skew_path(workdir, price_step):
+    return os.path.join(workdir, f"skew_{price_step!r}.npy")
+
+
+def _init_worker(workdir):
+    global _data, _workdir
+    _workdir = workdir
+    ticks = np.load(os.path.join(workdir, "ticks.npy"), mmap_mode='r')
+    bars = np.load(os.path.join(workdir, "bars.npy"), mmap_mode='r')
+    slices = np.load(os.path.join(workdir, "slices.npy"))
+    _data = VPData(bars, ticks, slices[0], slices[1])
+
+
+def _skew_chunk(price_step, lo, hi):
+    out = np.full(hi - lo, np.nan)
+    for k, i in enumerate(range(lo, hi)):
+        s, e = _data.tick_start[i], _data.tick_end[i]
+        if e > s:
+            skew = calc_skew(_data.ticks[s:e], price_step)
+            out[k] = np.nan if skew is None else skew
+    return price_step, lo, out
+
+
+def _evaluate(job):
+    combo_id, params, splits = job
+    step = params.get('price_step', DEFAULTS['price_step'])
+    if step not in _loaded:
+        _data.set_skews(step, np.load(_skew_path(_workdir, step), mmap_mode='r'))
+        _loaded.add(step)
+    rows = []
+    for k, (tr_lo, tr_hi, te_lo, te_hi) in enumerate(splits):
+        train = run_vp_backtest(_data, params, tr_lo, tr_hi)
+        test = run_vp_backtest(_data, params, te_lo, te_hi, ref=(tr_lo, tr_hi))
+        for name, res in (('train', train), ('test', test)):
+            rows.append({'combo': combo_id, 'split': k, 'set': name,
+                         **{m: res[m] for m in ('trades', 'win_rate', 'net_usd', 'avg_usd', 'max_dd')}})
+    return rows
+
+
+# === SWEEP ===
+def run_sweep(bars, ticks, grid=GRID, splits=None, workers=None, workdir=None):
+    """Evaluate every grid combination on every split in a process pool.
+
+    Returns (params DataFrame indexed by combo id, long results DataFrame
+    with one row per combo / split / train-or-test).
+    """
+    combos = param_grid(grid) if isinstance(grid, dict) else list(grid)
+    splits = walk_forward_splits(len(bars)) if splits is None else splits
+    if not splits:
+        raise ValueError(f"{len(bars)} bars is too short for one train/test split")
+    # same price_step next to each other, so chunks hit the same skew array
+    order = sorted(range(len(combos)), key=lambda i: combos[i].get('price_step', DEFAULTS['price_step']))
+    workers = workers or os.cpu_count()
+
+    own_dir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="vp_sweep_")
+    try:
+        starts, ends = bar_slices(ticks, bars['time'])
+        np.save(os.path.join(workdir, "ticks.npy"), np.ascontiguousarray(ticks))
+        np.save(os.path.join(workdir, "bars.npy"), np.ascontiguousarray(bars))
+        np.save(os.path.join(workdir, "slices.npy"), np.vstack((starts, ends)))
+
+        steps = sorted({c.get('price_step', DEFAULTS['price_step']) for c in combos})
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(workdir,)) as pool:
+            # 1) one volume profile per bar and price_step, split over the pool
+            skews = {s: np.full(len(bars), np.nan) for s in steps}
+            tasks = [(s, lo, min(lo + SKEW_CHUNK, len(bars))) for s in steps
+                     for lo in range(0, len(bars), SKEW_CHUNK)]
+            for s, lo, out in pool.map(_skew_chunk, *zip(*tasks)):
+                skews[s][lo:lo + len(out)] = out
+            for s, arr in skews.items():
+                np.save(_skew_path(workdir, s), arr)
+
+            # 2) combinations are pure array math on the shared arrays
+            jobs = [(i, combos[i], splits) for i in order]
+            chunk = max(1, len(jobs) // (workers * 8))
+            rows = [r for res in pool.map(_evaluate, jobs, chunksize=chunk) for r in res]
+    finally:
+        if own_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    params = pd.DataFrame(combos)
+    params.index.name = 'combo'
+    return params, pd.DataFrame(rows)
+
+
+def rank(params, results, metric=METRIC):
+    """One row per combination, best out-of-sample `metric` first."""
+    test = results[results['set'] == 'test'].groupby('combo')
+    train = results[results['set'] == 'train'].groupby('combo')
+    table = pd.DataFrame({
+        f'test_{metric}': test[metric].mean(),
+        f'test_{metric}_std': test[metric].std(),
+        'test_trades': test['trades'].sum(),
+        'test_win_rate': test['win_rate'].mean(),
+        'test_max_dd': test['max_dd'].max(),
+        f'train_{metric}': train[metric].mean(),
+        'splits_positive': test[metric].apply(lambda v: (v > 0).mean()),
+    })
+    table = params.join(table)
+    return table.sort_values(f'test_{metric}', ascending=False)
+
+
+def walk_forward(params, results, metric=METRIC):
+    """Per split: the combination that was best in-sample and how it did out-of-sample."""
+    rows = []
+    for k, res in results.groupby('split'):
+        train = res[res['set'] == 'train'].set_index('combo')
+        test = res[res['set'] == 'test'].set_index('combo')
+        best = train[metric].idxmax()
+        rows.append({'split': k, 'combo': best, f'train_{metric}': train.at[best, metric],
+                     f'test_{metric}': test.at[best, metric], 'test_trades': test.at[best, 'trades']})
+    return pd.DataFrame(rows).set_index('split').join(params, on='combo')
+
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    store = TickStore()
+    bars = store.last_bars(SYMBOL, TIMEFRAME, days * 1440)
+    if len(bars) == 0:
+        raise SystemExit(f"No {TIMEFRAME} bars for {SYMBOL} in MT5 or the local cache")
+    ticks = store.ticks(SYMBOL, int(bars['time'][0]), int(bars['time'][-1]) + 60)
+
+    t0 = ptime.perf_counter()
+    params, results = run_sweep(bars, ticks)
+    table = rank(params, results)
+    wf = walk_forward(params, results)
+    elapsed = ptime.perf_counter() - t0
+
+    pd.set_option('display.width', 200)
+    print(f"\n📊 {len(params)} combinations x {results['split'].nunique()} splits in {elapsed:.1f}s"
+          f" ({DEFAULTS['exit']} exits)")
+    print(table.head(20).to_string())
+    print("\nWalk-forward (best in-sample per split):")
+    print(wf.to_string())
+    print(f"Out-of-sample total: ${wf[f'test_{METRIC}'].sum():.2f}")
+    table.to_csv("sweep_results.csv")
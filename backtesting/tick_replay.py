@@ -0,0 +1,252 @@
+import time as ptime
+
+import numpy as np
+import pandas as pd
+
+from backtesting.bar_engine import max_drawdown
+from indicators.atr import calculate_atr
+from indicators.volume_profile import calc_volume_profile
+from strategy.vp_recovery import PARAMS, entry_side, cluster_ratios, manage_positions
+from sessions import window
+from indicators.volume_baseline import volume_baselines
+from tick_store import bar_slices, bars_from_ticks
+
+# === BROKER MODEL ===
+POINT          = 0.001   # XAUUSDm
+CONTRACT_SIZE  = 100     # 1.00 lot = 100 oz, so 0.01 lot = 1 oz
+HISTORY_BARS   = 200     # bars replayed only to warm up ATR and the tick-volume baseline
+
+RETCODE_DONE          = 10009
+RETCODE_REQUOTE       = 10004
+RETCODE_INVALID_STOPS = 10016
+RETCODE_POSITION_GONE = 10036
+
+
+class Position:
+    __slots__ = ('ticket', 'is_buy', 'volume', 'price_open', 'sl', 'open_msc')
+
+    def __init__(self, ticket, is_buy, volume, price_open, open_msc):
+        self.ticket = ticket
+        self.is_buy = is_buy
+        self.volume = volume
+        self.price_open = price_open
+        self.sl = 0.0
+        self.open_msc = open_msc
+
+
+class ReplayResult:
+    __slots__ = ('deals', 'n_ticks', 'elapsed')
+
+    def __init__(self, deals, n_ticks, elapsed):
+        self.deals = deals
+        self.n_ticks = n_ticks
+        self.elapsed = elapsed
+
+    @property
+    def closes(self):
+        return self.deals[self.deals['action'].isin(('CLOSE', 'SL', 'END'))]
+
+    def summary(self):
+        closes = self.closes
+        pnl = closes['pnl'].to_numpy()
+        equity = np.cumsum(pnl)
+        return {
+            'entries': int((self.deals['action'] == 'OPEN').sum()),
+            'closed': len(closes),
+            'win_rate': float((pnl > 0).mean()) if len(pnl) else 0.0,
+            'net_pnl': float(equity[-1]) if len(equity) else 0.0,
+            'max_drawdown': max_drawdown(equity),
+            'sl_modifications': int((self.deals['action'] == 'SLTP').sum()),
+            'rejects': int((self.deals['retcode'] != RETCODE_DONE).sum()),
+            'ticks_per_minute': self.n_ticks / self.elapsed * 60 if self.elapsed > 0 else float('inf'),
+        }
+
+
+# === REPLAY ===
+# Streams a tick array through the vpt-bot2 decision rules. Decisions happen on
+# the first tick after each bar closes (like the streaming live bot); orders
+# reach the "server" latency_ms later and fill at that tick's bid/ask, or are
+# requoted when the price moved more than `deviation` points. Stops are checked
+# vectorised over the ticks between events.
+class TickReplay:
+    def __init__(self, ticks, params=None, bars=None, point=POINT, contract_size=CONTRACT_SIZE,
+                 latency_ms=0, slippage_points=0, history_bars=HISTORY_BARS):
+        self.p = {**PARAMS, **(params or {})}
+        self.ticks = ticks
+        self.bars = bars_from_ticks(ticks) if bars is None else bars
+        self.point = point
+        self.contract_size = contract_size
+        self.latency_ms = latency_ms
+        self.slippage = slippage_points * point
+        self.history_bars = history_bars
+
+        self.msc = np.ascontiguousarray(ticks['time_msc'], dtype=np.int64)
+        self.bid = np.ascontiguousarray(ticks['bid'], dtype=np.float64)
+        self.ask = np.ascontiguousarray(ticks['ask'], dtype=np.float64)
+        self.book = []
+        self.pending = []      # (due_msc, seq, kind, payload)
+        self.deals = []
+        self.cursor = 0
+        self._ticket = 0
+        self._seq = 0
+
+    # --- order flow ---
+    def _submit(self, now_msc, kind, payload):
+        self.pending.append((now_msc + self.latency_ms, self._seq, kind, payload))
+        self._seq += 1
+
+    def _log(self, i, action, ticket, is_buy, volume, price, pnl=0.0, comment='', retcode=RETCODE_DONE):
+        self.deals.append((int(self.msc[i]), action, ticket, 'BUY' if is_buy else 'SELL',
+                           volume, price, pnl, comment, retcode))
+
+    def _close(self, i, pos, price, volume, action, comment):
+        sign = 1 if pos.is_buy else -1
+        pnl = (price - pos.price_open) * sign * volume * self.contract_size
+        self._log(i, action, pos.ticket, pos.is_buy, volume, price, pnl, comment)
+        pos.volume = round(pos.volume - volume, 8)
+        if pos.volume <= 0:
+            self.book.remove(pos)
+
+    def _fill(self, i, kind, payload):
+        dev = self.p['deviation'] * self.point
+        if kind == 'OPEN':
+            is_buy, volume, requested, comment = payload
+            price = self.ask[i] + self.slippage if is_buy else self.bid[i] - self.slippage
+            if abs(price - requested) > dev:
+                self._log(i, 'REJECT', 0, is_buy, volume, price, comment=comment, retcode=RETCODE_REQUOTE)
+                return
+            self._ticket += 1
+            self.book.append(Position(self._ticket, is_buy, volume, price, int(self.msc[i])))
+            self._log(i, 'OPEN', self._ticket, is_buy, volume, price, comment=comment)
+        elif kind == 'SLTP':
+            ticket, sl = payload
+            pos = next((p for p in self.book if p.ticket == ticket), None)
+            if pos is None:
+                return
+            if (pos.is_buy and sl >= self.bid[i]) or (not pos.is_buy and sl <= self.ask[i]):
+                self._log(i, 'REJECT', ticket, pos.is_buy, pos.volume, sl, comment='SLTP', retcode=RETCODE_INVALID_STOPS)
+                return
+            pos.sl = sl
+            self._log(i, 'SLTP', ticket, pos.is_buy, pos.volume, sl)
+        elif kind == 'CLOSE':
+            ticket, volume, requested, comment = payload
+            pos = next((p for p in self.book if p.ticket == ticket), None)
+            if pos is None:
+                self._log(i, 'REJECT', ticket, True, volume, requested, comment=comment, retcode=RETCODE_POSITION_GONE)
+                return
+            price = self.bid[i] - self.slippage if pos.is_buy else self.ask[i] + self.slippage
+            if abs(price - requested) > dev:
+                self._log(i, 'REJECT', ticket, pos.is_buy, volume, price, comment=comment, retcode=RETCODE_REQUOTE)
+                return
+            self._close(i, pos, price, min(volume, pos.volume), 'CLOSE', comment)
+
+    def _stops(self, start, stop):
+        # first stop-out tick per position inside ticks [start, stop)
+        hits = []
+        for pos in self.book:
+            if not pos.sl or start >= stop:
+                continue
+            touched = self.bid[start:stop] <= pos.sl if pos.is_buy else self.ask[start:stop] >= pos.sl
+            j = int(np.argmax(touched))
+            if touched[j]:
+                hits.append((start + j, pos))
+        for i, pos in sorted(hits, key=lambda h: h[0]):
+            price = self.bid[i] if pos.is_buy else self.ask[i]
+            self._close(i, pos, price, pos.volume, 'SL', 'stop loss')
+
+    def advance(self, until):
+        """Run server-side events (order arrivals, stop-outs) for ticks [cursor, until)."""
+        self.pending.sort()
+        while self.pending:
+            due = self.pending[0][0]
+            i = int(np.searchsorted(self.msc, due, side='left'))
+            if i >= until:
+                break
+            self._stops(self.cursor, i)
+            self.cursor = i
+            _, _, kind, payload = self.pending.pop(0)
+            self._fill(i, kind, payload)
+        self._stops(self.cursor, until)
+        self.cursor = until
+
+    # --- strategy ---
+    def _decide(self, k, j, tick_thresh, starts, ends):
+        p = self.p
+        bar = self.bars[k]
+        vp = calc_volume_profile(self.ticks[starts[k]:ends[k]], p['price_step'])
+        if vp is None:
+            return
+        side = entry_side(vp.skew, bar['tick_volume'], tick_thresh, p['skew_threshold'])
+        if side is None:
+            return
+        now = int(self.msc[j])
+        bid, ask = self.bid[j], self.ask[j]
+        if len(self.book) < p['max_positions']:
+            self._submit(now, 'OPEN', (side == 'BUY', p['lot_size'], ask if side == 'BUY' else bid, 'VP_MULTI_ENTRY'))
+
+        w0 = int(np.searchsorted(self.msc, now - p['cluster_window'] * 1000, side='left'))
+        window = self.ticks[w0:min(w0 + 100, j + 1)]
+        book = list(self.book)
+        if not book:
+            return
+        is_buy = np.array([pos.is_buy for pos in book])
+        price_open = np.array([pos.price_open for pos in book])
+        clusters = cluster_ratios(window, price_open, is_buy)
+        new_sl, reasons = manage_positions(
+            is_buy, price_open, bid, ask, vp.poc, self.point, clusters,
+            p['trail_trigger'], p['trail_buffer'], p['recovery_zone'], p['volume_cluster_ratio'])
+        for pos, sl, reason in zip(book, new_sl, reasons):
+            if not np.isnan(sl):
+                self._submit(now, 'SLTP', (pos.ticket, float(sl)))
+            if reason:
+                self._submit(now, 'CLOSE', (pos.ticket, pos.volume, bid if pos.is_buy else ask, reason))
+
+    def run(self):
+        t0 = ptime.perf_counter()
+        bars, n = self.bars, len(self.msc)
+        starts, ends = bar_slices(self.ticks, bars['time'])
+        atr = calculate_atr(bars, self.p['atr_period'])
+        # tick-count baseline of each bar from the bars before it, as the live bot keeps it
+        tick_thresh = volume_baselines(bars['time'], bars['tick_volume']) * self.p['vol_spike_factor']
+        # bars out of session, without ATR or under the volume threshold never reach the profile
+        eligible = window(self.p['trading_start'], self.p['trading_end']).mask(bars['time']) & ~np.isnan(atr) \
+            & (bars['tick_volume'] >= tick_thresh)
+        first = min(self.history_bars, len(bars))
+        self.cursor = int(starts[first]) if first < len(bars) else n
+
+        for k in range(first, len(bars)):
+            j = int(ends[k])          # first tick after bar k closed
+            if j >= n:
+                break
+            self.advance(j)
+            if eligible[k]:
+                self._decide(k, j, tick_thresh[k], starts, ends)
+        self.advance(n)
+        for pos in list(self.book):
+            price = self.bid[n - 1] if pos.is_buy else self.ask[n - 1]
+            self._close(n - 1, pos, price, pos.volume, 'END', 'end of data')
+
+        deals = pd.DataFrame(self.deals, columns=['time_msc', 'action', 'ticket', 'side', 'volume',
+                                                  'price', 'pnl', 'comment', 'retcode'])
+        return ReplayResult(deals, n - int(starts[first]) if first < len(bars) else 0,
+                            ptime.perf_counter() - t0)
+
+
+def replay_vp_recovery(ticks, params=None, **kwargs):
+    return TickReplay(ticks, params, **kwargs).run()
+
+
+if __name__ == "__main__":
+    import sys
+    from tick_store import TickStore
+
+    symbol = "XAUUSDm"
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    end = int(ptime.time()) // 86400 * 86400
+    ticks = TickStore().ticks(symbol, end - days * 86400, end)
+    if len(ticks) == 0:
+        raise SystemExit(f"No cached ticks for {symbol}")
+    res = replay_vp_recovery(ticks, latency_ms=50, slippage_points=1)
+    print(f"\n📊 Tick replay {symbol}: {len(ticks):,} ticks in {res.elapsed:.1f}s")
+    for k, v in res.summary().items():
+        print(f"{k:18s}{v:,.4f}" if isinstance(v, float) else f"{k:18s}{v}")
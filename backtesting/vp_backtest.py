@@ -0,0 +1,166 @@
+from datetime import time
+
+import numpy as np
+
+from backtesting.bar_engine import max_drawdown, first_touch, MAX_BARS
+from indicators.atr import atr as atr_values
+from indicators.volume_profile import calc_skew
+from sessions import window, spread_mask
+from indicators.volume_baseline import volume_baselines
+
+# backtest.py's volume-profile skew strategy as a function of its parameters,
+# so single runs and parameter sweeps share one implementation.
+DEFAULTS = {
+    'price_step':       0.01,       # volume profile bin size
+    'atr_period':       14,
+    'skew_threshold':   0.1,        # minimum absolute skew to consider
+    'vol_spike_factor': 1.5,        # bar volume > factor * its time-of-day baseline
+    'trading_start':    time(7, 5), # UTC
+    'trading_end':      time(20, 55),
+    'lot_size':         0.1,
+    'spread_pctl':      None,       # skip bars whose spread is above this rolling percentile (None: off)
+    'exit':             'atr',      # 'atr': SL/TP from the next bar's open; 'bar_range': in-bar best price (upper bound)
+    'sl_atr':           1.0,        # stop distance in ATRs of the signal bar
+    'tp_atr':           1.0,        # target distance in ATRs of the signal bar
+    'max_bars':         MAX_BARS,   # bars a trade is followed before it is closed at market
+}
+
+
+# === DATA ===
+# Bars plus their tick slices. Per-bar skews (per price_step), ATR (per
+# period) and the session and spread masks are computed on first use and
+# cached, so a sweep pays for each profile once no matter how many
+# combinations reuse it.
+class VPData:
+    def __init__(self, bars, ticks, tick_start, tick_end):
+        self.bars = bars
+        self.ticks = ticks
+        self.tick_start = np.asarray(tick_start, dtype=np.int64)
+        self.tick_end = np.asarray(tick_end, dtype=np.int64)
+        vol_cum = np.concatenate(([0.0], np.cumsum(ticks['volume'], dtype=np.float64)))
+        self.bar_vol = vol_cum[self.tick_end] - vol_cum[self.tick_start]
+        self.time = np.asarray(bars['time'], dtype=np.int64)
+        self.high = np.ascontiguousarray(bars['high'], dtype=np.float64)
+        self.low = np.ascontiguousarray(bars['low'], dtype=np.float64)
+        self.open = np.ascontiguousarray(bars['open'], dtype=np.float64)
+        self.close = np.ascontiguousarray(bars['close'], dtype=np.float64)
+        self._atr = {}
+        self._vol_base = None
+        self._session = {}
+        self._spread = {}
+        self._skew = {}
+        self._skew_done = {}
+
+    def __len__(self):
+        return len(self.bars)
+
+    def atr(self, period):
+        if period not in self._atr:
+            self._atr[period] = atr_values(self.high, self.low, self.close, period)
+        return self._atr[period]
+
+    def vol_baseline(self):
+        """Each bar's time-of-day volume baseline from the bars before it (what the live bots compare with)."""
+        if self._vol_base is None:
+            self._vol_base = volume_baselines(self.time, self.bar_vol)
+        return self._vol_base
+
+    def in_session(self, start, end):
+        if (start, end) not in self._session:
+            self._session[(start, end)] = window(start, end).mask(self.time)
+        return self._session[(start, end)]
+
+    def spread_ok(self, pctl):
+        """Bars whose closing spread (last tick's ask - bid) is within the rolling pctl of the bars before."""
+        if pctl not in self._spread:
+            last = np.maximum(self.tick_end - 1, 0)
+            spread = np.where(self.tick_end > self.tick_start,
+                              self.ticks['ask'][last] - self.ticks['bid'][last], np.nan)
+            self._spread[pctl] = spread_mask(spread, pctl=pctl)
+        return self._spread[pctl]
+
+    def set_skews(self, price_step, skews):
+        """Use precomputed per-bar skews for `price_step` (e.g. from a sweep)."""
+        self._skew[price_step] = skews
+        self._skew_done[price_step] = np.ones(len(self.bars), dtype=bool)
+
+    def skews(self, price_step, idx):
+        """Skew of bars `idx` (NaN when a bar has no ticks)."""
+        if price_step not in self._skew:
+            self._skew[price_step] = np.full(len(self.bars), np.nan)
+            self._skew_done[price_step] = np.zeros(len(self.bars), dtype=bool)
+        cache, done = self._skew[price_step], self._skew_done[price_step]
+        for i in idx[~done[idx]]:
+            s = calc_skew(self.ticks[self.tick_start[i]:self.tick_end[i]], price_step)
+            cache[i] = np.nan if s is None else s
+            done[i] = True
+        return cache[idx]
+
+
+# === STRATEGY ===
+def run_vp_backtest(data, params=None, lo=0, hi=None, ref=None, start_balance=0.0):
+    """Trades and metrics of bars [lo, hi).
+
+    The ATR baseline comes from bars `ref` = (lo, hi) of another window (the
+    train split in walk-forward runs), default the same window. The volume
+    threshold is each bar's rolling time-of-day baseline, built only from the
+    bars before it.
+    """
+    p = {**DEFAULTS, **(params or {})}
+    hi = len(data) if hi is None else hi
+    rlo, rhi = (lo, hi) if ref is None else ref
+
+    atr = data.atr(p['atr_period'])
+    eligible = ~np.isnan(atr) & data.in_session(p['trading_start'], p['trading_end']) \
+        & (data.tick_end > data.tick_start)
+    if p['spread_pctl'] is not None:
+        eligible &= data.spread_ok(p['spread_pctl'])
+
+    win = slice(lo, hi)
+    if not eligible[rlo:rhi].any():
+        return _metrics(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), p, start_balance)
+    vol_thresh = data.vol_baseline()[win] * p['vol_spike_factor']   # NaN (no baseline yet) never passes
+    atr_mean = np.nanmean(atr[rlo:rhi])
+
+    cand = lo + np.flatnonzero(eligible[win] & (atr[win] >= atr_mean) & (data.bar_vol[win] >= vol_thresh))
+    skews = data.skews(p['price_step'], cand)
+    take = np.abs(skews) >= p['skew_threshold']     # NaN skews drop out here
+    idx, skews = cand[take], skews[take]
+
+    if p['exit'] == 'bar_range':
+        opens = data.open[idx]
+        pnl_points = np.where(skews > 0, data.high[idx] - opens, opens - data.low[idx])
+    else:
+        keep = idx + 1 < len(data)      # needs a next bar to enter on
+        idx, skews = idx[keep], skews[keep]
+        pnl_points = _atr_exits(data, idx, np.sign(skews), atr[idx], p)
+    return _metrics(idx, skews, pnl_points, p, start_balance)
+
+
+def _atr_exits(data, idx, direction, atr, p):
+    """Points won per trade entered at the open after signal bar idx, SL/TP at ATR multiples.
+
+    The entry bar counts towards the first touch (a bar touching both levels
+    is a stop) and a trade still open after max_bars is closed at that bar's
+    close.
+    """
+    entry = data.open[idx + 1]
+    sl_dist, tp_dist = atr * p['sl_atr'], atr * p['tp_atr']
+    _, outcome = first_touch(data.high, data.low, idx, direction, entry - direction * sl_dist,
+                             entry + direction * tp_dist, p['max_bars'])
+    last = np.minimum(idx + p['max_bars'], len(data) - 1)
+    return np.where(outcome > 0, tp_dist,
+                    np.where(outcome < 0, -sl_dist, direction * (data.close[last] - entry)))
+
+
+def _metrics(idx, skews, pnl_points, p, start_balance):
+    pnl_usd = pnl_points * (p['lot_size'] / 0.01)
+    equity = start_balance + np.cumsum(pnl_usd)
+    return {
+        'idx': idx, 'skew': skews, 'pnl_points': pnl_points, 'pnl_usd': pnl_usd, 'equity': equity,
+        'trades': len(idx),
+        'win_rate': float((pnl_usd > 0).mean()) if len(idx) else 0.0,
+        'net_usd': float(pnl_usd.sum()),
+        'avg_usd': float(pnl_usd.mean()) if len(idx) else 0.0,
+        'max_dd': max_drawdown(equity, start_balance),
+    }
@@ -0,0 +1,46 @@
+# Per-poll latency of the streaming bot loop (TickCursor -> BarVolumeProfile)
+# on the simulated terminal, so numbers are reproducible from the tick cache.
+# Run from the repo root:  python -m benchmarks.bench_bot_loop [SYMBOL] [HOURS]
+import sys
+import time
+
+import numpy as np
+
+from indicators.rolling_profile import BarVolumeProfile
+from mt5_wrapper import TickCursor, sim_terminal
+import mt5_wrapper
+
+PRICE_STEP    = 0.01
+POLL_INTERVAL = 0.25
+
+if __name__ == '__main__':
+    symbol = sys.argv[1] if len(sys.argv) > 1 else "XAUUSDm"
+    hours = float(sys.argv[2]) if len(sys.argv) > 2 else 6
+    mt5_wrapper.BACKEND = "sim"
+    sim = mt5_wrapper.mt5 = sim_terminal()
+    if not sim.symbol_select(symbol):
+        raise SystemExit(f"No cached ticks for {symbol}")
+
+    cursor = TickCursor(symbol)
+    profile = BarVolumeProfile(PRICE_STEP)
+    polls = int(hours * 3600 / POLL_INTERVAL)
+    lat = np.empty(polls)
+    n_ticks = n_bars = 0
+    t_start = time.perf_counter()
+    for i in range(polls):
+        t0 = time.perf_counter()
+        ticks = cursor.poll()
+        n_bars += len(profile.update(ticks))
+        lat[i] = time.perf_counter() - t0
+        n_ticks += 0 if ticks is None else len(ticks)
+        try:
+            sim.sleep(POLL_INTERVAL)
+        except SystemExit:
+            lat = lat[:i + 1]
+            break
+    wall = time.perf_counter() - t_start
+
+    print(f"{symbol}: {len(lat):,} polls, {n_ticks:,} ticks, {n_bars:,} bars closed in {wall:.2f}s")
+    print(f"poll latency  p50 {np.percentile(lat, 50) * 1e6:8.1f} us"
+          f"   p99 {np.percentile(lat, 99) * 1e6:8.1f} us   max {lat.max() * 1e6:8.1f} us")
+    print(f"throughput    {n_ticks / wall:,.0f} ticks/s ({hours * 3600 / wall:,.0f}x real time)")
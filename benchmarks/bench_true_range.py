@@ -0,0 +1,44 @@
+# Compare the old row-wise DataFrame.apply ATR with indicators.atr.
+# Run from the repo root:  python -m benchmarks.bench_true_range
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicators.atr import atr, calculate_atr
+
+N_BARS     = 5000
+ATR_PERIOD = 14
+REPEAT     = 20
+
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 2300 + np.cumsum(rng.normal(0, 0.5, n))
+    return pd.DataFrame({
+        'open': close, 'close': close,
+        'high': close + rng.random(n), 'low': close - rng.random(n),
+    })
+
+def apply_atr(df):
+    tr = df[['high','low','close']].apply(
+        lambda r: max(r['high']-r['low'], abs(r['high']-r['close']), abs(r['low']-r['close'])), axis=1)
+    return tr.rolling(ATR_PERIOD).mean()
+
+def timeit(fn, repeat=REPEAT):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+if __name__ == '__main__':
+    df = make_bars(N_BARS)
+    h, l, c = (df[k].to_numpy() for k in ('high', 'low', 'close'))
+    t_apply = timeit(lambda: apply_atr(df), repeat=3)
+    t_df    = timeit(lambda: calculate_atr(df, ATR_PERIOD))
+    t_np    = timeit(lambda: atr(h, l, c, ATR_PERIOD))
+    print(f"{N_BARS} bars, ATR({ATR_PERIOD}), best of runs")
+    print(f"apply(axis=1):        {t_apply * 1e3:9.3f} ms")
+    print(f"calculate_atr(df):    {t_df * 1e3:9.3f} ms  ({t_apply / t_df:,.0f}x)")
+    print(f"atr(ndarrays):        {t_np * 1e3:9.3f} ms  ({t_apply / t_np:,.0f}x)")
@@ -1,7 +1,10 @@
-import MetaTrader5 as mt5
-import pandas as pd
-from datetime import datetime, timedelta
-import time
+from mt5_wrapper import mt5, sleep, now
+
+from indicators.streaming import BarIndicators, StreamingEMA, StreamingRSI, StreamingATR
+from runtime.scheduler import SymbolScheduler
+from order_gateway import get_gateway
+from journal import get_journal
+from symbol_cache import specs
 
 # === CONFIG ===
 LOGIN = 244499687
@@ -26,54 +29,41 @@ def connect():
         print("❌ Login failed:", mt5.last_error())
         quit()
 
-# === DATA ===
-def get_data(symbol, timeframe=mt5.TIMEFRAME_M1, bars=100):
-    utc_from = datetime.now() - timedelta(minutes=bars)
-    rates = mt5.copy_rates_from(symbol, timeframe, utc_from, bars)
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    return df
-
 # === INDICATORS ===
-def ema(df, period): return df['close'].ewm(span=period).mean()
-def rsi(df, period=14):
-    delta = df['close'].diff()
-    gain, loss = delta.clip(lower=0), -delta.clip(upper=0)
-    rs = gain.rolling(period).mean() / loss.rolling(period).mean()
-    return 100 - (100 / (1 + rs))
-def atr(df, period=14):
-    tr = pd.concat([
-        df['high'] - df['low'],
-        abs(df['high'] - df['close'].shift()),
-        abs(df['low'] - df['close'].shift())
-    ], axis=1).max(axis=1)
-    return tr.rolling(period).mean()
+# Seeded once from history, then fed only newly closed bars each loop
+indicators = {}
+def get_indicators(symbol, timeframe=mt5.TIMEFRAME_M1):
+    ind = indicators.get(symbol)
+    if ind is None:
+        ind = indicators[symbol] = BarIndicators(
+            history=100,
+            ema9=StreamingEMA(9, adjust=True),
+            ema21=StreamingEMA(21, adjust=True),
+            rsi=StreamingRSI(14),
+            atr=StreamingATR(14),
+        )
+    return ind.refresh(lambda n: mt5.copy_rates_from_pos(symbol, timeframe, 0, n))
 
 # === ENTRY STRATEGY ===
-def check_entry(df):
-    df['ema9'] = ema(df, 9)
-    df['ema21'] = ema(df, 21)
-    df['rsi'] = rsi(df)
-    df['atr'] = atr(df)
-
-    last = df.iloc[-1]
-    trend_up = last['ema9'] > last['ema21']
-    trend_down = last['ema9'] < last['ema21']
-    strong_momentum_up = last['rsi'] > 60
-    strong_momentum_down = last['rsi'] < 40
+def check_entry(ind):
+    last = ind['bar']
+    trend_up = ind['ema9'] > ind['ema21']
+    trend_down = ind['ema9'] < ind['ema21']
+    strong_momentum_up = ind['rsi'] > 60
+    strong_momentum_down = ind['rsi'] < 40
     body = abs(last['close'] - last['open'])
     wick = last['high'] - last['low']
     volatility_ok = wick != 0 and (body / wick) > 0.5
 
     if trend_up and strong_momentum_up and volatility_ok:
-        return "BUY", last['atr']
+        return "BUY", ind['atr']
     elif trend_down and strong_momentum_down and volatility_ok:
-        return "SELL", last['atr']
+        return "SELL", ind['atr']
     return None
 
 # === LOT SIZE BASED ON AVAILABLE MARGIN ===
 def calc_lot(symbol, sl_pips, balance):
-    info = mt5.symbol_info(symbol)
+    info = specs.get(symbol)
     contract_size = info.trade_contract_size
     tick_value = info.trade_tick_value
     margin_per_lot = info.margin_initial
@@ -88,7 +78,7 @@ def calc_lot(symbol, sl_pips, balance):
 
 # === EXECUTION ===
 def send_trade(symbol, signal, atr_value, balance):
-    info = mt5.symbol_info(symbol)
+    info = specs.get(symbol)
     point = info.point
     digits = info.digits
     tick = mt5.symbol_info_tick(symbol)
@@ -119,24 +109,28 @@ def send_trade(symbol, signal, atr_value, balance):
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
 
-    result = mt5.order_send(request)
-    print(f"⚡ {signal} | {symbol} @ {round(price, digits)} | Lot: {lot} | SL: {round(sl, digits)} | TP: {round(tp, digits)} | Result: {result.retcode}")
+    get_gateway().submit(request, lambda o: print(
+        f"⚡ {signal} | {symbol} @ {round(o.request['price'], digits)} | Lot: {lot} | SL: {round(o.request['sl'], digits)} "
+        f"| TP: {round(o.request['tp'], digits)} | Result: {o.retcode} | {o.latency * 1e3:.0f}ms"))
 
 # === BOT LOOP ===
 def run():
     connect()
+    scanner = SymbolScheduler(SYMBOLS, get_indicators, lambda symbol, ind: check_entry(ind) if ind else None)
     while True:
         account = mt5.account_info()
         balance = account.balance
-        print(f"\n🕒 {datetime.now().strftime('%H:%M:%S')} | Balance: ${balance:.2f}")
+        print(f"\n🕒 {now().strftime('%H:%M:%S')} | Balance: ${balance:.2f}")
+        signals, report = scanner.cycle()
+        print(report)
         for symbol in SYMBOLS:
-            df = get_data(symbol)
-            signal = check_entry(df)
+            signal = signals.get(symbol)
             if signal:
+                get_journal().signal(symbol, signal[0], note='bot2.py')
                 send_trade(symbol, signal[0], signal[1], balance)
             else:
                 print(f"{symbol} → No strong setup.")
-        time.sleep(LOOP_DELAY)
+        sleep(LOOP_DELAY)
 
 # === START ===
 if __name__ == "__main__":
@@ -1,7 +1,11 @@
-import MetaTrader5 as mt5
-import pandas as pd
-from datetime import datetime, timedelta
-import time
+from mt5_wrapper import mt5, sleep, now
+
+from indicators.streaming import BarIndicators, StreamingEMA, StreamingRSI, StreamingATR
+from runtime.scheduler import SymbolScheduler
+from order_gateway import get_gateway
+from journal import get_journal
+from symbol_cache import specs
+from portfolio_risk import get_risk
 
 # === CONFIG ===
 LOGIN = 244499687
@@ -25,71 +29,41 @@ def connect():
         print("❌ Login failed:", mt5.last_error())
         quit()
 
-# === DATA FETCH ===
-def get_data(symbol, timeframe=mt5.TIMEFRAME_M1, bars=100):
-    utc_from = datetime.now() - timedelta(minutes=bars)
-    rates = mt5.copy_rates_from(symbol, timeframe, utc_from, bars)
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    return df
-
 # === INDICATORS ===
-def ema(df, period): return df['close'].ewm(span=period).mean()
-def rsi(df, period=14):
-    delta = df['close'].diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
-    avg_gain = gain.rolling(period).mean()
-    avg_loss = loss.rolling(period).mean()
-    rs = avg_gain / avg_loss
-    return 100 - (100 / (1 + rs))
-def atr(df, period=14):
-    tr = pd.concat([
-        df['high'] - df['low'],
-        abs(df['high'] - df['close'].shift()),
-        abs(df['low'] - df['close'].shift())
-    ], axis=1).max(axis=1)
-    return tr.rolling(period).mean()
-
-# === ROUND LOTS TO PROP-FIRM RULES ===
-def round_lot(lot):
-    return max(0.01, round(lot * 100) / 100.0)
-
-# === MARGIN-AWARE LOT CALC ===
-def calc_dynamic_lot(symbol, sl_pips, balance):
-    info = mt5.symbol_info(symbol)
-    if not info:
-        return 0.01
-    pip_value = 10  # General estimate
-    risk_dollars = balance * RISK_PER_TRADE
-    lot = risk_dollars / (sl_pips * pip_value)
-    return round_lot(lot)
+# Seeded once from history, then fed only newly closed bars each loop
+indicators = {}
+def get_indicators(symbol, timeframe=mt5.TIMEFRAME_M1):
+    ind = indicators.get(symbol)
+    if ind is None:
+        ind = indicators[symbol] = BarIndicators(
+            history=100,
+            ema9=StreamingEMA(9, adjust=True),
+            ema21=StreamingEMA(21, adjust=True),
+            rsi=StreamingRSI(14),
+            atr=StreamingATR(14),
+        )
+    return ind.refresh(lambda n: mt5.copy_rates_from_pos(symbol, timeframe, 0, n))
 
 # === ENTRY STRATEGY ===
-def check_entry(df):
-    df['ema9'] = ema(df, 9)
-    df['ema21'] = ema(df, 21)
-    df['rsi'] = rsi(df)
-    df['atr'] = atr(df)
-
+def check_entry(ind):
     bullish = (
-        df['ema9'].iloc[-1] > df['ema21'].iloc[-1] and
-        df['rsi'].iloc[-1] > 55
+        ind['ema9'] > ind['ema21'] and
+        ind['rsi'] > 55
     )
     bearish = (
-        df['ema9'].iloc[-1] < df['ema21'].iloc[-1] and
-        df['rsi'].iloc[-1] < 45
+        ind['ema9'] < ind['ema21'] and
+        ind['rsi'] < 45
     )
 
     if bullish:
-        return "BUY", df['atr'].iloc[-1]
+        return "BUY", ind['atr']
     elif bearish:
-        return "SELL", df['atr'].iloc[-1]
+        return "SELL", ind['atr']
     return None
 
 # === TRADE EXECUTION ===
 def send_trade(symbol, signal, atr_value, balance):
-    info = mt5.symbol_info(symbol)
+    info = specs.get(symbol)
     point = info.point
     digits = info.digits
     tick = mt5.symbol_info_tick(symbol)
@@ -97,7 +71,7 @@ def send_trade(symbol, signal, atr_value, balance):
 
     sl_pips = round(atr_value * SL_MULTIPLIER / point)
     tp_pips = round(atr_value * TP_MULTIPLIER / point)
-    lot = calc_dynamic_lot(symbol, sl_pips, balance)
+    lot = get_risk().lot(symbol, sl_pips * point, balance, RISK_PER_TRADE)
 
     sl = price - sl_pips * point if signal == "BUY" else price + sl_pips * point
     tp = price + tp_pips * point if signal == "BUY" else price - tp_pips * point
@@ -117,25 +91,29 @@ def send_trade(symbol, signal, atr_value, balance):
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
 
-    result = mt5.order_send(request)
-    print(f"⚡ {signal} | {symbol} @ {round(price, digits)} | Lot: {lot} | SL: {round(sl, digits)} | TP: {round(tp, digits)} | Result: {result.retcode}")
+    get_gateway().submit(request, lambda o: print(
+        f"⚡ {signal} | {symbol} @ {round(o.request['price'], digits)} | Lot: {lot} | SL: {round(o.request['sl'], digits)} "
+        f"| TP: {round(o.request['tp'], digits)} | Result: {o.retcode} | {o.latency * 1e3:.0f}ms"))
 
 # === LIVE LOOP ===
 def run():
     connect()
+    scanner = SymbolScheduler(SYMBOLS, get_indicators, lambda symbol, ind: check_entry(ind) if ind else None)
     while True:
         account = mt5.account_info()
         balance = account.balance
-        print(f"\n🕒 {datetime.now().strftime('%H:%M:%S')} | Balance: ${balance:.2f}")
+        print(f"\n🕒 {now().strftime('%H:%M:%S')} | Balance: ${balance:.2f}")
 
+        signals, report = scanner.cycle()
+        print(report)
         for symbol in SYMBOLS:
-            df = get_data(symbol)
-            signal = check_entry(df)
+            signal = signals.get(symbol)
             if signal:
+                get_journal().signal(symbol, signal[0], note='bot3.py')
                 send_trade(symbol, signal[0], signal[1], balance)
             else:
                 print(f"{symbol} → No signal")
-        time.sleep(LOOP_DELAY)
+        sleep(LOOP_DELAY)
 
 # === START ===
 if __name__ == "__main__":
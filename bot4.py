@@ -1,7 +1,12 @@
-import MetaTrader5 as mt5
-import pandas as pd
-from datetime import datetime, timedelta
-import time
+from mt5_wrapper import mt5, now
+
+from indicators.streaming import BarIndicators, StreamingEMA, StreamingRSI, StreamingATR
+from runtime.scheduler import SymbolScheduler
+from order_gateway import get_gateway
+from journal import get_journal
+from symbol_cache import specs, quotes
+from portfolio_risk import get_risk
+from strategy.trailing import TrailingEngine
 
 # === CONFIG ===
 LOGIN = 244499687
@@ -15,9 +20,8 @@ SL_MULTIPLIER = 0.5
 TP_MULTIPLIER = 2.2
 TRAIL_AFTER_PIPS = 6
 TRAIL_STEP_PIPS = 3
-TRAIL_COOLDOWN = 30  # cooldown time in seconds
+TRAIL_COOLDOWN = 2  # min seconds between SL updates of one ticket
 open_positions = set()
-last_sl_update = {}
 
 # === CONNECT ===
 def connect():
@@ -30,73 +34,50 @@ def connect():
         print("❌ Login failed:", mt5.last_error())
         quit()
 
-# === DATA ===
-def get_data(symbol, timeframe=mt5.TIMEFRAME_M1, bars=100):
-    utc_from = datetime.now() - timedelta(minutes=bars)
-    rates = mt5.copy_rates_from(symbol, timeframe, utc_from, bars)
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    return df
-
 # === INDICATORS ===
-def ema(df, period): return df['close'].ewm(span=period).mean()
-def rsi(df, period=14):
-    delta = df['close'].diff()
-    gain, loss = delta.clip(lower=0), -delta.clip(upper=0)
-    rs = gain.rolling(period).mean() / loss.rolling(period).mean()
-    return 100 - (100 / (1 + rs))
-def atr(df, period=10):
-    tr = pd.concat([
-        df['high'] - df['low'],
-        abs(df['high'] - df['close'].shift()),
-        abs(df['low'] - df['close'].shift())
-    ], axis=1).max(axis=1)
-    return tr.rolling(period).mean()
-def trend_strength(df):
-    return df['ema9'].iloc[-1] - df['ema21'].iloc[-1]
+# Seeded once from history, then fed only newly closed bars each loop
+indicators = {}
+def get_indicators(symbol, timeframe=mt5.TIMEFRAME_M1):
+    ind = indicators.get(symbol)
+    if ind is None:
+        ind = indicators[symbol] = BarIndicators(
+            history=100,
+            ema9=StreamingEMA(9, adjust=True),
+            ema21=StreamingEMA(21, adjust=True),
+            rsi=StreamingRSI(14),
+            atr=StreamingATR(10),
+        )
+    return ind.refresh(lambda n: mt5.copy_rates_from_pos(symbol, timeframe, 0, n))
+def trend_strength(ind):
+    return ind['ema9'] - ind['ema21']
 
 # === ENTRY STRATEGY ===
-def check_entry(df):
-    df['ema9'] = ema(df, 9)
-    df['ema21'] = ema(df, 21)
-    df['rsi'] = rsi(df)
-    df['atr'] = atr(df)
-    last = df.iloc[-1]
+def check_entry(ind):
+    last = ind['bar']
 
     body = abs(last['close'] - last['open'])
     wick = last['high'] - last['low']
-    slope = trend_strength(df)
-    choppy = 45 < last['rsi'] < 55 or body < wick * 0.4 or df['atr'].iloc[-1] < 0.05
+    slope = trend_strength(ind)
+    choppy = 45 < ind['rsi'] < 55 or body < wick * 0.4 or ind['atr'] < 0.05
 
     if choppy or abs(slope) < 0.03:
         return None
-    if slope > 0 and last['rsi'] > 58:
-        return "BUY", df['atr'].iloc[-1]
-    elif slope < 0 and last['rsi'] < 42:
-        return "SELL", df['atr'].iloc[-1]
+    if slope > 0 and ind['rsi'] > 58:
+        return "BUY", ind['atr']
+    elif slope < 0 and ind['rsi'] < 42:
+        return "SELL", ind['atr']
     return None
 
-# === LOT CALCULATION ===
-def round_lot(lot): return max(0.01, round(lot * 100) / 100.0)
-def calc_lot(symbol, balance, sl_pips):
-    info = mt5.symbol_info(symbol)
-    pip_value = 10
-    risk_amt = balance * RISK_PER_TRADE
-    raw_lot = risk_amt / (sl_pips * pip_value)
-    margin_limit = info.margin_initial or 10
-    max_lot = (mt5.account_info().margin_free * 0.2) / margin_limit
-    return round_lot(min(raw_lot, max_lot))
-
 # === SEND ORDER ===
 def send_trade(symbol, signal, atr_val, balance):
-    info = mt5.symbol_info(symbol)
+    info = specs.get(symbol)
     point, digits = info.point, info.digits
     tick = mt5.symbol_info_tick(symbol)
     price = tick.ask if signal == "BUY" else tick.bid
 
     sl_pips = round(atr_val * SL_MULTIPLIER / point)
     tp_pips = round(atr_val * TP_MULTIPLIER / point)
-    lot = calc_lot(symbol, balance, sl_pips)
+    lot = get_risk().lot(symbol, sl_pips * point, balance, RISK_PER_TRADE)
 
     sl = price - sl_pips * point if signal == "BUY" else price + sl_pips * point
     tp = price + tp_pips * point if signal == "BUY" else price - tp_pips * point
@@ -115,74 +96,38 @@ def send_trade(symbol, signal, atr_val, balance):
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
-    result = mt5.order_send(request)
-    if result.retcode == 10009:
-        open_positions.add(symbol)
-        last_sl_update[symbol] = datetime.now()
-        print(f"⚡ {signal} | {symbol} @ {round(price, digits)} | Lot: {lot} | SL: {round(sl, digits)} | TP: {round(tp, digits)} | Result: {result.retcode}")
-    else:
-        print(f"❌ Failed to send trade on {symbol}: {result.retcode}")
-
-# === TRAILING SL ===
-def trail_stops():
-    positions = mt5.positions_get()
-    if not positions:
-        return
-
-    for pos in positions:
-        try:
-            info = mt5.symbol_info(pos.symbol)
-            tick = mt5.symbol_info_tick(pos.symbol)
-            point = info.point
-            digits = info.digits
-            price = tick.bid if pos.type == mt5.ORDER_TYPE_SELL else tick.ask
-
-            move = (price - pos.price_open) if pos.type == 0 else (pos.price_open - price)
-            if move / point < TRAIL_AFTER_PIPS:
-                continue
-
-            if pos.symbol in last_sl_update and (datetime.now() - last_sl_update[pos.symbol]).total_seconds() < TRAIL_COOLDOWN:
-                continue
-
-            new_sl = price - TRAIL_STEP_PIPS * point if pos.type == 0 else price + TRAIL_STEP_PIPS * point
-            current_sl = pos.sl if pos.sl > 0 else (price - 1000 * point if pos.type == 0 else price + 1000 * point)
-            freeze = getattr(info, 'freeze_level', 5) * point
-
-            if abs(new_sl - current_sl) > freeze and ((pos.type == 0 and new_sl > current_sl) or (pos.type == 1 and new_sl < current_sl)):
-                request = {
-                    "action": mt5.TRADE_ACTION_SLTP,
-                    "position": pos.ticket,
-                    "symbol": pos.symbol,
-                    "sl": round(new_sl, digits),
-                    "tp": pos.tp
-                }
-                result = mt5.order_send(request)
-                if result.retcode == 10009:
-                    last_sl_update[pos.symbol] = datetime.now()
-                    print(f"🔁 Trailed SL on {pos.symbol} | New SL: {round(new_sl, digits)}")
-                else:
-                    print(f"❌ Failed to trail SL on {pos.symbol}: {result.retcode}")
-        except Exception as e:
-            print(f"⚠️ Error trailing SL on {pos.symbol}: {e}")
+    def filled(o):
+        if o.ok:
+            open_positions.add(symbol)
+            print(f"⚡ {signal} | {symbol} @ {round(o.request['price'], digits)} | Lot: {lot} | SL: {round(o.request['sl'], digits)} "
+                  f"| TP: {round(o.request['tp'], digits)} | Result: {o.retcode} | {o.latency * 1e3:.0f}ms")
+        else:
+            print(f"❌ Failed to send trade on {symbol}: {o.retcode}")
+    get_gateway().submit(request, filled)
 
 # === BOT LOOP ===
 def run():
     connect()
+    scanner = SymbolScheduler(SYMBOLS, get_indicators, lambda symbol, ind: check_entry(ind) if ind else None)
+    trailer = TrailingEngine(TRAIL_AFTER_PIPS, TRAIL_STEP_PIPS, TRAIL_COOLDOWN, symbols=SYMBOLS)
     while True:
         balance = mt5.account_info().balance
-        print(f"\n🕒 {datetime.now().strftime('%H:%M:%S')} | Balance: ${balance:.2f}")
+        print(f"\n🕒 {now().strftime('%H:%M:%S')} | Balance: ${balance:.2f}")
         open_positions.clear()
+        quotes.clear()
         for p in mt5.positions_get() or []:
             open_positions.add(p.symbol)
+        signals, report = scanner.cycle()
+        print(report)
         for sym in SYMBOLS:
-            df = get_data(sym)
-            signal = check_entry(df)
+            signal = signals.get(sym)
             if signal:
+                get_journal().signal(sym, signal[0], note='bot4.py')
                 send_trade(sym, signal[0], signal[1], balance)
             else:
                 print(f"{sym} → No valid signal.")
-        trail_stops()
-        time.sleep(LOOP_DELAY)
+        trailer.sync()
+        trailer.run_for(LOOP_DELAY)   # trails on every quote until the next scan
 
 if __name__ == "__main__":
     run()
@@ -3,6 +3,7 @@ SYMBOLS = ["XAUUSDm", "EURUSDm", "GBPUSDm"]
 TIMEFRAME = "M1"
 
 RISK_PER_TRADE = 0.01  # 1%
+MAX_OPEN_RISK = 0.05   # 5% at risk across all open positions
 MIN_WIN_PROB = 0.75  # Minimum ML confidence to enter
 
 TRADING_SESSIONS = {
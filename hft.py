@@ -1,9 +1,15 @@
-import MetaTrader5 as mt5
-import pandas as pd
-from datetime import datetime
-import time
+from mt5_wrapper import mt5, now
 import os
 
+from indicators.streaming import BarIndicators, StreamingEMA, RollingMean
+from runtime.scheduler import SymbolScheduler
+from order_gateway import get_gateway
+from journal import get_journal
+from symbol_cache import specs, quotes
+from portfolio_risk import get_risk
+from sessions import spreads
+from strategy.trailing import TrailingEngine
+
 # === CONFIG ===
 LOGIN = 52278049
 PASSWORD = "c$O1f@g3S@hUqs"
@@ -30,61 +36,59 @@ def connect():
 
 # === TICK INFO ===
 def get_latest_tick(symbol):
-    return mt5.symbol_info_tick(symbol)
+    return quotes.tick(symbol)   # one terminal call per symbol per cycle
+
+# === INDICATORS ===
+# Seeded once from the last 20 bars, then fed only newly closed bars
+indicators = {}
+def get_indicators(symbol):
+    ind = indicators.get(symbol)
+    if ind is None:
+        ind = indicators[symbol] = BarIndicators(
+            history=20,
+            ema5=StreamingEMA(5, adjust=True),
+            ema10=StreamingEMA(10, adjust=True),
+            avg_atr=RollingMean(20, source=lambda bar: bar['high'] - bar['low']),
+        )
+    return ind.refresh(lambda n: mt5.copy_rates_from_pos(symbol, mt5.TIMEFRAME_M1, 0, n))
 
 # === ENTRY LOGIC ===
 def should_enter_trade(symbol):
-    rates = mt5.copy_rates_from_pos(symbol, mt5.TIMEFRAME_M1, 0, 20)
-    if rates is None or len(rates) < 15:
+    ind = get_indicators(symbol)
+    if ind is None:
         print(f"⚠️ Not enough data for {symbol}")
         return False, None, 0
 
-    df = pd.DataFrame(rates)
-    df['EMA5'] = df['close'].ewm(span=5).mean()
-    df['EMA10'] = df['close'].ewm(span=10).mean()
-    df['ATR'] = df['high'] - df['low']
-
-    last = df.iloc[-1]
-    tick = get_latest_tick(symbol)
-    spread = tick.ask - tick.bid
-    point = mt5.symbol_info(symbol).point
-    avg_atr = df['ATR'].mean()
+    last = ind['bar']
+    bar_atr = last['high'] - last['low']
+    spread = spreads.update(symbol, get_latest_tick(symbol))
+    avg_atr = ind['avg_atr']
 
-    bullish = last['EMA5'] > last['EMA10']
-    bearish = last['EMA5'] < last['EMA10']
-    low_spread = spread < SPREAD_LIMIT * point
+    bullish = ind['ema5'] > ind['ema10']
+    bearish = ind['ema5'] < ind['ema10']
+    low_spread = spreads.ok(symbol, max_points=SPREAD_LIMIT)   # under the cap and this symbol's recent p90
 
-    print(f"📊 {symbol} | Bullish: {bullish} | Bearish: {bearish} | Spread OK: {low_spread} | ATR: {last['ATR']:.5f}/{avg_atr:.5f} | Spread: {spread/point:.1f} pts")
+    print(f"📊 {symbol} | Bullish: {bullish} | Bearish: {bearish} | Spread OK: {low_spread} | ATR: {bar_atr:.5f}/{avg_atr:.5f} | Spread: {spread:.1f} pts")
 
     if low_spread:
         if bullish:
-            return True, "BUY", last['ATR']
+            return True, "BUY", bar_atr
         elif bearish:
-            return True, "SELL", last['ATR']
+            return True, "SELL", bar_atr
 
     return False, None, 0
 
-# === LOT SIZE CALC ===
-def calc_lot(balance, symbol, sl_points):
-    info = mt5.symbol_info(symbol)
-    tick_value = info.trade_tick_value
-    tick_size = info.point
-    min_lot = info.volume_min
-    risk_amount = balance * RISK_PER_TRADE
-    lot = risk_amount / (sl_points * tick_value / tick_size)
-    return max(min_lot, round(lot, 2))
-
 # === PLACE ORDER ===
 def place_order(symbol, direction, sl_pips, tp_pips, balance):
-    tick = get_latest_tick(symbol)
-    info = mt5.symbol_info(symbol)
+    tick = mt5.symbol_info_tick(symbol)
+    info = specs.get(symbol)
     point = info.point
     digits = info.digits
     price = tick.ask if direction == "BUY" else tick.bid
 
     sl = price - sl_pips * point if direction == "BUY" else price + sl_pips * point
     tp = price + tp_pips * point if direction == "BUY" else price - tp_pips * point
-    lot = calc_lot(balance, symbol, sl_pips)
+    lot = get_risk().lot(symbol, sl_pips * point, balance, RISK_PER_TRADE)
 
     request = {
         "action": mt5.TRADE_ACTION_DEAL,
@@ -101,38 +105,15 @@ def place_order(symbol, direction, sl_pips, tp_pips, balance):
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
 
-    result = mt5.order_send(request)
-    print(f"🚀 {direction} {symbol} @ {round(price, digits)} | Lot: {lot} | SL: {round(sl, digits)} | TP: {round(tp, digits)} | Result: {result.retcode}")
-
-# === TRAIL STOPS ===
-def trail_stops():
-    positions = mt5.positions_get()
-    for pos in positions:
-        tick = get_latest_tick(pos.symbol)
-        info = mt5.symbol_info(pos.symbol)
-        point = info.point
-        digits = info.digits
-        current_price = tick.bid if pos.type == mt5.ORDER_TYPE_BUY else tick.ask
-        move = (current_price - pos.price_open) if pos.type == mt5.ORDER_TYPE_BUY else (pos.price_open - current_price)
-
-        if move / point >= TRAIL_TRIGGER:
-            new_sl = current_price - TRAIL_STEP * point if pos.type == mt5.ORDER_TYPE_BUY else current_price + TRAIL_STEP * point
-            request = {
-                "action": mt5.TRADE_ACTION_SLTP,
-                "position": pos.ticket,
-                "symbol": pos.symbol,
-                "sl": round(new_sl, digits),
-                "tp": pos.tp
-            }
-            result = mt5.order_send(request)
-            if result.retcode == 10009:
-                print(f"🔁 Trailed SL for {pos.symbol} | New SL: {round(new_sl, digits)}")
-            else:
-                print(f"❌ Trail SL failed on {pos.symbol} | Code: {result.retcode}")
+    get_gateway().submit(request, lambda o: print(
+        f"🚀 {direction} {symbol} @ {round(o.request['price'], digits)} | Lot: {lot} | SL: {round(o.request['sl'], digits)} "
+        f"| TP: {round(o.request['tp'], digits)} | Result: {o.retcode} | {o.latency * 1e3:.0f}ms"))
 
 # === MAIN LOOP ===
 def run():
     connect()
+    scanner = SymbolScheduler(SYMBOLS, should_enter_trade)
+    trailer = TrailingEngine(TRAIL_TRIGGER, TRAIL_STEP, symbols=SYMBOLS)
     while True:
         acc = mt5.account_info()
         if acc is None:
@@ -140,18 +121,21 @@ def run():
             break
 
         balance = acc.balance
-        print(f"\n🕒 {datetime.now().strftime('%H:%M:%S')} | Balance: ${balance:.2f}")
+        print(f"\n🕒 {now().strftime('%H:%M:%S')} | Balance: ${balance:.2f}")
 
-        for symbol in SYMBOLS:
-            entry_ok, direction, atr = should_enter_trade(symbol)
+        quotes.clear()
+        signals, report = scanner.cycle()
+        print(report)
+        for symbol, (entry_ok, direction, atr) in signals.items():
             if entry_ok:
-                point = mt5.symbol_info(symbol).point
+                point = specs.get(symbol).point
                 sl_pips = int((atr / point) * ATR_MULTIPLIER) if atr > 0 else 50
                 tp_pips = sl_pips * 2
+                get_journal().signal(symbol, direction, note='hft.py')
                 place_order(symbol, direction, sl_pips, tp_pips, balance)
 
-        trail_stops()
-        time.sleep(1)
+        trailer.sync()
+        trailer.run_for(1)   # trails on every quote until the next scan
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,34 @@
+import numpy as np
+
+from indicators.common import column, decay_filter, like, rolling_mean
+
+# === TRUE RANGE ===
+def true_range(high, low, close):
+    """max(high-low, |high-prev_close|, |low-prev_close|); first bar is high-low."""
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    prev = np.empty_like(close)
+    prev[0] = np.nan
+    prev[1:] = close[:-1]
+    tr = high - low
+    np.fmax(tr, np.abs(high - prev), out=tr)
+    np.fmax(tr, np.abs(low - prev), out=tr)
+    return tr
+
+# === ATR ===
+def atr(high, low, close, period=14, method='sma'):
+    tr = true_range(high, low, close)
+    if method == 'sma':
+        return rolling_mean(tr, period)
+    if method == 'wilder':
+        out = np.full(len(tr), np.nan)
+        if len(tr) < period:
+            return out
+        seed = tr[:period].mean()
+        out[period - 1] = seed
+        out[period:] = decay_filter(tr[period:] / period, (period - 1) / period, seed)
+        return out
+    raise ValueError(f"Unknown ATR method: {method}")
+
+def calculate_atr(df, period=14, method='sma'):
+    res = atr(column(df, 'high'), column(df, 'low'), column(df, 'close'), period, method)
+    return like(res, df, 'atr')
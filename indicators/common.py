@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+
+# === INPUT HELPERS ===
+def as_array(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def column(data, name):
+    # DataFrame / structured array column, or the array itself
+    if isinstance(data, pd.DataFrame) or getattr(getattr(data, 'dtype', None), 'names', None):
+        return as_array(data[name])
+    return as_array(data)
+
+
+def like(result, data, name=None):
+    # hand back a Series when the caller gave us pandas data
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        return pd.Series(result, index=data.index, name=name)
+    return result
+
+
+# === KERNELS ===
+def rolling_mean(x, period):
+    """Same values as Series.rolling(period).mean(): NaN until `period` valid values."""
+    x = as_array(x)
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) < period:
+        return out
+    start = valid[0]   # leading NaNs (e.g. from a diff) are skipped, not averaged
+    c = np.cumsum(np.concatenate(([0.0], x[start:])))
+    out[start + period - 1:] = (c[period:] - c[:-period]) / period
+    return out
+
+
+def decay_filter(c, w, carry=0.0):
+    """s[t] = c[t] + w * s[t-1] with s[-1] = carry, evaluated in closed form per block.
+
+    Blocks are sized so w**-k stays below 1e8, which keeps the cumsum well
+    conditioned while still doing only len(c)/block Python iterations.
+    """
+    c = as_array(c)
+    if w <= 0 or len(c) == 0:
+        return c.copy()
+    out = np.empty_like(c)
+    block = max(1, int(np.log(1e8) / -np.log(w)))
+    pw_full = w ** np.arange(min(block, len(c)) + 1)
+    for start in range(0, len(c), block):
+        seg = c[start:start + block]
+        m = len(seg)
+        pw = pw_full[:m]
+        s = pw * np.cumsum(seg / pw) + carry * pw_full[1:m + 1]
+        out[start:start + m] = s
+        carry = s[-1]
+    return out
@@ -1,4 +1,20 @@
+import numpy as np
 import pandas as pd
 
-def calculate_ema(df, period):
-    return df['close'].ewm(span=period, adjust=False).mean()
+from indicators.common import as_array, column, decay_filter, like
+
+def ema(values, period, adjust=False):
+    """NumPy EMA matching Series.ewm(span=period, adjust=adjust).mean()."""
+    x = as_array(values)
+    if len(x) == 0:
+        return x
+    a = 2.0 / (period + 1)
+    w = 1.0 - a
+    if adjust:
+        return decay_filter(x, w) / decay_filter(np.ones_like(x), w)
+    c = a * x
+    c[0] = x[0]
+    return decay_filter(c, w)
+
+def calculate_ema(df, period, adjust=False):
+    return like(ema(column(df, 'close'), period, adjust), df, 'ema')
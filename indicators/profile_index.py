@@ -0,0 +1,213 @@
+import numpy as np
+
+from indicators.volume_profile import (
+    PRICE_STEP, VOL_COVERAGE, price_index, profile_from_histogram, tick_prices, tick_volumes,
+)
+
+BAR_SECONDS = 60
+LEVELS      = (1, 5, 15, 60, 240, 1440)   # block sizes in bars: M1, M5, M15, H1, H4, D1
+
+
+# === SPARSE LAYOUT ===
+# One CSR table per resolution: block open times, offsets into the entry
+# arrays, and (bin, volume) pairs for the non-empty bins of each block sorted
+# by bin. Bins are absolute price_index() values, so blocks combine directly.
+class _Level:
+    __slots__ = ('seconds', 'times', 'offsets', 'bins', 'vols', 'up', 'dn')
+
+    def __init__(self, seconds, times, offsets, bins, vols, up, dn):
+        self.seconds = seconds
+        self.times = times
+        self.offsets = offsets
+        self.bins = bins
+        self.vols = vols
+        self.up = up
+        self.dn = dn
+
+    @classmethod
+    def empty(cls, seconds):
+        return cls(seconds, np.empty(0, np.int64), np.zeros(1, np.int64), np.empty(0, np.int32),
+                   np.empty(0, np.float32), np.empty(0), np.empty(0))
+
+    def span(self, t0, t1):
+        """Block positions [i0, i1) opening in [t0, t1)."""
+        return (int(np.searchsorted(self.times, t0, side='left')),
+                int(np.searchsorted(self.times, t1, side='left')))
+
+    def truncate(self, i):
+        e = self.offsets[i]
+        self.times, self.offsets = self.times[:i], self.offsets[:i + 1]
+        self.bins, self.vols = self.bins[:e], self.vols[:e]
+        self.up, self.dn = self.up[:i], self.dn[:i]
+
+    def extend(self, other):
+        self.offsets = np.concatenate((self.offsets, other.offsets[1:] + self.offsets[-1]))
+        self.times = np.concatenate((self.times, other.times))
+        self.bins = np.concatenate((self.bins, other.bins))
+        self.vols = np.concatenate((self.vols, other.vols))
+        self.up = np.concatenate((self.up, other.up))
+        self.dn = np.concatenate((self.dn, other.dn))
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, k).nbytes for k in ('times', 'offsets', 'bins', 'vols', 'up', 'dn'))
+
+
+def _compress(seconds, times, bins, vols, up_t, dn_t):
+    """Sum duplicate (block, bin) entries into a _Level; `times` are block open times."""
+    if len(times) == 0:
+        return _Level.empty(seconds)
+    order = np.lexsort((bins, times))
+    t, b, v = times[order], bins[order], vols[order]
+    new = np.ones(len(t), dtype=bool)
+    new[1:] = (t[1:] != t[:-1]) | (b[1:] != b[:-1])
+    first = np.flatnonzero(new)
+    t, b, v = t[first], b[first], np.add.reduceat(v, first)
+    block = np.flatnonzero(np.concatenate(([True], t[1:] != t[:-1])))
+    block_times = t[block]
+    # up/dn volume per block (inputs are per entry-group of the finer level or per tick)
+    up = np.zeros(len(block_times))
+    dn = np.zeros(len(block_times))
+    pos_u = np.searchsorted(block_times, up_t[0])
+    pos_d = np.searchsorted(block_times, dn_t[0])
+    np.add.at(up, pos_u, up_t[1])
+    np.add.at(dn, pos_d, dn_t[1])
+    return _Level(seconds, block_times, np.concatenate((block, [len(t)])).astype(np.int64),
+                  b.astype(np.int32), v.astype(np.float32), up, dn)
+
+
+# === INDEX ===
+# Per-bar volume histograms at a fixed price step, plus coarser copies (M5 ..
+# D1). A window is cut into the fewest aligned blocks across resolutions and
+# their sparse entries are summed, so a day costs about as much as one bar.
+class ProfileIndex:
+    def __init__(self, price_step=PRICE_STEP, bar_seconds=BAR_SECONDS, levels=LEVELS, coverage=VOL_COVERAGE):
+        self.price_step = price_step
+        self.bar_seconds = bar_seconds
+        self.coverage = coverage
+        self.levels = [_Level.empty(bar_seconds * k) for k in levels]
+        self._last_price = None
+
+    @classmethod
+    def from_ticks(cls, ticks, **kwargs):
+        index = cls(**kwargs)
+        index.append(ticks)
+        return index
+
+    # --- building ---
+    def append(self, ticks):
+        """Index ticks of closed bars; ticks inside already indexed bars are skipped."""
+        if ticks is None or len(ticks) == 0:
+            return
+        msc = np.asarray(ticks['time_msc'], dtype=np.int64)
+        base = self.levels[0]
+        if len(base.times):
+            keep = msc >= (base.times[-1] + self.bar_seconds) * 1000
+            ticks, msc = ticks[keep], msc[keep]
+            if len(msc) == 0:
+                return
+        prices = tick_prices(ticks)
+        vols = tick_volumes(ticks)
+        bar_t = msc // (self.bar_seconds * 1000) * self.bar_seconds
+
+        prev = np.concatenate(([prices[0] if self._last_price is None else self._last_price], prices[:-1]))
+        up, dn = prices > prev, prices < prev
+        self._last_price = prices[-1]
+        new = _compress(base.seconds, bar_t, price_index(prices, self.price_step), vols,
+                        (bar_t[up], vols[up]), (bar_t[dn], vols[dn]))
+        first = int(new.times[0])
+        base.extend(new)
+
+        # coarser levels: rebuild every block the new bars fall into from the base entries
+        for lv in self.levels[1:]:
+            block0 = first // lv.seconds * lv.seconds
+            lv.truncate(lv.span(block0, block0)[0])
+            i0 = base.span(block0, block0)[0]
+            e0 = base.offsets[i0]
+            counts = np.diff(base.offsets[i0:])
+            entry_t = np.repeat(base.times[i0:] // lv.seconds * lv.seconds, counts)
+            bt = base.times[i0:] // lv.seconds * lv.seconds
+            lv.extend(_compress(lv.seconds, entry_t, base.bins[e0:], base.vols[e0:],
+                                (bt, base.up[i0:]), (bt, base.dn[i0:])))
+
+    # --- queries ---
+    def _pieces(self, t0, t1, k):
+        if t0 >= t1:
+            return []
+        lv = self.levels[k]
+        if k == 0:
+            return [(lv, *lv.span(t0, t1))]
+        a = -(-t0 // lv.seconds) * lv.seconds
+        b = t1 // lv.seconds * lv.seconds
+        if a >= b:
+            return self._pieces(t0, t1, k - 1)
+        return self._pieces(t0, a, k - 1) + [(lv, *lv.span(a, b))] + self._pieces(b, t1, k - 1)
+
+    def histogram(self, t0, t1):
+        """(lowest bin index, volume per bin) of bars opening in [t0, t1), epoch seconds."""
+        lo, hist, _, _ = self._sum(int(t0), int(t1))
+        return lo, hist
+
+    def _sum(self, t0, t1):
+        bins, vols, up, dn = [], [], 0.0, 0.0
+        for lv, i0, i1 in self._pieces(t0, t1, len(self.levels) - 1):
+            if i1 > i0:
+                e0, e1 = lv.offsets[i0], lv.offsets[i1]
+                bins.append(lv.bins[e0:e1])
+                vols.append(lv.vols[e0:e1])
+                up += lv.up[i0:i1].sum()
+                dn += lv.dn[i0:i1].sum()
+        if not bins:
+            return 0, np.empty(0), up, dn
+        bins = np.concatenate(bins) if len(bins) > 1 else bins[0]
+        vols = np.concatenate(vols) if len(vols) > 1 else vols[0]
+        lo = int(bins.min())
+        return lo, np.bincount(bins - lo, weights=vols), up, dn
+
+    def profile(self, t0, t1, coverage=None):
+        """VolumeProfile of bars opening in [t0, t1), None if there was no volume."""
+        lo, hist, up, dn = self._sum(int(t0), int(t1))
+        imbalance = (up - dn) / (up + dn) if (up + dn) > 0 else 0.0
+        return profile_from_histogram(lo, hist, self.price_step, coverage or self.coverage, imbalance)
+
+    def last(self, bars, coverage=None):
+        """Profile of the most recent `bars` indexed bars (e.g. 60 for the last hour)."""
+        end = self.end
+        return None if end is None else self.profile(end - bars * self.bar_seconds, end, coverage)
+
+    def session(self, day, start, end, coverage=None):
+        """Profile between two datetime.time values of the UTC day containing epoch `day`."""
+        d = int(day) // 86400 * 86400
+        to_s = lambda t: t.hour * 3600 + t.minute * 60 + t.second
+        return self.profile(d + to_s(start), d + to_s(end), coverage)
+
+    @property
+    def end(self):
+        """Close time of the last indexed bar, None while empty."""
+        times = self.levels[0].times
+        return int(times[-1]) + self.bar_seconds if len(times) else None
+
+    @property
+    def nbytes(self):
+        return sum(lv.nbytes for lv in self.levels)
+
+    # --- persistence ---
+    def save(self, path):
+        arrays = {'meta': np.array([self.price_step, self.bar_seconds, self.coverage,
+                                    np.nan if self._last_price is None else self._last_price])}
+        for k, lv in enumerate(self.levels):
+            for name in ('times', 'offsets', 'bins', 'vols', 'up', 'dn'):
+                arrays[f'{k}_{name}'] = getattr(lv, name)
+            arrays[f'{k}_seconds'] = np.array(lv.seconds)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            step, bar_seconds, coverage, last = f['meta']
+            n = sum(1 for key in f.files if key.endswith('_seconds'))
+            index = cls(step, int(bar_seconds), levels=(), coverage=coverage)
+            index.levels = [_Level(int(f[f'{k}_seconds']), *(f[f'{k}_{name}'] for name in
+                                   ('times', 'offsets', 'bins', 'vols', 'up', 'dn'))) for k in range(n)]
+            index._last_price = None if np.isnan(last) else float(last)
+        return index
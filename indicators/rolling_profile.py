@@ -0,0 +1,152 @@
+import numpy as np
+
+from indicators.volume_profile import (
+    PRICE_STEP, VOL_COVERAGE, price_index, profile_from_histogram, tick_prices, tick_volumes,
+)
+
+
+# === ROLLING PROFILE ===
+# Per-bin volumes live in a flat array that grows by doubling when price leaves
+# the covered range, so each tick is an index bump plus a POC compare. The value
+# area is only rebuilt when someone asks for it after new volume arrived.
+class RollingVolumeProfile:
+    __slots__ = ('price_step', 'coverage', '_hist', '_lo', '_poc', '_min', '_max',
+                 '_last_price', '_up', '_dn', '_cached', 'n_ticks')
+
+    def __init__(self, price_step=PRICE_STEP, coverage=VOL_COVERAGE, capacity=1024):
+        self.price_step = price_step
+        self.coverage = coverage
+        self._hist = np.zeros(capacity)
+        self._lo = None
+        self.reset()
+
+    def reset(self):
+        if self._lo is not None:
+            self._hist[self._min:self._max + 1] = 0
+        self._lo = None
+        self._poc = self._min = self._max = -1
+        self._last_price = None
+        self._up = self._dn = 0.0
+        self._cached = None
+        self.n_ticks = 0
+
+    def _slot(self, idx_lo, idx_hi):
+        # make sure absolute bin indices [idx_lo, idx_hi] fit, return offset of idx_lo
+        if self._lo is None:
+            cap = len(self._hist)
+            while cap < idx_hi - idx_lo + 1:
+                cap *= 2
+            if cap != len(self._hist):
+                self._hist = np.zeros(cap)
+            self._lo = idx_lo - (cap - (idx_hi - idx_lo + 1)) // 2
+            self._min = idx_lo - self._lo
+            self._max = idx_hi - self._lo
+            return idx_lo - self._lo
+        lo = min(idx_lo, self._lo + self._min)
+        hi = max(idx_hi, self._lo + self._max)
+        if lo < self._lo or hi >= self._lo + len(self._hist):
+            cap = len(self._hist)
+            while cap < 2 * (hi - lo + 1):
+                cap *= 2
+            new_lo = lo - (cap - (hi - lo + 1)) // 2
+            grown = np.zeros(cap)
+            shift = self._lo - new_lo
+            grown[self._min + shift:self._max + shift + 1] = self._hist[self._min:self._max + 1]
+            self._hist = grown
+            self._min += shift; self._max += shift
+            if self._poc >= 0:
+                self._poc += shift
+            self._lo = new_lo
+        self._min = min(self._min, idx_lo - self._lo)
+        self._max = max(self._max, idx_hi - self._lo)
+        return idx_lo - self._lo
+
+    def add_tick(self, price, volume=1.0):
+        volume = volume or 1.0
+        idx = int(round(price / self.price_step))
+        i = self._slot(idx, idx)
+        hist = self._hist
+        hist[i] += volume
+        poc = self._poc
+        if poc < 0 or hist[i] > hist[poc] or (hist[i] == hist[poc] and i < poc):
+            self._poc = i
+        if self._last_price is not None:
+            if price > self._last_price:
+                self._up += volume
+            elif price < self._last_price:
+                self._dn += volume
+        self._last_price = price
+        self._cached = None
+        self.n_ticks += 1
+
+    def add_ticks(self, ticks):
+        if ticks is None or len(ticks) == 0:
+            return
+        self._add_arrays(tick_prices(ticks), tick_volumes(ticks))
+
+    def _add_arrays(self, prices, volumes):
+        idx = price_index(prices, self.price_step)
+        off = self._slot(int(idx.min()), int(idx.max()))
+        rel = idx - (self._lo + off)
+        seg = np.bincount(rel, weights=volumes)
+        self._hist[off:off + len(seg)] += seg
+        self._poc = self._min + int(np.argmax(self._hist[self._min:self._max + 1]))
+        ret = np.diff(prices, prepend=prices[0] if self._last_price is None else self._last_price)
+        self._up += volumes[ret > 0].sum()
+        self._dn += volumes[ret < 0].sum()
+        self._last_price = float(prices[-1])
+        self._cached = None
+        self.n_ticks += len(prices)
+
+    @property
+    def poc(self):
+        return None if self._poc < 0 else (self._lo + self._poc) * self.price_step
+
+    @property
+    def imbalance(self):
+        tot = self._up + self._dn
+        return (self._up - self._dn) / tot if tot > 0 else 0.0
+
+    def histogram(self):
+        if self._poc < 0:
+            return None, np.zeros(0)
+        return self._lo + self._min, self._hist[self._min:self._max + 1]
+
+    def profile(self):
+        if self._cached is None and self._poc >= 0:
+            lo, hist = self.histogram()
+            self._cached = profile_from_histogram(lo, hist, self.price_step, self.coverage,
+                                                  self.imbalance)
+        return self._cached
+
+
+# === BAR PROFILES ===
+# Keeps a rolling profile for the bar that is currently forming and hands back
+# the finished profile as soon as the first tick of the next bar shows up.
+class BarVolumeProfile:
+    __slots__ = ('bar_ms', 'current', 'bar_time')
+
+    def __init__(self, price_step=PRICE_STEP, coverage=VOL_COVERAGE, bar_seconds=60):
+        self.bar_ms = bar_seconds * 1000
+        self.current = RollingVolumeProfile(price_step, coverage)
+        self.bar_time = None   # open time (epoch seconds) of the forming bar
+
+    def update(self, ticks):
+        """Feed new ticks; return [(bar_open_time, VolumeProfile), ...] for bars that closed."""
+        closed = []
+        if ticks is None or len(ticks) == 0:
+            return closed
+        bar_id = np.asarray(ticks['time_msc'], dtype=np.int64) // self.bar_ms
+        cuts = np.flatnonzero(np.diff(bar_id)) + 1
+        starts = np.concatenate(([0], cuts))
+        ends = np.concatenate((cuts, [len(ticks)]))
+        prices = tick_prices(ticks)
+        volumes = tick_volumes(ticks)
+        for s, e in zip(starts, ends):
+            t = int(bar_id[s]) * self.bar_ms // 1000
+            if self.bar_time is not None and t != self.bar_time:
+                closed.append((self.bar_time, self.current.profile()))
+                self.current.reset()
+            self.bar_time = t
+            self.current._add_arrays(prices[s:e], volumes[s:e])
+        return closed
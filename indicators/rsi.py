@@ -0,0 +1,34 @@
+import numpy as np
+
+from indicators.common import as_array, column, decay_filter, like, rolling_mean
+
+def _gains_losses(close):
+    delta = np.diff(as_array(close), prepend=np.nan)
+    return np.clip(delta, 0, None), np.clip(-delta, 0, None)
+
+def _rsi_from_avgs(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+# === RSI ===
+# 'sma' matches the bots' gain.rolling(period).mean() version,
+# 'wilder' is the classic smoothed RSI that MT5's iRSI uses.
+def rsi(close, period=14, method='sma'):
+    gain, loss = _gains_losses(close)
+    if method == 'sma':
+        return _rsi_from_avgs(rolling_mean(gain, period), rolling_mean(loss, period))
+    if method == 'wilder':
+        out = np.full(len(gain), np.nan)
+        if len(gain) <= period:
+            return out
+        w = (period - 1) / period
+        g0, l0 = gain[1:period + 1].mean(), loss[1:period + 1].mean()
+        avg_gain = decay_filter(gain[period + 1:] / period, w, g0)
+        avg_loss = decay_filter(loss[period + 1:] / period, w, l0)
+        out[period] = _rsi_from_avgs(g0, l0)
+        out[period + 1:] = _rsi_from_avgs(avg_gain, avg_loss)
+        return out
+    raise ValueError(f"Unknown RSI method: {method}")
+
+def calculate_rsi(df, period=14, method='sma'):
+    return like(rsi(column(df, 'close'), period, method), df, 'rsi')
@@ -0,0 +1,261 @@
+import math
+
+# Incremental versions of the indicators in this package. Each one is seeded
+# from history once and then fed one closed bar at a time; peek() gives the
+# value for the still-forming bar without committing it. Results match the
+# pandas formulas the bots used (ewm(span), rolling(period).mean()).
+
+NAN = float('nan')
+
+
+def _source(bar, source):
+    return source(bar) if callable(source) else float(bar[source])
+
+
+# === ROLLING MEAN ===
+class RollingMean:
+    __slots__ = ('period', 'source', '_buf', '_i', '_n', '_sum', 'value')
+
+    def __init__(self, period, source='close'):
+        self.period = period
+        self.source = source
+        self.reset()
+
+    def reset(self):
+        self._buf = [0.0] * self.period
+        self._i = 0
+        self._n = 0
+        self._sum = 0.0
+        self.value = NAN
+
+    def update(self, x):
+        buf = self._buf
+        if self._n == self.period:
+            self._sum -= buf[self._i]
+        else:
+            self._n += 1
+        buf[self._i] = x
+        self._sum += x
+        self._i += 1
+        if self._i == self.period:
+            self._i = 0
+            self._sum = math.fsum(buf)   # re-sum once per lap so the running total can't drift
+        self.value = self._sum / self.period if self._n == self.period else NAN
+        return self.value
+
+    def peek(self, x):
+        if self._n + 1 < self.period:
+            return NAN
+        s = self._sum - self._buf[self._i] if self._n == self.period else self._sum
+        return (s + x) / self.period
+
+    def update_bar(self, bar):
+        return self.update(_source(bar, self.source))
+
+    def peek_bar(self, bar):
+        return self.peek(_source(bar, self.source))
+
+
+# === WILDER AVERAGE ===
+# SMA over the first `period` values, then avg = (avg * (period - 1) + x) / period
+class WilderAverage:
+    __slots__ = ('period', '_n', '_sum', 'value')
+
+    def __init__(self, period):
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self._n = 0
+        self._sum = 0.0
+        self.value = NAN
+
+    def _next(self, x):
+        if self._n + 1 < self.period:
+            return NAN
+        if self._n + 1 == self.period:
+            return (self._sum + x) / self.period
+        return (self.value * (self.period - 1) + x) / self.period
+
+    def update(self, x):
+        self.value = self._next(x)
+        if self._n < self.period:
+            self._sum += x
+        self._n += 1
+        return self.value
+
+    def peek(self, x):
+        return self._next(x)
+
+
+def _average(period, method):
+    if method == 'sma':
+        return RollingMean(period)
+    if method == 'wilder':
+        return WilderAverage(period)
+    raise ValueError(f"Unknown smoothing method: {method}")
+
+
+# === EMA ===
+class StreamingEMA:
+    __slots__ = ('period', 'adjust', 'source', '_w', '_num', '_den', 'value')
+
+    def __init__(self, period, adjust=False, source='close'):
+        self.period = period
+        self.adjust = adjust
+        self.source = source
+        self._w = 1.0 - 2.0 / (period + 1)
+        self.reset()
+
+    def reset(self):
+        self._num = 0.0
+        self._den = 0.0
+        self.value = NAN
+
+    def _next(self, x):
+        w = self._w
+        if self.adjust:
+            num, den = x + w * self._num, 1.0 + w * self._den
+            return num, den, num / den
+        if self._den == 0.0:
+            return x, 1.0, x
+        v = (1.0 - w) * x + w * self.value
+        return v, 1.0, v
+
+    def update(self, x):
+        self._num, self._den, self.value = self._next(x)
+        return self.value
+
+    def peek(self, x):
+        return self._next(x)[2]
+
+    def update_bar(self, bar):
+        return self.update(_source(bar, self.source))
+
+    def peek_bar(self, bar):
+        return self.peek(_source(bar, self.source))
+
+
+# === RSI ===
+def _rsi(avg_gain, avg_loss):
+    if avg_loss == 0:
+        return 100.0 if avg_gain > 0 else NAN
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+class StreamingRSI:
+    __slots__ = ('period', 'method', 'source', '_gain', '_loss', '_prev', 'value')
+
+    def __init__(self, period=14, method='sma', source='close'):
+        self.period = period
+        self.method = method
+        self.source = source
+        self._gain = _average(period, method)
+        self._loss = _average(period, method)
+        self.reset()
+
+    def reset(self):
+        self._gain.reset()
+        self._loss.reset()
+        self._prev = None
+        self.value = NAN
+
+    def update(self, close):
+        if self._prev is not None:
+            d = close - self._prev
+            self.value = _rsi(self._gain.update(max(d, 0.0)), self._loss.update(max(-d, 0.0)))
+        self._prev = close
+        return self.value
+
+    def peek(self, close):
+        if self._prev is None:
+            return NAN
+        d = close - self._prev
+        return _rsi(self._gain.peek(max(d, 0.0)), self._loss.peek(max(-d, 0.0)))
+
+    def update_bar(self, bar):
+        return self.update(_source(bar, self.source))
+
+    def peek_bar(self, bar):
+        return self.peek(_source(bar, self.source))
+
+
+# === ATR ===
+class StreamingATR:
+    __slots__ = ('period', 'method', '_avg', '_prev', 'value')
+
+    def __init__(self, period=14, method='sma'):
+        self.period = period
+        self.method = method
+        self._avg = _average(period, method)
+        self.reset()
+
+    def reset(self):
+        self._avg.reset()
+        self._prev = None
+        self.value = NAN
+
+    def _tr(self, high, low):
+        if self._prev is None:
+            return high - low
+        return max(high - low, abs(high - self._prev), abs(low - self._prev))
+
+    def update(self, high, low, close):
+        self.value = self._avg.update(self._tr(high, low))
+        self._prev = close
+        return self.value
+
+    def peek(self, high, low, close):
+        return self._avg.peek(self._tr(high, low))
+
+    def update_bar(self, bar):
+        return self.update(float(bar['high']), float(bar['low']), float(bar['close']))
+
+    def peek_bar(self, bar):
+        return self.peek(float(bar['high']), float(bar['low']), float(bar['close']))
+
+
+# === BAR STREAM ===
+# Owns a named set of indicators for one symbol/timeframe and feeds them every
+# closed bar exactly once. The last row of a rates array is the forming bar.
+class BarIndicators:
+    __slots__ = ('indicators', 'bar_seconds', 'history', 'last_time')
+
+    def __init__(self, bar_seconds=60, history=100, **indicators):
+        self.indicators = indicators
+        self.bar_seconds = bar_seconds
+        self.history = history
+        self.last_time = None
+
+    def reset(self):
+        for ind in self.indicators.values():
+            ind.reset()
+        self.last_time = None
+
+    def sync(self, rates):
+        """Feed new closed bars; return {name: value} for the forming bar, or None on a gap."""
+        if rates is None or len(rates) == 0:
+            return None
+        closed = rates[:-1]
+        if self.last_time is not None:
+            closed = closed[closed['time'] > self.last_time]
+            if len(closed) and closed['time'][0] > self.last_time + self.bar_seconds:
+                return None   # missed bars, caller has to reseed
+        for bar in closed:
+            for ind in self.indicators.values():
+                ind.update_bar(bar)
+        if len(closed):
+            self.last_time = int(closed['time'][-1])
+        forming = rates[-1]
+        snap = {name: ind.peek_bar(forming) for name, ind in self.indicators.items()}
+        snap['bar'] = forming
+        return snap
+
+    def refresh(self, fetch):
+        """fetch(n) -> last n rates incl. the forming bar (e.g. copy_rates_from_pos(sym, tf, 0, n))."""
+        if self.last_time is not None:
+            snap = self.sync(fetch(3))
+            if snap is not None:
+                return snap
+            self.reset()
+        return self.sync(fetch(self.history))
@@ -0,0 +1,98 @@
+import numpy as np
+
+# Adaptive "normal volume" for the bar-volume spike filter. Bars are grouped
+# by time of day (BUCKET_MINUTES buckets, UTC) and each bucket keeps an EWMA
+# of the volume of its bars across days, so 14:30 is compared with earlier
+# 14:30s rather than with the Asian session. Until a bucket has MIN_COUNT bars
+# the EWMA over all bars stands in. Every update is O(1) and returns the
+# baseline from before the bar, so a bar is never judged against itself or
+# anything later. The live bots feed it closed rates and the backtests run the
+# same class over their bar arrays (volume_baselines), so both get identical
+# numbers from identical bars.
+
+# === CONFIG ===
+BUCKET_MINUTES = 30
+SPAN           = 100     # EWMA span in bars of one bucket (~3 days of M1 for a 30-minute bucket)
+GLOBAL_SPAN    = 200     # EWMA span over all bars, the fallback (matches the old 200-bar average)
+MIN_COUNT      = 30      # bars a bucket needs before its own EWMA is used
+MIN_GLOBAL     = 20      # bars before there is any baseline at all
+SEED_BARS      = 7200    # closed bars live loops seed from (5 days of M1)
+DAY            = 86400
+
+NAN = float('nan')
+
+
+class VolumeBaseline:
+    __slots__ = ('bucket_seconds', 'min_count', 'min_global', '_alpha', '_global_alpha',
+                 'mean', 'count', 'global_mean', 'n', 'last_time', 'source', 'value')
+
+    def __init__(self, bucket_minutes=BUCKET_MINUTES, span=SPAN, global_span=GLOBAL_SPAN,
+                 min_count=MIN_COUNT, min_global=MIN_GLOBAL, source='tick_volume'):
+        self.bucket_seconds = bucket_minutes * 60
+        self.min_count = min_count
+        self.min_global = min_global
+        self.source = source
+        self._alpha = 2.0 / (span + 1)
+        self._global_alpha = 2.0 / (global_span + 1)
+        self.reset()
+
+    def reset(self):
+        buckets = DAY // self.bucket_seconds
+        self.mean = [0.0] * buckets
+        self.count = [0] * buckets
+        self.global_mean = 0.0
+        self.n = 0
+        self.last_time = None
+        self.value = NAN    # baseline the last bar fed was judged against
+
+    def expected(self, t):
+        """Baseline volume for a bar opening at epoch second t, from the bars fed so far (NaN while warming up)."""
+        b = int(t) % DAY // self.bucket_seconds
+        if self.count[b] >= self.min_count:
+            return self.mean[b]
+        return self.global_mean if self.n >= self.min_global else NAN
+
+    def update(self, t, volume):
+        """Feed one closed bar; returns (and keeps in .value) its baseline from before the bar."""
+        prior = self.expected(t)
+        b = int(t) % DAY // self.bucket_seconds
+        if self.count[b]:
+            self.mean[b] += self._alpha * (volume - self.mean[b])
+        else:
+            self.mean[b] = volume
+        self.count[b] += 1
+        if self.n:
+            self.global_mean += self._global_alpha * (volume - self.global_mean)
+        else:
+            self.global_mean = volume
+        self.n += 1
+        self.last_time = int(t)
+        self.value = prior
+        return prior
+
+    def update_bar(self, bar):
+        return self.update(int(bar['time']), float(bar[self.source]))
+
+    def sync(self, rates):
+        """Feed the closed bars in `rates` newer than the last one seen; returns the newest one's baseline."""
+        if rates is None or len(rates) == 0:
+            return self.value
+        times = np.asarray(rates['time'], dtype=np.int64)
+        start = 0 if self.last_time is None else int(np.searchsorted(times, self.last_time, side='right'))
+        for bar in rates[start:]:
+            self.update_bar(bar)
+        return self.value
+
+    def missing(self, bar_time, bar_seconds=60, cap=SEED_BARS):
+        """Closed bars to fetch so that sync() reaches the bar opening at bar_time (at least 1)."""
+        if self.last_time is None:
+            return cap
+        return int(min(max((int(bar_time) - self.last_time) // bar_seconds, 1), cap))
+
+
+def volume_baselines(times, volumes, **kwargs):
+    """Per-bar baselines of a whole series, each from the bars before it; VolumeBaseline kwargs apply."""
+    base = VolumeBaseline(**kwargs)
+    times = np.asarray(times, dtype=np.int64).tolist()
+    volumes = np.asarray(volumes, dtype=np.float64).tolist()
+    return np.array([base.update(t, v) for t, v in zip(times, volumes)], dtype=np.float64)
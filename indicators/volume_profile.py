@@ -0,0 +1,172 @@
+import numpy as np
+
+PRICE_STEP   = 0.01   # default bin size
+VOL_COVERAGE = 0.7    # 70% value area
+
+
+# === RESULT ===
+class VolumeProfile:
+    __slots__ = ('poc', 'vah', 'val', 'width', 'skew', 'imbalance')
+
+    def __init__(self, poc, vah, val, width, skew, imbalance):
+        self.poc = poc
+        self.vah = vah
+        self.val = val
+        self.width = width
+        self.skew = skew
+        self.imbalance = imbalance
+
+    def as_tuple(self):
+        return self.poc, self.vah, self.val, self.width, self.skew, self.imbalance
+
+    def __repr__(self):
+        return (f"VolumeProfile(poc={self.poc}, vah={self.vah}, val={self.val}, "
+                f"width={self.width}, skew={self.skew:.4f}, imbalance={self.imbalance:.4f})")
+
+
+# === TICK COLUMNS ===
+# Works on the raw MT5 structured array as well as on a DataFrame built from it.
+def tick_prices(ticks):
+    return (np.asarray(ticks['bid'], dtype=np.float64) + np.asarray(ticks['ask'], dtype=np.float64)) / 2
+
+
+def tick_volumes(ticks):
+    vol = np.asarray(ticks['volume'], dtype=np.float64)
+    return np.where(vol == 0, 1.0, vol)   # FX/metal ticks often report 0 volume
+
+
+def price_index(prices, price_step=PRICE_STEP):
+    return np.rint(np.asarray(prices, dtype=np.float64) / price_step).astype(np.int64)
+
+
+# === HISTOGRAM ===
+def profile_histogram(prices, volumes, price_step=PRICE_STEP):
+    """Return (lowest bin index, volume per bin) with one slot per price step."""
+    idx = price_index(prices, price_step)
+    lo = int(idx.min())
+    return lo, np.bincount(idx - lo, weights=volumes)
+
+
+def value_area(hist, coverage=VOL_COVERAGE):
+    """POC/VAL/VAH as offsets into `hist` (same rule as the old sort-and-loop)."""
+    poc = int(np.argmax(hist))
+    order = np.argsort(-hist, kind='stable')
+    cum = np.cumsum(hist[order])
+    k = int(np.searchsorted(cum, coverage * cum[-1]))
+    inc = order[:k + 1]
+    return poc, int(inc.min()), int(inc.max())
+
+
+def volume_imbalance(prices, volumes):
+    ret = np.diff(prices)
+    up = volumes[1:][ret > 0].sum()
+    dn = volumes[1:][ret < 0].sum()
+    return (up - dn) / (up + dn) if (up + dn) > 0 else 0.0
+
+
+def profile_from_histogram(lo, hist, price_step=PRICE_STEP, coverage=VOL_COVERAGE, imbalance=0.0):
+    if hist.size == 0 or hist.sum() <= 0:
+        return None
+    poc_i, val_i, vah_i = value_area(hist, coverage)
+    width_i = vah_i - val_i
+    skew = (poc_i - (val_i + vah_i) / 2) / width_i if width_i > 0 else 0
+    return VolumeProfile(
+        poc=(lo + poc_i) * price_step,
+        vah=(lo + vah_i) * price_step,
+        val=(lo + val_i) * price_step,
+        width=width_i * price_step,
+        skew=skew,
+        imbalance=imbalance,
+    )
+
+
+# === PROFILE ===
+def calc_volume_profile(ticks, price_step=PRICE_STEP, coverage=VOL_COVERAGE):
+    if ticks is None or len(ticks) == 0:
+        return None
+    prices = tick_prices(ticks)
+    volumes = tick_volumes(ticks)
+    lo, hist = profile_histogram(prices, volumes, price_step)
+    return profile_from_histogram(lo, hist, price_step, coverage,
+                                  volume_imbalance(prices, volumes))
+
+
+def calc_skew(ticks, price_step=PRICE_STEP, return_poc=False):
+    vp = calc_volume_profile(ticks, price_step)
+    if vp is None:
+        return (None, None) if return_poc else None
+    return (vp.skew, vp.poc) if return_poc else vp.skew
+
+
+# === MANY BARS ===
+def bar_profiles(ticks, starts, ends, price_step=PRICE_STEP, coverage=VOL_COVERAGE):
+    """calc_volume_profile() of ticks[starts[i]:ends[i]] for every i at once.
+
+    Returns a dict of float arrays (poc, vah, val, width, skew, imbalance), NaN
+    for bars without ticks. Same rules and tie-breaks as the single-bar path.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    n = len(starts)
+    out = {k: np.full(n, np.nan) for k in VolumeProfile.__slots__}
+    counts = np.maximum(ends - starts, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return out
+    first = np.cumsum(counts) - counts
+    group = np.repeat(np.arange(n), counts)
+    s_ne, e_ne = starts[counts > 0], ends[counts > 0]
+    lo, hi = int(s_ne.min()), int(e_ne.max())
+    prices, vols = tick_prices(ticks[lo:hi]), tick_volumes(ticks[lo:hi])
+    if not np.array_equal(s_ne[1:], e_ne[:-1]) or s_ne[0] != lo:   # bars don't tile one tick range
+        take = np.repeat(starts - lo, counts) + (np.arange(total) - np.repeat(first, counts))
+        prices, vols = prices[take], vols[take]
+
+    # up/down volume between consecutive ticks of the same bar
+    ret = np.diff(prices)
+    same = group[1:] == group[:-1]
+    up_m, dn_m = same & (ret > 0), same & (ret < 0)
+    up = np.bincount(group[1:][up_m], weights=vols[1:][up_m], minlength=n)
+    dn = np.bincount(group[1:][dn_m], weights=vols[1:][dn_m], minlength=n)
+
+    # per-bar histograms laid end to end (what profile_histogram builds one bar
+    # at a time), reduced to the non-empty bins: entries sorted by (bar, bin)
+    bins = price_index(prices, price_step)
+    full = np.flatnonzero(counts)
+    bar_lo = np.full(n, 0, dtype=np.int64)
+    bar_lo[full] = np.minimum.reduceat(bins, first[full])
+    width = np.zeros(n, dtype=np.int64)
+    width[full] = np.maximum.reduceat(bins, first[full]) - bar_lo[full] + 1
+    offset = np.cumsum(width) - width
+    hist = np.bincount(offset[group] + bins - bar_lo[group], weights=vols, minlength=int(width.sum()))
+    nz = np.flatnonzero(hist)
+    g = np.repeat(np.arange(n), width)[nz]
+    b = nz - offset[g] + bar_lo[g]
+    v = hist[nz]
+
+    # value area: bins by volume desc (ties: lower bin first) until coverage
+    order = np.lexsort((-v, g))   # stable, so equal volumes keep ascending bins
+    g, b, v = g[order], b[order], v[order]
+    head = np.flatnonzero(np.concatenate(([True], g[1:] != g[:-1])))
+    gid = np.repeat(np.arange(len(head)), np.diff(np.append(head, len(g))))
+    cum = np.cumsum(v)
+    cum -= (cum[head] - v[head])[gid]
+    target = coverage * np.add.reduceat(v, head)
+    reached = cum >= target[gid]
+    k = np.diff(np.append(head, len(g))) - np.add.reduceat(reached.astype(np.int64), head)
+    inc = (np.arange(len(g)) - head[gid]) <= k[gid]
+    val_b = np.minimum.reduceat(np.where(inc, b, np.iinfo(np.int64).max), head)
+    vah_b = np.maximum.reduceat(np.where(inc, b, np.iinfo(np.int64).min), head)
+    poc_b = b[head]
+
+    rows = g[head]
+    width_b = vah_b - val_b
+    out['poc'][rows] = poc_b * price_step
+    out['vah'][rows] = vah_b * price_step
+    out['val'][rows] = val_b * price_step
+    out['width'][rows] = width_b * price_step
+    safe = np.where(width_b > 0, width_b, 1)
+    out['skew'][rows] = np.where(width_b > 0, (poc_b - (val_b + vah_b) / 2) / safe, 0.0)
+    ud = up[rows] + dn[rows]
+    out['imbalance'][rows] = np.where(ud > 0, (up[rows] - dn[rows]) / np.where(ud > 0, ud, 1), 0.0)
+    return out
@@ -0,0 +1,190 @@
+import os
+import atexit
+import logging
+import threading
+from datetime import datetime, date, timezone
+
+import numpy as np
+import pandas as pd
+
+from mt5_wrapper import mt5, BACKEND, now
+
+# === CONFIG ===
+# simulator runs (replays, benchmarks) journal historical dates: keep them out of the live files
+JOURNAL_ROOT   = os.environ.get("VP_JOURNAL_ROOT", os.path.join("journal", "sim") if BACKEND == "sim" else "journal")
+FLUSH_INTERVAL = 1.0     # seconds between background writes
+FLUSH_ROWS     = 4096    # buffered events that trigger an early write
+DAY_MS         = 86_400_000
+
+KINDS = ('signal', 'order', 'fill', 'reject', 'sl', 'exit', 'profile')
+KIND  = {k: i for i, k in enumerate(KINDS)}
+
+# Fixed-width records, appended raw to one <root>/YYYY-MM-DD.events file per
+# UTC day (by event time). Unused numeric fields are NaN / 0. Per kind:
+#   signal   side, value=confidence, note=strategy
+#   order    the request as submitted: side, price, volume, sl, tp, ticket=position (closes/SLTP)
+#   fill     entry filled: price/volume from the broker, ticket=order, retcode, attempts, latency
+#   sl       stop moved: ticket=position, sl, tp
+#   exit     position closed: ticket=position, price, volume, note=reason
+#   reject   any order that did not go through, note=gateway status
+#   profile  bar volume profile: price=POC, low=VAL, high=VAH, value=skew
+EVENT_DTYPE = np.dtype([
+    ('time_msc', '<i8'), ('kind', 'u1'), ('side', 'i1'), ('attempts', '<i2'), ('retcode', '<i4'),
+    ('symbol', 'S16'), ('ticket', '<i8'), ('magic', '<i8'),
+    ('price', '<f8'), ('volume', '<f8'), ('sl', '<f8'), ('tp', '<f8'),
+    ('low', '<f8'), ('high', '<f8'), ('value', '<f8'), ('latency_ms', '<f4'), ('note', 'S32'),
+])
+NAN = float('nan')
+
+
+def _side(request):
+    t = request.get('type')
+    return 1 if t == mt5.ORDER_TYPE_BUY else -1 if t == mt5.ORDER_TYPE_SELL else 0
+
+
+def _bytes(s, width):
+    return s.encode('utf-8', 'replace')[:width] if s else b''
+
+
+# === WRITER ===
+# record() only appends a tuple to an in-memory list; a background thread turns
+# the list into one structured array per flush and appends it to the day file,
+# so the trading loop never touches the disk.
+class Journal:
+    def __init__(self, root=JOURNAL_ROOT, flush_interval=FLUSH_INTERVAL, flush_rows=FLUSH_ROWS):
+        self.root = root
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.written = 0
+        self._rows = []
+        self._lock = threading.Lock()
+        self._io = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='journal', daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    # --- events ---
+    def record(self, kind, symbol='', side=0, ticket=0, magic=0, price=NAN, volume=NAN, sl=NAN, tp=NAN,
+               low=NAN, high=NAN, value=NAN, retcode=0, attempts=0, latency=NAN, note='', time_msc=None):
+        """Buffer one event; `latency` in seconds, `time_msc` defaults to the broker clock."""
+        if time_msc is None:
+            time_msc = int(now().timestamp() * 1000)
+        row = (time_msc, KIND[kind], side, attempts, retcode or 0, symbol, ticket or 0, magic or 0,
+               price, volume, sl, tp, low, high, value, latency * 1e3, note)
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.flush_rows
+        if full:
+            self._wake.set()
+
+    def signal(self, symbol, side, confidence=NAN, note=''):
+        self.record('signal', symbol, 1 if side == "BUY" else -1 if side == "SELL" else 0,
+                    value=confidence, note=note)
+
+    def order(self, request):
+        """The request as it leaves the strategy (OrderGateway.submit)."""
+        self.record('order', request.get('symbol', ''), _side(request), request.get('position', 0),
+                    request.get('magic', 0), request.get('price', NAN), request.get('volume', NAN),
+                    request.get('sl', NAN), request.get('tp', NAN), note=request.get('comment', ''))
+
+    def outcome(self, o):
+        """The final state of a gateway order (an OrderOutcome)."""
+        req, res = o.request, o.result
+        position = req.get('position', 0)
+        if not o.ok:
+            kind, note = 'reject', o.status
+        elif req.get('action') == mt5.TRADE_ACTION_SLTP:
+            kind, note = 'sl', req.get('comment', '')
+        else:
+            kind, note = ('exit' if position else 'fill'), req.get('comment', '')
+        price = getattr(res, 'price', 0) or req.get('price', NAN)
+        volume = getattr(res, 'volume', 0) or req.get('volume', NAN)
+        ticket = position or getattr(res, 'order', 0)
+        self.record(kind, req.get('symbol', ''), _side(req), ticket, req.get('magic', 0), price, volume,
+                    req.get('sl', NAN), req.get('tp', NAN), retcode=o.retcode, attempts=o.attempts,
+                    latency=o.latency, note=note)
+
+    # --- files ---
+    def path(self, day):
+        return os.path.join(self.root, day.strftime("%Y-%m-%d") + ".events")
+
+    def flush(self):
+        """Write everything buffered so far (also called by the background thread)."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        arr = np.array([r[:5] + (_bytes(r[5], 16),) + r[6:16] + (_bytes(r[16], 32),) for r in rows],
+                       dtype=EVENT_DTYPE)
+        days = arr['time_msc'] // DAY_MS
+        with self._io:
+            os.makedirs(self.root, exist_ok=True)
+            for day in np.unique(days):
+                part = arr[days == day]
+                with open(self.path(datetime.fromtimestamp(day * 86400, tz=timezone.utc)), 'ab') as f:
+                    torn = f.tell() % EVENT_DTYPE.itemsize   # a record cut short by a crash
+                    if torn:
+                        f.truncate(f.tell() - torn)
+                        f.seek(0, os.SEEK_END)
+                    f.write(part.tobytes())
+            self.written += len(arr)
+        return len(arr)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:   # a full disk must not take the bot down with it
+                logging.exception("Journal flush failed")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._worker.join()
+        self.flush()
+
+
+_journal = None
+_lock = threading.Lock()
+
+def get_journal(root=JOURNAL_ROOT):
+    """Process-wide journal, started on first use."""
+    global _journal
+    if _journal is None or _journal.root != root:
+        with _lock:
+            if _journal is None or _journal.root != root:
+                _journal = Journal(root)
+    return _journal
+
+
+# === READER ===
+def read_day(day=None, root=JOURNAL_ROOT):
+    """Every event of one UTC day (date, datetime, 'YYYY-MM-DD' or None for today) as a DataFrame.
+
+    Columns follow EVENT_DTYPE with 'time' as a UTC timestamp, 'kind' as a
+    categorical and 'side' as BUY / SELL / ''. A record torn by a crash at the
+    end of the file is ignored.
+    """
+    if day is None:
+        day = now().date()
+    elif isinstance(day, str):
+        day = date.fromisoformat(day)
+    path = os.path.join(root, day.strftime("%Y-%m-%d") + ".events")
+    if os.path.exists(path):
+        raw = np.fromfile(path, dtype=EVENT_DTYPE, count=os.path.getsize(path) // EVENT_DTYPE.itemsize)
+    else:
+        raw = np.empty(0, EVENT_DTYPE)
+
+    df = pd.DataFrame({name: raw[name] for name in EVENT_DTYPE.names})
+    df.insert(0, 'time', pd.to_datetime(raw['time_msc'], unit='ms', utc=True))
+    df['kind'] = pd.Categorical.from_codes(raw['kind'].astype(np.int16), KINDS)
+    df['side'] = np.select([raw['side'] > 0, raw['side'] < 0], ['BUY', 'SELL'], '')
+    for name in ('symbol', 'note'):
+        df[name] = np.char.decode(raw[name], 'utf-8', 'replace') if len(raw) else np.empty(0, dtype=object)
+    return df.sort_values('time_msc', kind='stable').reset_index(drop=True)
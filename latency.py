@@ -0,0 +1,218 @@
+import os
+import json
+import logging
+import time as ptime
+from datetime import datetime, timezone
+
+import numpy as np
+
+# === CONFIG ===
+SUB_BITS        = 5       # 32 sub-buckets per power of two: values within ~3% of exact
+MAX_BITS        = 40      # largest recordable value ~2^40 us (12 days); larger ones are clamped
+REPORT_INTERVAL = 300     # seconds between summaries from maybe_report()
+DUMP_FILE       = os.environ.get("VP_LATENCY_FILE", "latency.jsonl")
+PERCENTILES     = (50, 90, 99, 99.9)
+
+_SUB = 1 << SUB_BITS
+_BUCKETS = (MAX_BITS - SUB_BITS + 2) * _SUB
+
+
+def _index(us):
+    """Log-linear bucket of a value in whole microseconds (exact below 2**SUB_BITS)."""
+    if us < _SUB:
+        return us if us > 0 else 0
+    shift = us.bit_length() - SUB_BITS - 1
+    return min((shift + 1) * _SUB + (us >> shift) - _SUB, _BUCKETS - 1)
+
+
+def _bucket_values():
+    """Midpoint in microseconds of every bucket, for percentiles and means."""
+    idx = np.arange(_BUCKETS)
+    shift = np.maximum(idx // _SUB - 1, 0)
+    low = np.where(idx < _SUB, idx, (idx % _SUB + _SUB) << shift)
+    return low + np.where(idx < 2 * _SUB, 0, (1 << shift) / 2)
+
+
+_VALUES = _bucket_values()
+
+
+# === HISTOGRAM ===
+# HDR-style: a fixed array of counts over log-linear buckets, so recording is
+# one integer index and one increment however many samples come in, memory
+# stays constant and histograms of the same layout add up.
+class Histogram:
+    __slots__ = ('counts', 'n', 'total', 'low', 'high')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.counts = [0] * _BUCKETS
+        self.n = 0
+        self.total = 0
+        self.low = None
+        self.high = 0
+
+    def record(self, us):
+        us = int(us)
+        self.counts[_index(us)] += 1
+        self.n += 1
+        self.total += us
+        if self.low is None or us < self.low:
+            self.low = us
+        if us > self.high:
+            self.high = us
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.n += other.n
+        self.total += other.total
+        if other.low is not None and (self.low is None or other.low < self.low):
+            self.low = other.low
+        self.high = max(self.high, other.high)
+
+    def percentile(self, q):
+        """Value in microseconds below which q% of the samples fall (bucket midpoint)."""
+        if self.n == 0:
+            return float('nan')
+        cum = np.cumsum(self.counts)
+        i = int(np.searchsorted(cum, q / 100 * self.n, side='left'))
+        return float(min(max(_VALUES[i], self.low), self.high))
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n else float('nan')
+
+    def stats(self, percentiles=PERCENTILES):
+        out = {'count': self.n, 'mean': self.mean, 'min': self.low, 'max': self.high}
+        for q in percentiles:
+            out[f'p{q:g}'] = self.percentile(q)
+        return out
+
+    def to_dict(self):
+        """Sparse form for dumps: {bucket index: count} plus the exact extremes."""
+        nz = {i: c for i, c in enumerate(self.counts) if c}
+        return {'n': self.n, 'total': self.total, 'low': self.low, 'high': self.high, 'buckets': nz}
+
+    @classmethod
+    def from_dict(cls, d):
+        h = cls()
+        for i, c in d['buckets'].items():
+            h.counts[int(i)] = c
+        h.n, h.total, h.low, h.high = d['n'], d['total'], d['low'], d['high']
+        return h
+
+
+# === SPANS ===
+class _Span:
+    __slots__ = ('hist', 't0')
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = ptime.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.record((ptime.perf_counter_ns() - self.t0) // 1000)
+        return False
+
+
+# === RECORDER ===
+# Named histograms for the stages of a hot path. `with timings.stage('rates'):`
+# costs a microsecond or two; maybe_report() logs a summary and appends the
+# interval's histograms to a JSON-lines dump every `interval` seconds, then
+# starts a fresh interval. Stages are not locked: time each one from a single
+# thread.
+class LatencyRecorder:
+    def __init__(self, interval=REPORT_INTERVAL, path=DUMP_FILE):
+        self.interval = interval
+        self.path = path
+        self.hists = {}
+        self._started = ptime.time()
+
+    def hist(self, name):
+        h = self.hists.get(name)
+        if h is None:
+            h = self.hists[name] = Histogram()
+        return h
+
+    def stage(self, name):
+        """Context manager timing its block into stage `name`."""
+        return _Span(self.hist(name))
+
+    def timed(self, name=None):
+        """Decorator timing every call of a function into stage `name` (default: its name)."""
+        def wrap(fn):
+            h = self.hist(name or fn.__name__)
+            def inner(*args, **kwargs):
+                with _Span(h):
+                    return fn(*args, **kwargs)
+            inner.__name__, inner.__doc__, inner.__wrapped__ = fn.__name__, fn.__doc__, fn
+            return inner
+        return wrap
+
+    def record(self, name, seconds):
+        """Add a duration measured elsewhere (e.g. how late after bar close a cycle started)."""
+        self.hist(name).record(max(seconds, 0.0) * 1e6)
+
+    # --- reporting ---
+    def summary(self):
+        """One line per stage: count, mean and percentiles in milliseconds."""
+        lines = []
+        for name, h in self.hists.items():
+            if h.n == 0:
+                continue
+            s = h.stats()
+            pct = " ".join(f"p{q:g}={s[f'p{q:g}'] / 1e3:.2f}" for q in PERCENTILES)
+            lines.append(f"{name:<14} n={h.n:<6} mean={h.mean / 1e3:.2f} {pct} max={h.high / 1e3:.2f} ms")
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        """Append the current interval to the JSON-lines file (histograms reload with Histogram.from_dict)."""
+        path = path or self.path
+        rec = {'start': datetime.fromtimestamp(self._started, tz=timezone.utc).isoformat(),
+               'end': datetime.now(timezone.utc).isoformat(),
+               'stages': {name: h.to_dict() for name, h in self.hists.items() if h.n}}
+        with open(path, 'a') as f:
+            f.write(json.dumps(rec) + "\n")
+
+    def reset(self):
+        for h in self.hists.values():   # in place: decorated functions hold their histogram
+            h.clear()
+        self._started = ptime.time()
+
+    def report(self):
+        """Log the summary, dump the interval and start a new one."""
+        text = self.summary()
+        if text:
+            logging.info("Stage latency (ms)\n" + text)
+            self.dump()
+        self.reset()
+
+    def maybe_report(self):
+        """Call once per cycle: report() every `interval` seconds."""
+        if ptime.time() - self._started < self.interval:
+            return False
+        self.report()
+        return True
+
+
+def load_dump(path=DUMP_FILE):
+    """{stage: Histogram} merged over every interval in a dump file."""
+    out = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for name, d in json.loads(line)['stages'].items():
+                h = Histogram.from_dict(d)
+                if name in out:
+                    out[name].merge(h)
+                else:
+                    out[name] = h
+    return out
+
+
+timings = LatencyRecorder()
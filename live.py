@@ -1,11 +1,14 @@
-import MetaTrader5 as mt5
+from mt5_wrapper import mt5
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from datetime import datetime, timedelta
-import time
+from datetime import datetime, timedelta, timezone
 import os
 
+from journal import get_journal
+from runtime.bar_clock import BarCloseDispatcher
+from indicators.volume_profile import profile_histogram, profile_from_histogram, tick_prices, tick_volumes
+
 # === CONFIG ===
 SYMBOL = "BTCUSDm"              # Change to "XAUUSDm" for gold
 LOT_SIZE = 0.1
@@ -20,44 +23,26 @@ if not mt5.initialize():
     raise RuntimeError("MT5 init failed")
 
 print(f"📡 Connected to MT5 for {SYMBOL}")
-log_path = "vp_log.csv"
+journal = get_journal()
 
 # === VOLUME PROFILE FUNCTION ===
-def calc_volume_profile(df_ticks):
-    df = df_ticks.copy()
-    df['price'] = (df['bid'] + df['ask']) / 2
-    df['bin'] = (df['price'] / PRICE_STEP).round() * PRICE_STEP
-    vp = df.groupby('bin')['volume'].sum().sort_index()
-    return vp
+def calc_volume_profile(ticks):
+    return profile_histogram(tick_prices(ticks), tick_volumes(ticks), PRICE_STEP)
 
 # === VALUE AREA & SKEW CALCULATION ===
-def get_skew(vp):
-    if vp.empty:
-        return None, None, None
-    poc = vp.idxmax()
-    total = vp.sum()
-    sorted_vp = vp.sort_values(ascending=False)
-    cum = 0.0
-    included = []
-    for price, vol in sorted_vp.items():
-        cum += vol
-        included.append(price)
-        if cum >= total * VOL_COVERAGE:
-            break
-    val = min(included)
-    vah = max(included)
-    mid = (val + vah) / 2
-    width = vah - val
-    skew = (poc - mid) / width if width > 0 else 0
-    return poc, (val, vah), skew
+def get_skew(lo, hist):
+    vp = profile_from_histogram(lo, hist, PRICE_STEP, VOL_COVERAGE)
+    if vp is None:
+        return None, (None, None), None
+    return vp.poc, (vp.val, vp.vah), vp.skew
 
 # === PLOT FUNCTION ===
-def plot_vp(vp, candle_time, poc, val_range, ohlc, skew):
+def plot_vp(lo, hist, candle_time, poc, val_range, ohlc, skew):
     from matplotlib.ticker import FuncFormatter
 
-    vp = vp.sort_index()
-    prices = vp.index.values
-    volumes = vp.values
+    nz = np.flatnonzero(hist)
+    prices = (lo + nz) * PRICE_STEP
+    volumes = hist[nz]
 
     fig, ax = plt.subplots(figsize=(6, 10))
     ax.barh(prices, volumes, height=PRICE_STEP * 0.9, color='skyblue', label='Volume')
@@ -88,15 +73,16 @@ def plot_vp(vp, candle_time, poc, val_range, ohlc, skew):
 
 # === LIVE MONITORING LOOP ===
 print("🚀 Starting live Volume Profile monitor...")
+bar_clock = BarCloseDispatcher(SYMBOL)
 while True:
-    now = datetime.utcnow()
-    start = now.replace(second=0, microsecond=0)
+    # A candle is done when the first tick of the next one arrives (broker time, not the local clock)
+    bar_clock.poll()
+    if not bar_clock.closed:
+        bar_clock.wait()
+        continue
+    start = datetime.fromtimestamp(bar_clock.closed[-1], tz=timezone.utc)
     end = start + timedelta(minutes=1)
 
-    # Wait until this candle ends
-    while datetime.utcnow() < end:
-        time.sleep(0.5)
-
     # === Fetch candle and ticks ===
     bars = mt5.copy_rates_range(SYMBOL, TIMEFRAME, start, end)
     if bars is None or len(bars) == 0:
@@ -111,21 +97,20 @@ while True:
     }
 
     ticks = mt5.copy_ticks_range(SYMBOL, start, end, mt5.COPY_TICKS_ALL)
-    df_ticks = pd.DataFrame(ticks)
-    if df_ticks.empty:
+    if ticks is None or len(ticks) == 0:
         print("⚠️ No ticks found.")
         continue
 
     # === Generate Volume Profile + Metrics ===
-    vp = calc_volume_profile(df_ticks)
-    poc, (val, vah), skew = get_skew(vp)
+    lo, hist = calc_volume_profile(ticks)
+    poc, (val, vah), skew = get_skew(lo, hist)
     if poc is None:
         continue
 
     # === Plot & Save ===
-    plot_vp(vp, start.strftime("%H:%M"), poc, (val, vah), ohlc, skew)
+    plot_vp(lo, hist, start.strftime("%H:%M"), poc, (val, vah), ohlc, skew)
 
-    with open(log_path, "a") as f:
-        f.write(f"{start},{poc},{val},{vah},{skew:.4f}\n")
+    journal.record('profile', SYMBOL, price=poc, low=val, high=vah, value=skew,
+                   time_msc=int(start.timestamp() * 1000))
 
     print(f"✅ {start.strftime('%H:%M')} | POC={poc} | VAL={val} | VAH={vah} | SKEW={skew:.4f}")
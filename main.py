@@ -1,18 +1,36 @@
 # main.py
 from strategy.entry_logic import check_entry
 from strategy.executor import execute_trade
+from order_gateway import get_gateway
+from journal import get_journal
+from ml_model.model_loader import get_model
 from mt5_wrapper import get_latest_data, connect_to_mt5, shutdown
+from runtime.scheduler import SymbolScheduler
 from config import SYMBOLS
+from sessions import SESSIONS
 
 connect_to_mt5()
+get_model()   # load the booster before the first scan
 
-for symbol in SYMBOLS:
-    df = get_latest_data(symbol)
-    result = check_entry(df, symbol)
+# fetch + entry check for all symbols at once, orders go out one by one;
+# nothing is fetched outside config.TRADING_SESSIONS
+if SESSIONS.is_open():
+    scanner = SymbolScheduler(SYMBOLS, get_latest_data, lambda symbol, df: check_entry(df, symbol))
+    results, report = scanner.cycle()
+    print(report)
 
-    if result:
-        signal, confidence = result
-        print(f"{symbol} Entry: {signal} @ {confidence}")
-        execute_trade(symbol, signal)
+    for symbol in SYMBOLS:
+        result = results.get(symbol)
 
+        if result:
+            signal, confidence = result
+            print(f"{symbol} Entry: {signal} @ {confidence}")
+            get_journal().signal(symbol, signal, confidence, 'main.py')
+            execute_trade(symbol, signal)
+
+    scanner.close()
+else:
+    print("⏳ Outside trading sessions, nothing to scan")
+get_gateway().close()   # let queued orders finish before disconnecting
+get_journal().close()
 shutdown()
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+from indicators.atr import calculate_atr
+from indicators.common import column
+from indicators.volume_profile import bar_profiles, calc_volume_profile
+from tick_store import bar_slices
+
+# === CONFIG ===
+# Shared by ml.py (training) and ml_model/model_loader.py (inference).
+PRICE_STEP = 0.01
+ATR_PERIOD = 14
+POC_LAG    = 3      # bars back for poc_delta_3 (the label horizon in ml.py)
+
+FEATURES = ['poc', 'vah', 'val', 'va_width', 'va_skew', 'mom', 'atr',
+            'poc_delta_1', 'poc_delta_3', 'vol_imbalance']
+LABELS = ('SELL', 'HOLD', 'BUY')
+
+
+def bar_times(bars):
+    """Bar open times in epoch seconds from MT5 rates or a DataFrame with datetime 'time'."""
+    t = bars['time']
+    if isinstance(t, pd.Series) and pd.api.types.is_datetime64_any_dtype(t):
+        return t.to_numpy(dtype='datetime64[s]').astype(np.int64)
+    return np.asarray(t, dtype=np.int64)
+
+
+# === LIVE ROW ===
+def latest_features(bars, ticks, price_step=PRICE_STEP, atr_period=ATR_PERIOD, lag=POC_LAG):
+    """FEATURES for the last bar of `bars` as a float32 vector, or None without enough data.
+
+    `ticks` must cover at least the last lag + 1 bars.
+    """
+    n = len(bars)
+    if n < max(atr_period, lag + 1) or ticks is None or len(ticks) == 0:
+        return None
+    atr = calculate_atr(bars, atr_period)
+    atr = float(atr.iloc[-1] if isinstance(atr, pd.Series) else atr[-1])
+    if np.isnan(atr):
+        return None
+
+    times = bar_times(bars)[n - lag - 1:]
+    starts, ends = bar_slices(ticks, times)
+    profiles = [calc_volume_profile(ticks[s:e], price_step) for s, e in zip(starts, ends)]
+    if any(vp is None for vp in profiles):
+        return None
+    vp = profiles[-1]
+    o, c = column(bars, 'open')[-1], column(bars, 'close')[-1]
+    return np.array([vp.poc, vp.vah, vp.val, vp.width, vp.skew, (c - o) / o, atr,
+                     vp.poc - profiles[-2].poc, vp.poc - profiles[0].poc, vp.imbalance], dtype=np.float32)
+
+
+# === TRAINING MATRIX ===
+def feature_matrix(bars, ticks, horizon=POC_LAG, threshold=0.0003, price_step=PRICE_STEP,
+                   atr_period=ATR_PERIOD, chunk=50_000):
+    """Labelled feature rows for every bar, all as array operations.
+
+    Same rows as the old per-bar loop in ml.py: bars without ticks or ATR are
+    skipped, POC deltas are taken across the remaining rows, rows with NaNs
+    dropped, labels 0=SELL 1=HOLD 2=BUY on the `horizon`-bar forward return.
+    Ticks are profiled `chunk` bars at a time to bound memory.
+    """
+    times = bar_times(bars)
+    o = column(bars, 'open')
+    c = column(bars, 'close')
+    atr = np.asarray(calculate_atr(bars, atr_period), dtype=np.float64)
+    starts, ends = bar_slices(ticks, times)
+
+    n = max(len(times) - horizon, 0)
+    prof = {k: np.empty(n) for k in ('poc', 'vah', 'val', 'width', 'skew', 'imbalance')}
+    for lo in range(0, n, chunk):
+        hi = min(lo + chunk, n)
+        part = bar_profiles(ticks, starts[lo:hi], ends[lo:hi], price_step)
+        for k in prof:
+            prof[k][lo:hi] = part[k]
+
+    keep = ~np.isnan(prof['poc']) & ~np.isnan(atr[:n])
+    poc = prof['poc'][keep]
+    fut_ret = ((c[horizon:horizon + n] - o[:n]) / o[:n])[keep]
+    df = pd.DataFrame({
+        'time':          pd.to_datetime(times[:n][keep], unit='s'),
+        'poc':           poc,
+        'vah':           prof['vah'][keep],
+        'val':           prof['val'][keep],
+        'va_width':      prof['width'][keep],
+        'va_skew':       prof['skew'][keep],
+        'mom':           ((c[:n] - o[:n]) / o[:n])[keep],
+        'atr':           atr[:n][keep],
+        'vol_imbalance': prof['imbalance'][keep],
+        'fut_ret':       fut_ret,
+    })
+    df['poc_delta_1'] = _lag_diff(poc, 1)
+    df['poc_delta_3'] = _lag_diff(poc, horizon)
+    df.dropna(inplace=True)
+    r = df['fut_ret'].to_numpy()
+    df['label'] = np.where(r > threshold, 2, np.where(r < -threshold, 0, 1))
+    return df
+
+
+def _lag_diff(x, k):
+    out = np.full(len(x), np.nan)
+    out[k:] = x[k:] - x[:-k]
+    return out
@@ -0,0 +1,83 @@
+import os
+import threading
+import time as ptime
+from datetime import datetime, timezone
+
+import numpy as np
+import xgboost as xgb
+
+from mt5_wrapper import mt5
+from ml_model.features import FEATURES, LABELS, POC_LAG, latest_features, bar_times
+
+# === CONFIG ===
+ROOT       = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_FILE = os.environ.get("VP_MODEL_FILE", os.path.join(ROOT, "xgb_volume_profile_advanced.json"))
+NTHREAD    = 1     # single rows: thread fan-out costs more than it saves
+
+
+# === SERVICE ===
+# The booster is loaded once and kept warm; scoring goes through
+# inplace_predict on a contiguous float32 array, skipping DMatrix and
+# DataFrame construction. Rows are in FEATURES order; a model trained on a
+# subset (the older 9-feature xgb_volume_profile.json) gets its columns picked
+# by name.
+class ModelService:
+    def __init__(self, path=MODEL_FILE, nthread=NTHREAD):
+        self.path = path
+        self.booster = xgb.Booster()
+        self.booster.load_model(path)
+        self.booster.set_param({'nthread': nthread})
+        names = self.booster.feature_names or FEATURES[:self.booster.num_features()]
+        missing = [f for f in names if f not in FEATURES]
+        if missing:
+            raise ValueError(f"{path}: unknown features {missing}")
+        cols = [FEATURES.index(f) for f in names]
+        self.columns = None if cols == list(range(len(FEATURES))) else np.array(cols)
+        self.predict(np.zeros((1, len(FEATURES)), dtype=np.float32))   # warm-up: first call builds caches
+
+    def predict(self, X):
+        """Class probabilities (n, 3) in LABELS order for an (n, len(FEATURES)) matrix."""
+        X = np.asarray(X, dtype=np.float32)
+        if self.columns is not None:
+            X = X[:, self.columns]
+        out = self.booster.inplace_predict(np.ascontiguousarray(X), validate_features=False)
+        return out.reshape(len(X), -1)
+
+    def predict_one(self, row):
+        return self.predict(np.asarray(row, dtype=np.float32)[None, :])[0]
+
+    def latency(self, n=1000):
+        """Mean single-row predict time in microseconds."""
+        row = np.zeros(len(FEATURES), dtype=np.float32)
+        t0 = ptime.perf_counter()
+        for _ in range(n):
+            self.predict_one(row)
+        return (ptime.perf_counter() - t0) / n * 1e6
+
+
+_service = None
+_lock = threading.Lock()
+
+def get_model(path=MODEL_FILE):
+    """Process-wide ModelService, loaded on first use (call at startup to pay the load up front)."""
+    global _service
+    if _service is None or _service.path != path:
+        with _lock:
+            if _service is None or _service.path != path:
+                _service = ModelService(path)
+    return _service
+
+
+# === STRATEGY HOOK ===
+def predict_trade(bars, symbol):
+    """{'SELL': p, 'HOLD': p, 'BUY': p} for the last bar of `bars`, or None without enough data."""
+    times = bar_times(bars)
+    if len(times) <= POC_LAG:
+        return None
+    start = datetime.fromtimestamp(int(times[-POC_LAG - 1]), tz=timezone.utc)
+    end = datetime.fromtimestamp(int(times[-1]) + 60, tz=timezone.utc)
+    ticks = mt5.copy_ticks_range(symbol, start, end, mt5.COPY_TICKS_ALL)
+    row = latest_features(bars, ticks)
+    if row is None:
+        return None
+    return dict(zip(LABELS, get_model().predict_one(row).tolist()))
@@ -0,0 +1,265 @@
+import os
+import json
+import argparse
+import time as ptime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from ml_model.features import FEATURES, ATR_PERIOD, POC_LAG, feature_matrix
+from tick_store import TickStore
+
+# === CONFIG ===
+SYMBOL       = "XAUUSDm"
+TIMEFRAME    = "M1"
+BAR_SECONDS  = 60
+N_CANDLES    = 60 * 1440   # bars of history to tune on
+N_SPLITS     = 5           # walk-forward folds, each testing on the block after its training data
+TEST_FRAC    = 0.1         # share of rows per test block
+VALID_FRAC   = 0.2         # tail of each training window held out (purged) for early stopping
+PURGE        = POC_LAG     # bars: labels look this far ahead, so train rows this close to the test block go
+EMBARGO      = ATR_PERIOD  # extra bars of gap: features look back this far into the training window
+MAX_BIN      = 256
+MAX_ROUNDS   = 400         # caps model size: single-row inference stays around a millisecond
+EARLY_STOP   = 30
+N_TRIALS     = 40
+SEED         = 42
+OUT_DIR      = "tuning"
+MODEL_FILE   = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "xgb_volume_profile_advanced.json")   # what model_loader serves
+
+SPACE = {
+    'max_depth':        [3, 4, 5, 6],
+    'eta':              [0.01, 0.03, 0.05, 0.1],
+    'subsample':        [0.6, 0.7, 0.8, 1.0],
+    'colsample_bytree': [0.6, 0.7, 0.8, 1.0],
+    'min_child_weight': [1, 5, 10, 25],
+    'alpha':            [0, 0.01, 0.1, 1.0],
+    'lambda':           [1, 1.5, 2, 5],
+}
+BASE_PARAMS = {'objective': 'multi:softprob', 'num_class': 3, 'tree_method': 'hist',
+               'max_bin': MAX_BIN, 'eval_metric': 'mlogloss'}
+
+
+# === SPLITS ===
+def purged_splits(times, n_splits=N_SPLITS, test_frac=TEST_FRAC, purge=PURGE, embargo=EMBARGO,
+                  bar_seconds=BAR_SECONDS):
+    """Expanding walk-forward (train_hi, test_lo, test_hi) row bounds over time-sorted rows.
+
+    Training is rows [0, train_hi); rows whose bar opens within purge + embargo
+    bars of the test block are dropped so neither labels nor lookback features
+    straddle the boundary.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    n = len(times)
+    size = int(n * test_frac)
+    splits = []
+    for k in range(n_splits, 0, -1):
+        test_lo, test_hi = n - k * size, n - (k - 1) * size
+        if test_lo <= 0 or size == 0:
+            continue
+        gap = times[test_lo] - (purge + embargo) * bar_seconds
+        train_hi = int(np.searchsorted(times, gap, side='left'))
+        if train_hi > 0:
+            splits.append((train_hi, test_lo, test_hi))
+    return splits
+
+
+def early_stop_split(times, train_hi, valid_frac=VALID_FRAC, purge=PURGE, embargo=EMBARGO,
+                     bar_seconds=BAR_SECONDS):
+    """(fit_hi, valid_lo): rows [0, fit_hi) fit the trees, [valid_lo, train_hi) pick the round count.
+
+    The validation tail is purged from the fitting rows like a test block, so
+    early stopping never sees the fold's test rows nor leaks into its own fit.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    valid_lo = train_hi - int(train_hi * valid_frac)
+    if valid_lo >= train_hi:
+        return 0, train_hi
+    gap = times[valid_lo] - (purge + embargo) * bar_seconds
+    return int(np.searchsorted(times[:valid_lo], gap, side='left')), valid_lo
+
+
+def fold_bounds(times, splits, valid_frac=VALID_FRAC):
+    """(fit_hi, valid_lo, valid_hi, test_lo, test_hi) per split; folds without fitting rows are dropped."""
+    folds = []
+    for train_hi, test_lo, test_hi in splits:
+        fit_hi, valid_lo = early_stop_split(times, train_hi, valid_frac)
+        if fit_hi > 0:
+            folds.append((fit_hi, valid_lo, train_hi, test_lo, test_hi))
+    return folds
+
+
+def class_weights(y):
+    """Per-row weights that give each label the same total weight (instead of downsampling HOLD)."""
+    counts = np.bincount(y, minlength=3).astype(np.float64)
+    per_class = np.where(counts > 0, len(y) / (3 * np.maximum(counts, 1)), 0.0)
+    return per_class[y]
+
+
+def sample_params(trial, space=SPACE, seed=SEED):
+    """Candidate `trial`, reproducible from (seed, trial) so a resumed run asks the same questions."""
+    rng = np.random.default_rng([seed, trial])
+    return {name: values[int(rng.integers(len(values)))] for name, values in space.items()}
+
+
+# === WORKERS ===
+# X / y are written once as .npy files and mmap'd by every worker. Each worker
+# quantizes every fold (fit rows, early-stopping tail, test block) into
+# QuantileDMatrix objects once at start-up and reuses them for all the
+# candidates it evaluates.
+_folds = None
+_nthread = 1
+
+
+def _init_worker(workdir, folds, nthread):
+    global _folds, _nthread
+    _nthread = nthread
+    X = np.load(os.path.join(workdir, "X.npy"), mmap_mode='r')
+    y = np.load(os.path.join(workdir, "y.npy"))
+    _folds = []
+    for fit_hi, valid_lo, valid_hi, test_lo, test_hi in folds:
+        y_fit, y_valid = y[:fit_hi], y[valid_lo:valid_hi]
+        dtrain = xgb.QuantileDMatrix(np.ascontiguousarray(X[:fit_hi]), y_fit, weight=class_weights(y_fit),
+                                     max_bin=MAX_BIN, feature_names=FEATURES, nthread=nthread)
+        dvalid = xgb.QuantileDMatrix(np.ascontiguousarray(X[valid_lo:valid_hi]), y_valid,
+                                     weight=class_weights(y_valid), ref=dtrain, feature_names=FEATURES,
+                                     nthread=nthread)
+        dtest = xgb.QuantileDMatrix(np.ascontiguousarray(X[test_lo:test_hi]), y[test_lo:test_hi],
+                                    ref=dtrain, feature_names=FEATURES, nthread=nthread)
+        _folds.append((dtrain, dvalid, dtest, y[test_lo:test_hi]))
+
+
+def fold_metrics(prob, y):
+    """mlogloss, accuracy and balanced accuracy (mean per-class recall) of class probabilities."""
+    p = np.clip(prob[np.arange(len(y)), y], 1e-15, 1.0)
+    pred = prob.argmax(axis=1)
+    recalls = [(pred[y == c] == c).mean() for c in range(3) if (y == c).any()]
+    return {'mlogloss': float(-np.log(p).mean()), 'accuracy': float((pred == y).mean()),
+            'balanced_accuracy': float(np.mean(recalls)),
+            'pred_share': np.bincount(pred, minlength=3).tolist()}
+
+
+def _trial(trial, params):
+    t0 = ptime.perf_counter()
+    cfg = {**BASE_PARAMS, **params, 'nthread': _nthread, 'seed': SEED}
+    folds = []
+    for dtrain, dvalid, dtest, y in _folds:
+        bst = xgb.train(cfg, dtrain, num_boost_round=MAX_ROUNDS, evals=[(dvalid, 'valid')],
+                        early_stopping_rounds=EARLY_STOP, verbose_eval=False)
+        # the test block played no part in fitting or stopping
+        prob = bst.predict(dtest, iteration_range=(0, bst.best_iteration + 1))
+        folds.append({'best_iteration': int(bst.best_iteration), **fold_metrics(prob, y)})
+    return {'trial': trial, 'params': params, 'folds': folds,
+            'mlogloss': float(np.mean([f['mlogloss'] for f in folds])),
+            'balanced_accuracy': float(np.mean([f['balanced_accuracy'] for f in folds])),
+            'rounds': int(np.median([f['best_iteration'] + 1 for f in folds])),
+            'seconds': ptime.perf_counter() - t0}
+
+
+# === TUNING ===
+def _fingerprint(df, folds):
+    return {'rows': len(df), 'first': str(df['time'].iloc[0]), 'last': str(df['time'].iloc[-1]),
+            'folds': [list(f) for f in folds], 'features': FEATURES}
+
+
+def load_trials(out_dir):
+    path = os.path.join(out_dir, "trials.jsonl")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def tune(df, n_trials=N_TRIALS, out_dir=OUT_DIR, workers=None, splits=None):
+    """Run (or resume) the search; returns the trial records sorted best first.
+
+    Every finished trial is appended to out_dir/trials.jsonl, so an interrupted
+    run picks up with the trials it has not finished.
+    """
+    df = df.sort_values('time').reset_index(drop=True)
+    times = df['time'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    splits = purged_splits(times) if splits is None else splits
+    folds = fold_bounds(times, splits)
+    if not folds:
+        raise ValueError(f"{len(df)} rows is too short for one purged split")
+
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, "meta.json")
+    meta = _fingerprint(df, folds)
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) != meta:
+                raise ValueError(f"{out_dir} holds trials for a different dataset; use another --out")
+    else:
+        with open(meta_path, "w") as f:
+            json.dump(meta, f, indent=1)
+
+    done = {r['trial']: r for r in load_trials(out_dir)}
+    todo = [t for t in range(n_trials) if t not in done]
+    if todo:
+        np.save(os.path.join(out_dir, "X.npy"), df[FEATURES].to_numpy(dtype=np.float32))
+        np.save(os.path.join(out_dir, "y.npy"), df['label'].to_numpy(dtype=np.int64))
+        workers = max(1, min(workers or os.cpu_count(), len(todo)))
+        nthread = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(out_dir, folds, nthread)) as pool, \
+                open(os.path.join(out_dir, "trials.jsonl"), "a") as log:
+            futures = [pool.submit(_trial, t, sample_params(t)) for t in todo]
+            for fut in as_completed(futures):
+                rec = fut.result()
+                done[rec['trial']] = rec
+                log.write(json.dumps(rec) + "\n")
+                log.flush()
+                print(f"trial {rec['trial']:3d} | mlogloss {rec['mlogloss']:.4f} | "
+                      f"bal.acc {rec['balanced_accuracy']:.3f} | rounds {rec['rounds']} | {rec['seconds']:.1f}s")
+        for name in ("X.npy", "y.npy"):
+            os.remove(os.path.join(out_dir, name))
+    return sorted(done.values(), key=lambda r: r['mlogloss'])
+
+
+def fit_final(df, record, path=MODEL_FILE):
+    """Train the chosen candidate on every row for its median early-stopped round count and save it."""
+    df = df.sort_values('time')
+    y = df['label'].to_numpy(dtype=np.int64)
+    dall = xgb.QuantileDMatrix(df[FEATURES].to_numpy(dtype=np.float32), y, weight=class_weights(y),
+                               max_bin=MAX_BIN, feature_names=FEATURES)
+    bst = xgb.train({**BASE_PARAMS, **record['params'], 'seed': SEED}, dall, num_boost_round=record['rounds'])
+    bst.save_model(path)
+    return bst
+
+
+def build_dataset(symbol=SYMBOL, candles=N_CANDLES, store=None):
+    store = store or TickStore()
+    bars = store.last_bars(symbol, TIMEFRAME, candles + POC_LAG)
+    if len(bars) == 0:
+        raise SystemExit(f"No {TIMEFRAME} bars for {symbol} in MT5 or the local cache")
+    ticks = store.ticks(symbol, int(bars['time'][0]), int(bars['time'][-1]) + BAR_SECONDS)
+    return feature_matrix(bars, ticks)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Walk-forward XGBoost tuning for the volume-profile model")
+    ap.add_argument("--symbol", default=SYMBOL)
+    ap.add_argument("--candles", type=int, default=N_CANDLES)
+    ap.add_argument("--trials", type=int, default=N_TRIALS)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--out", default=OUT_DIR, help="trial records; rerun with the same dir to resume")
+    ap.add_argument("--save", default=None, help=f"write the best model here (e.g. {os.path.basename(MODEL_FILE)})")
+    args = ap.parse_args()
+
+    t0 = ptime.perf_counter()
+    df = build_dataset(args.symbol, args.candles)
+    print(f"{len(df)} rows, labels {df['label'].value_counts().sort_index().to_dict()} "
+          f"({ptime.perf_counter() - t0:.1f}s)")
+    records = tune(df, args.trials, args.out, args.workers)
+
+    pd.set_option('display.width', 200)
+    table = pd.DataFrame([{**r['params'], 'mlogloss': r['mlogloss'], 'balanced_accuracy': r['balanced_accuracy'],
+                           'rounds': r['rounds']} for r in records])
+    print(table.head(10).to_string())
+    print(f"{len(records)} trials in {ptime.perf_counter() - t0:.1f}s")
+    if args.save:
+        fit_final(df, records[0], args.save)
+        print(f"Saved best model to {args.save}")
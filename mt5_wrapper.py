@@ -1,7 +1,64 @@
-import MetaTrader5 as mt5
+import os
+import time as ptime
+import numpy as np
 import pandas as pd
 import pytz
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+# === BROKER BACKEND ===
+# Scripts do `from mt5_wrapper import mt5` instead of importing MetaTrader5.
+# MT5_BACKEND=sim swaps in the offline SimTerminal (sim_terminal.py), which
+# replays the local tick store with the same function names, records and
+# retcodes. Settings: MT5_SIM_ROOT, MT5_SIM_START / MT5_SIM_END (YYYY-MM-DD or
+# epoch seconds), MT5_SIM_LATENCY_MS, MT5_SIM_BALANCE. Hosts without the
+# MetaTrader5 package (Linux CI/backtest boxes) always get the simulator.
+BACKEND = os.environ.get("MT5_BACKEND", "mt5").lower()
+if BACKEND != "sim":
+    try:
+        import MetaTrader5 as mt5
+    except ImportError:
+        BACKEND = "sim"
+
+
+def _sim_time(value):
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+def sim_terminal(**overrides):
+    """A SimTerminal configured from the MT5_SIM_* environment variables."""
+    from sim_terminal import SimTerminal
+    from tick_store import DATA_ROOT
+    kwargs = dict(
+        root=os.environ.get("MT5_SIM_ROOT", DATA_ROOT),
+        start=_sim_time(os.environ.get("MT5_SIM_START")),
+        end=_sim_time(os.environ.get("MT5_SIM_END")),
+        latency_ms=int(os.environ.get("MT5_SIM_LATENCY_MS", "0")),
+        balance=float(os.environ.get("MT5_SIM_BALANCE", "10000")),
+    )
+    kwargs.update(overrides)
+    return SimTerminal(**kwargs)
+
+
+if BACKEND == "sim":
+    mt5 = sim_terminal()
+
+
+def sleep(seconds):
+    """time.sleep on a live terminal, a clock advance on the simulator."""
+    if BACKEND == "sim":
+        mt5.sleep(seconds)
+    else:
+        ptime.sleep(seconds)
+
+
+def now():
+    """Current UTC time as the terminal sees it."""
+    return mt5.now() if BACKEND == "sim" else datetime.now(timezone.utc)
+
 
 # 🟢 Connect to Exness account
 def connect_to_mt5():
@@ -33,3 +90,44 @@ def get_latest_data(symbol, timeframe=mt5.TIMEFRAME_M1, bars=100):
 # 🔴 Close connection
 def shutdown():
     mt5.shutdown()
+
+# 🔁 Incremental tick feed: only returns ticks newer than the last one seen
+class TickCursor:
+    def __init__(self, symbol, start_msc=None, batch=10000):
+        self.symbol = symbol
+        self.batch = batch
+        if start_msc is None:
+            last = mt5.symbol_info_tick(symbol)
+            start_msc = (last.time_msc // 60000) * 60000 if last else 0   # start of the forming bar
+        self.last_msc = start_msc - 1
+        self.seen_at_last = None   # ticks already consumed that share last_msc (None: all of them, the start bound)
+
+    def poll(self):
+        chunks = []
+        count = self.batch
+        while True:
+            date_from = datetime.fromtimestamp(max(self.last_msc, 0) // 1000, tz=timezone.utc)
+            ticks = mt5.copy_ticks_from(self.symbol, date_from, count, mt5.COPY_TICKS_ALL)
+            if ticks is None or len(ticks) == 0:
+                break
+            msc = ticks['time_msc']
+            first = int(np.searchsorted(msc, self.last_msc, side='left'))
+            after = int(np.searchsorted(msc, self.last_msc, side='right'))
+            # skip ticks stamped with last_msc that were already handed out
+            new = ticks[after if self.seen_at_last is None else min(first + self.seen_at_last, after):]
+            if len(new) == 0:
+                if len(ticks) < count:
+                    break
+                count *= 2   # the whole batch was old ticks from the same second
+                continue
+            chunks.append(new)
+            last = int(new['time_msc'][-1])
+            n_last = int(np.count_nonzero(new['time_msc'] == last))
+            self.seen_at_last = self.seen_at_last + n_last if last == self.last_msc else n_last
+            self.last_msc = last
+            if len(ticks) < count:
+                break
+            count = self.batch
+        if not chunks:
+            return None
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
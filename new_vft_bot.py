@@ -1,8 +1,14 @@
-import MetaTrader5 as mt5
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta, time, timezone
-import time as ptime
+from datetime import datetime, time, timezone
+
+from indicators.rolling_profile import BarVolumeProfile
+from indicators.atr import calculate_atr
+from indicators.volume_baseline import VolumeBaseline, SEED_BARS
+from mt5_wrapper import mt5
+from runtime.bar_clock import BarCloseDispatcher
+from order_gateway import get_gateway
+from sessions import window, spreads
 
 # === CONFIGURATION ===
 LOGIN            = 240512732
@@ -17,28 +23,9 @@ SKEW_THRESHOLD   = 0.1
 VOL_SPIKE_FACTOR = 1.5
 TRADING_START    = time(0, 0)         # UTC
 TRADING_END      = time(20, 55)       # UTC
+SESSION          = window(TRADING_START, TRADING_END)
 MAGIC            = 123456
-
-# === SKEW CALCULATION ===
-def calc_skew(df_ticks):
-    if df_ticks.empty:
-        return None
-    df = df_ticks.copy()
-    df['price'] = (df['bid'] + df['ask']) / 2
-    df['volume'] = df['volume'].replace(0, 1)
-    df['bin'] = (df['price'] / PRICE_STEP).round() * PRICE_STEP
-    vp = df.groupby('bin')['volume'].sum().sort_index()
-    if vp.empty:
-        return None
-    poc = vp.idxmax()
-    total = vp.sum(); cum = 0.0; included = []
-    for price, vol in vp.sort_values(ascending=False).items():
-        cum += vol; included.append(price)
-        if cum >= 0.7 * total:
-            break
-    val = min(included); vah = max(included)
-    width = vah - val; mid = (val + vah) / 2
-    return (poc - mid) / width if width > 0 else 0
+POLL_INTERVAL    = 0.25               # seconds between tick polls mid-bar
 
 # === MT5 INIT ===
 def initialize():
@@ -49,6 +36,7 @@ def initialize():
 
 # === SHUTDOWN ===
 def shutdown():
+    get_gateway().close()   # let queued orders finish before disconnecting
     mt5.shutdown()
     print("🔌 MT5 shutdown")
 
@@ -56,34 +44,40 @@ def shutdown():
 def main():
     initialize()
 
-    # Estimate tick volume threshold
-    bars = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, 200)
-    avg_tick_vol = pd.DataFrame(bars)['tick_volume'].mean()
-    tick_threshold = avg_tick_vol * VOL_SPIKE_FACTOR
-    print(f"📊 Avg ticks: {avg_tick_vol:.0f} | Threshold: {tick_threshold:.0f}")
+    # Tick volume baseline per time of day: seeded once, then fed every closed bar
+    baseline = VolumeBaseline()
+    baseline.sync(mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, SEED_BARS))
+    print(f"📊 Tick baseline seeded from {baseline.n} bars")
 
+    bar_clock = BarCloseDispatcher(SYMBOL, idle_poll=POLL_INTERVAL)   # wakes on the new bar's first tick
+    bar_profile = BarVolumeProfile(PRICE_STEP)
     while True:
-        # Wait till next candle opens
-        now = datetime.now(timezone.utc)
-        next_min = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
-        ptime.sleep(max((next_min - datetime.now(timezone.utc)).total_seconds(), 0))
+        # Stream ticks until the next candle opens
+        ticks = bar_clock.poll()
+        spreads.update(SYMBOL, ticks)
+        closed = bar_profile.update(ticks)
+        if not closed:
+            bar_clock.wait()
+            continue
+        bar_open, vp = closed[-1]
 
-        bar_time = next_min - timedelta(minutes=1)
-        if not (TRADING_START <= bar_time.time() <= TRADING_END):
+        if not SESSION.is_open(bar_open):
             print("⏳ Outside trading hours")
             continue
+        if not spreads.ok(SYMBOL):
+            print(f"↔️ Spread {spreads.last(SYMBOL):.0f} pts above its recent range")
+            continue
 
-        # Fetch latest bar
-        bars = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, ATR_PERIOD+1)
+        # Fetch latest bars (and any the baseline missed outside trading hours)
+        bars = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, max(ATR_PERIOD + 1, baseline.missing(bar_open)))
         df = pd.DataFrame(bars)
         if len(df) < ATR_PERIOD + 1:
             print("❌ Not enough bars")
             continue
+        tick_threshold = baseline.sync(bars) * VOL_SPIKE_FACTOR
 
         # Calculate ATR
-        df['tr'] = df[['high','low','close']].apply(
-            lambda r: max(r['high'] - r['low'], abs(r['high'] - r['close']), abs(r['low'] - r['close'])), axis=1)
-        df['atr'] = df['tr'].rolling(ATR_PERIOD).mean()
+        df['atr'] = calculate_atr(df, ATR_PERIOD)
         atr = df['atr'].iloc[-1]
         if pd.isna(atr):
             print("ATR not ready")
@@ -92,24 +86,20 @@ def main():
         bar = df.iloc[-1]
         tick_volume = bar['tick_volume']
         print(f"\n🕐 Processing bar at {datetime.fromtimestamp(bar['time'], tz=timezone.utc)}")
-        print(f"ATR: {atr:.2f} | Tick Volume: {tick_volume}")
+        print(f"ATR: {atr:.2f} | Tick Volume: {tick_volume} | Threshold: {tick_threshold:.0f}")
 
-        if tick_volume < tick_threshold:
+        if not tick_volume >= tick_threshold:   # NaN until the baseline has enough bars
             print("🔇 Tick volume too low")
             continue
 
-        # Fetch ticks
-        start = datetime.fromtimestamp(bar['time'], tz=timezone.utc)
-        end = start + timedelta(minutes=1)
-        ticks = mt5.copy_ticks_range(SYMBOL, start, end, mt5.COPY_TICKS_ALL)
-        df_ticks = pd.DataFrame(ticks)
-        if df_ticks.empty:
+        # Profile streamed from the ticks of the closed candle
+        if vp is None:
             print("❌ No tick data")
             continue
 
-        skew = calc_skew(df_ticks)
+        skew = vp.skew
         print(f"Skew: {skew:.4f}")
-        if skew is None or abs(skew) < SKEW_THRESHOLD:
+        if abs(skew) < SKEW_THRESHOLD:
             print("⛔ Skew too low")
             continue
 
@@ -143,8 +133,9 @@ def main():
             "type_filling": mt5.ORDER_FILLING_IOC
         }
 
-        result = mt5.order_send(request)
-        print(f"📤 {side} at {price:.2f} | SL={sl:.2f} | TP={tp:.2f} | retcode={result.retcode}")
+        get_gateway().submit(request, lambda o, side=side: print(
+            f"📤 {side} at {o.request['price']:.2f} | SL={o.request['sl']:.2f} | TP={o.request['tp']:.2f}"
+            f" | retcode={o.retcode} | {o.latency * 1e3:.0f}ms"))
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,228 @@
+import logging
+import queue
+import threading
+import time as ptime
+from collections import deque
+from concurrent.futures import Future
+from datetime import timedelta
+
+import numpy as np
+
+from mt5_wrapper import mt5, BACKEND, sleep, now
+from symbol_cache import specs
+from journal import get_journal
+from portfolio_risk import get_risk
+
+# === CONFIG ===
+MAX_RETRIES     = 3       # requote retries per order, each with a fresh price
+RETRY_DELAY     = 0.05    # seconds before the first retry, doubled per attempt
+CLOSED_BACKOFF  = 60      # seconds a symbol is skipped after 'market closed'
+CLOSED_BACKOFF_MAX = 900  # back-off doubles on consecutive 10018s up to this
+LATENCY_WINDOW  = 1000    # completed orders kept for latency stats
+
+RETCODE_REQUOTE       = 10004
+RETCODE_PLACED        = 10008
+RETCODE_DONE          = 10009
+RETCODE_DONE_PARTIAL  = 10010
+RETCODE_MARKET_CLOSED = 10018
+RETCODE_PRICE_CHANGED = 10020
+RETCODE_PRICE_OFF     = 10021
+
+FILLED  = {RETCODE_PLACED, RETCODE_DONE, RETCODE_DONE_PARTIAL}
+REQUOTE = {RETCODE_REQUOTE, RETCODE_PRICE_CHANGED, RETCODE_PRICE_OFF}
+
+
+# === FILLING ===
+def filling_for(info):
+    """ORDER_FILLING_* the symbol accepts: IOC, else FOK, else RETURN (SYMBOL_FILLING_* bitmask)."""
+    mode = getattr(info, 'filling_mode', 0) if info is not None else 0
+    if mode & 2:
+        return mt5.ORDER_FILLING_IOC
+    if mode & 1:
+        return mt5.ORDER_FILLING_FOK
+    return mt5.ORDER_FILLING_RETURN
+
+
+def reprice(request, tick):
+    """Copy of a market request at the current quote, SL/TP shifted by the same amount."""
+    price = tick.ask if request.get('type') == mt5.ORDER_TYPE_BUY else tick.bid
+    out = dict(request, price=price)
+    shift = price - request.get('price', price)
+    for key in ('sl', 'tp'):
+        if out.get(key):
+            out[key] = out[key] + shift
+    return out
+
+
+# === RESULTS ===
+class OrderOutcome:
+    __slots__ = ('request', 'result', 'status', 'attempts', 'queued', 'latency')
+
+    def __init__(self, request, result, status, attempts, queued, latency):
+        self.request = request
+        self.result = result
+        self.status = status        # filled | rejected | market_closed | blocked
+        self.attempts = attempts    # order_send round trips (0 when skipped during back-off)
+        self.queued = queued        # seconds between submit() and the first order_send
+        self.latency = latency      # seconds from the decision (submit) to the final retcode
+
+    @property
+    def retcode(self):
+        return self.result.retcode if self.result is not None else None
+
+    @property
+    def ok(self):
+        return self.status == 'filled'
+
+    def __repr__(self):
+        return (f"{self.request.get('symbol')} {self.status} retcode={self.retcode} "
+                f"attempts={self.attempts} {self.latency * 1e3:.0f}ms")
+
+
+# === GATEWAY ===
+# Orders go into a queue and a worker thread talks to the broker, so the signal
+# loop only pays for a put(). Requotes are retried with a refreshed price, a
+# 'market closed' reply parks the symbol for a growing back-off (further orders
+# for it fail fast without a round trip), DEAL requests get the filling mode the
+# symbol supports, and every order's decision-to-fill latency is recorded.
+# Each request and its final outcome go to the event journal (journal.py).
+# New entries pass the portfolio risk check (portfolio_risk.py) first, which
+# may cut their volume or block them without a round trip.
+# On the simulator orders run inline in the caller so replays stay reproducible
+# on the virtual clock.
+class OrderGateway:
+    def __init__(self, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY,
+                 closed_backoff=CLOSED_BACKOFF, threaded=None, journal=None, risk=None):
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.closed_backoff = closed_backoff
+        self.threaded = BACKEND != "sim" if threaded is None else threaded
+        self.journal = journal if journal is not None else get_journal()
+        self.risk = risk if risk is not None else get_risk()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = deque(maxlen=LATENCY_WINDOW)
+        self._closed = {}      # symbol -> (reopen check time, current back-off seconds)
+        self._queue = queue.Queue()
+        self._worker = None
+        if self.threaded:
+            self._worker = threading.Thread(target=self._run, name='order-gateway', daemon=True)
+            self._worker.start()
+
+    # --- public ---
+    def submit(self, request, on_done=None):
+        """Queue an order; returns a Future resolving to its OrderOutcome."""
+        job = Future()
+        if on_done is not None:
+            job.add_done_callback(lambda f: f.exception() or on_done(f.result()))
+        submitted = ptime.perf_counter()
+        self.journal.order(request)
+        checked, reason = self.risk.check(request)
+        if checked is None:
+            logging.warning(f"{request.get('symbol')}: order blocked - {reason}")
+            outcome = OrderOutcome(request, None, 'blocked', 0, 0.0, ptime.perf_counter() - submitted)
+            self.outcomes.append(outcome)
+            self.journal.outcome(outcome)
+            job.set_result(outcome)
+            return job
+        item = (checked, job, submitted)
+        if self.threaded:
+            self._queue.put(item)
+        else:
+            self._execute(*item)
+        return job
+
+    def send(self, request):
+        """Blocking submit() for callers that need the result (e.g. scripts, tests)."""
+        return self.submit(request).result()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def closed_until(self, symbol):
+        entry = self._closed.get(symbol)
+        return entry[0] if entry else None
+
+    def latency_stats(self):
+        """Decision-to-final-retcode latency in ms over the recent window."""
+        if not self.latencies:
+            return {}
+        ms = np.asarray(self.latencies) * 1e3
+        return {'count': len(ms), 'mean': float(ms.mean()), 'p50': float(np.percentile(ms, 50)),
+                'p95': float(np.percentile(ms, 95)), 'max': float(ms.max())}
+
+    def close(self, wait=True):
+        if self._worker is not None:
+            self._queue.put(None)
+            if wait:
+                self._worker.join()
+            self._worker = None
+
+    # --- worker ---
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._execute(*item)
+
+    def _execute(self, request, job, submitted):
+        try:
+            outcome = self._attempt(request, submitted)
+        except Exception as e:   # never let one order kill the worker
+            logging.exception(f"Order gateway error on {request.get('symbol')}")
+            job.set_exception(e)
+            return
+        finally:
+            self.risk.settle(request)
+        self.latencies.append(outcome.latency)
+        self.outcomes.append(outcome)
+        self.journal.outcome(outcome)
+        job.set_result(outcome)
+
+    def _attempt(self, request, submitted):
+        symbol = request.get('symbol')
+        reopen = self.closed_until(symbol)
+        if reopen is not None and now() < reopen:
+            return OrderOutcome(request, None, 'market_closed', 0, 0.0, ptime.perf_counter() - submitted)
+
+        if request.get('action') == mt5.TRADE_ACTION_DEAL:
+            request = dict(request, type_filling=filling_for(specs.get(symbol)))
+        queued = ptime.perf_counter() - submitted
+        attempts, delay = 0, self.retry_delay
+        while True:
+            result = mt5.order_send(request)
+            attempts += 1
+            retcode = result.retcode if result is not None else None
+
+            if retcode == RETCODE_MARKET_CLOSED:
+                self._park(symbol)
+                return OrderOutcome(request, result, 'market_closed', attempts, queued,
+                                    ptime.perf_counter() - submitted)
+            self._closed.pop(symbol, None)
+            if retcode in FILLED:
+                return OrderOutcome(request, result, 'filled', attempts, queued, ptime.perf_counter() - submitted)
+            if retcode not in REQUOTE or attempts > self.max_retries \
+                    or request.get('action') != mt5.TRADE_ACTION_DEAL:
+                return OrderOutcome(request, result, 'rejected', attempts, queued, ptime.perf_counter() - submitted)
+
+            sleep(delay)
+            delay *= 2
+            tick = mt5.symbol_info_tick(symbol)
+            if tick is not None:
+                request = reprice(request, tick)
+
+    def _park(self, symbol):
+        prev = self._closed.get(symbol)
+        backoff = min(prev[1] * 2, CLOSED_BACKOFF_MAX) if prev else self.closed_backoff
+        self._closed[symbol] = (now() + timedelta(seconds=backoff), backoff)
+        logging.warning(f"{symbol}: market closed, backing off {backoff}s")
+
+
+gateway = None
+
+def get_gateway():
+    """Process-wide gateway, started on first use."""
+    global gateway
+    if gateway is None:
+        gateway = OrderGateway()
+    return gateway
@@ -0,0 +1,244 @@
+import logging
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+
+from mt5_wrapper import mt5, now
+from symbol_cache import specs
+from config import RISK_PER_TRADE, MAX_OPEN_RISK, STOP_AFTER_LOSSES
+
+# === CONFIG ===
+BOOK_TTL         = 1.0    # seconds (terminal clock) an account/positions snapshot is reused between orders
+UNPROTECTED_MOVE = 0.01   # adverse move, as a fraction of price, charged as the risk of anything without a stop
+MAX_MARGIN_USE   = 0.5    # share of equity the book's margin may reach
+DEAL_ENTRY_CLOSING = (1, 2, 3)   # DEAL_ENTRY_OUT / INOUT / OUT_BY: deals that realise a profit or loss
+
+
+def risk_lots(balance, sl_distance, value, volume_min, volume_step, volume_max, risk=RISK_PER_TRADE):
+    """Volumes risking `risk` of balance over sl_distance (price units), snapped down to the volume step.
+
+    `value` is the account-currency value of a 1.0 price move per lot
+    (trade_tick_value / trade_tick_size). Every argument broadcasts, so one
+    call sizes any number of symbols; a zero or unknown stop gets volume_min.
+    """
+    per_lot = np.asarray(sl_distance, dtype=np.float64) * value
+    with np.errstate(divide='ignore', invalid='ignore'):
+        steps = np.floor(np.asarray(balance, dtype=np.float64) * risk / per_lot / volume_step + 1e-9)
+    lots = np.clip(np.where(per_lot > 0, steps * volume_step, volume_min), volume_min, volume_max)
+    return np.round(lots, 8)
+
+
+def value_per_price(info):
+    """Account currency per 1.0 price move per lot."""
+    return info.trade_tick_value / info.trade_tick_size if info.trade_tick_size else 0.0
+
+
+def currencies(info):
+    """(base, profit) currency of a symbol; the base falls back to the name's first three letters."""
+    profit = getattr(info, 'currency_profit', '') or info.name[3:6]
+    return getattr(info, 'currency_base', '') or info.name[:3], profit
+
+
+# === POSITION BOOK ===
+# Every open position as parallel arrays plus the contract columns of its
+# symbol, so risk to stop, margin and notional for the whole account come out
+# of one pass. Contract specs come from symbol_cache and are only read per
+# distinct symbol.
+class PositionBook:
+    __slots__ = ('ticket', 'symbol', 'sign', 'volume', 'price_open', 'price', 'sl', 'magic',
+                 'value', 'margin_initial', 'base', 'quote', 'currencies')
+
+    def __init__(self, positions):
+        positions = [p for p in positions if specs.get(p.symbol) is not None]
+        symbols = sorted({p.symbol for p in positions})
+        row = {s: i for i, s in enumerate(symbols)}
+        self.ticket = np.array([p.ticket for p in positions], dtype=np.int64)
+        self.symbol = np.array([row[p.symbol] for p in positions], dtype=np.int32)
+        self.sign = np.array([1 if p.type == mt5.POSITION_TYPE_BUY else -1 for p in positions], dtype=np.int8)
+        self.volume = np.array([p.volume for p in positions], dtype=np.float64)
+        self.price_open = np.array([p.price_open for p in positions], dtype=np.float64)
+        self.price = np.array([p.price_current for p in positions], dtype=np.float64)
+        self.sl = np.array([p.sl for p in positions], dtype=np.float64)
+        self.magic = np.array([p.magic for p in positions], dtype=np.int64)
+
+        infos = [specs.get(s) for s in symbols]
+        pairs = [currencies(info) for info in infos]
+        self.currencies = sorted({c for pair in pairs for c in pair})
+        ccy = {c: i for i, c in enumerate(self.currencies)}
+        self.value = np.array([value_per_price(info) for info in infos], dtype=np.float64)[self.symbol]
+        self.margin_initial = np.array([info.margin_initial for info in infos], dtype=np.float64)[self.symbol]
+        self.base = np.array([ccy[b] for b, _ in pairs], dtype=np.int32)[self.symbol]
+        self.quote = np.array([ccy[q] for _, q in pairs], dtype=np.int32)[self.symbol]
+
+    def __len__(self):
+        return len(self.ticket)
+
+    def notional(self):
+        """Position size in account currency at the current price."""
+        return self.volume * self.price * self.value
+
+    def risk(self):
+        """Account currency lost if each position is stopped out, measured from its entry.
+
+        A stop already past the entry locks in profit and counts as 0; a
+        position without a stop is charged UNPROTECTED_MOVE of its notional.
+        """
+        distance = np.where(self.sl > 0, np.maximum(self.sign * (self.price_open - self.sl), 0.0),
+                            self.price * UNPROTECTED_MOVE)
+        return distance * self.value * self.volume
+
+    def margin(self, leverage):
+        """Margin per position: margin_initial per lot where the broker quotes one, else notional / leverage."""
+        return np.where(self.margin_initial > 0, self.margin_initial * self.volume,
+                        self.notional() / max(leverage or 1, 1))
+
+    def exposure(self):
+        """{currency: net exposure in account currency}: long the base and short the profit currency of each buy."""
+        signed = self.sign * self.notional()
+        n = len(self.currencies)
+        net = np.bincount(self.base, signed, n) - np.bincount(self.quote, signed, n)
+        return dict(zip(self.currencies, net.tolist()))
+
+
+RiskSnapshot = namedtuple('RiskSnapshot', ['balance', 'equity', 'positions', 'open_risk', 'margin',
+                                           'notional', 'exposure', 'losses'])
+
+
+# === PORTFOLIO RISK ===
+# The account-level view the lot sizers and the order gateway share. The
+# account, the position book and today's closing deals are re-read at most
+# once per BOOK_TTL, and again after any order of ours completes. check() runs
+# on every new entry before it leaves: trading stops for the day after
+# STOP_AFTER_LOSSES losing closes in a row, and the volume is cut to what
+# RISK_PER_TRADE, MAX_OPEN_RISK (all open positions plus orders still in
+# flight) and MAX_MARGIN_USE allow - below volume_min the order is blocked.
+# Closes, SL/TP changes and other non-entry requests always pass.
+class PortfolioRisk:
+    def __init__(self, risk_per_trade=RISK_PER_TRADE, max_open_risk=MAX_OPEN_RISK,
+                 max_margin_use=MAX_MARGIN_USE, stop_after_losses=STOP_AFTER_LOSSES, ttl=BOOK_TTL):
+        self.risk_per_trade = risk_per_trade
+        self.max_open_risk = max_open_risk
+        self.max_margin_use = max_margin_use
+        self.stop_after_losses = stop_after_losses
+        self.ttl = ttl
+        self.account = None
+        self.book = PositionBook([])
+        self.losses = 0
+        self._stamp = None
+        self._pending = {}       # id(request) -> (risk, margin) of entries accepted but not completed
+        self._lock = threading.Lock()
+
+    # --- state ---
+    def refresh(self, force=False):
+        """Re-read account, positions and the loss streak if the snapshot is older than ttl."""
+        t = now().timestamp()
+        if not force and self._stamp is not None and t - self._stamp < self.ttl:
+            return
+        account = mt5.account_info()
+        if account is None:
+            return
+        self.account = account
+        self.book = PositionBook(mt5.positions_get() or ())
+        self.losses = self._loss_streak()
+        self._stamp = t
+
+    def invalidate(self):
+        self._stamp = None
+
+    def _loss_streak(self):
+        """Losing closing deals in a row since the start of the (UTC) day, newest first."""
+        t = now()
+        day = t.replace(hour=0, minute=0, second=0, microsecond=0)
+        deals = [d for d in mt5.history_deals_get(day, t + timedelta(days=1)) or ()
+                 if d.entry in DEAL_ENTRY_CLOSING]
+        streak = 0
+        for d in sorted(deals, key=lambda d: d.time_msc, reverse=True):
+            if d.profit + getattr(d, 'commission', 0.0) + getattr(d, 'swap', 0.0) >= 0:
+                break
+            streak += 1
+        return streak
+
+    def snapshot(self):
+        """Whole-book risk figures in account currency (open_risk, margin and notional include nothing pending)."""
+        self.refresh()
+        b, acc = self.book, self.account
+        return RiskSnapshot(acc.balance, acc.equity, len(b), float(b.risk().sum()),
+                            float(b.margin(acc.leverage).sum()), float(b.notional().sum()), b.exposure(),
+                            self.losses)
+
+    # --- sizing ---
+    def lots(self, symbols, sl_distances, balance=None, risk=None):
+        """risk_lots() for several symbols at once, contract columns from the spec cache (NaN for unknown symbols)."""
+        if balance is None:
+            self.refresh()
+            balance = self.account.balance
+        infos = [specs.get(s) for s in symbols]
+        col = lambda f: np.array([np.nan if i is None else f(i) for i in infos], dtype=np.float64)
+        return risk_lots(balance, sl_distances, col(value_per_price), col(lambda i: i.volume_min),
+                         col(lambda i: i.volume_step), col(lambda i: i.volume_max),
+                         self.risk_per_trade if risk is None else risk)
+
+    def lot(self, symbol, sl_distance, balance=None, risk=None):
+        """Volume for one entry risking RISK_PER_TRADE of balance with the stop sl_distance away."""
+        return float(self.lots([symbol], [sl_distance], balance, risk)[0])
+
+    # --- pre-trade ---
+    def check(self, request):
+        """(request, '') if it may go out - volume possibly reduced - or (None, reason)."""
+        if request.get('action') != mt5.TRADE_ACTION_DEAL or request.get('position'):
+            return request, ''
+        info = specs.get(request.get('symbol'))
+        if info is None:
+            return request, ''   # the broker rejects unknown symbols itself
+        with self._lock:
+            self.refresh()
+            if self.account is None:
+                return request, ''
+            if self.stop_after_losses and self.losses >= self.stop_after_losses:
+                return None, f"{self.losses} losing trades in a row today"
+
+            acc, book = self.account, self.book
+            price = request.get('price') or (info.ask if request.get('type') == mt5.ORDER_TYPE_BUY else info.bid)
+            sl = request.get('sl') or 0.0
+            value = value_per_price(info)
+            risk_per_lot = (abs(price - sl) if sl else price * UNPROTECTED_MOVE) * value
+            margin_per_lot = info.margin_initial or price * value / max(acc.leverage or 1, 1)
+
+            pending_risk = sum(r for r, _ in self._pending.values())
+            pending_margin = sum(m for _, m in self._pending.values())
+            limits = {
+                'risk per trade': acc.balance * self.risk_per_trade / risk_per_lot if risk_per_lot else np.inf,
+                'open risk': (acc.balance * self.max_open_risk - book.risk().sum() - pending_risk) / risk_per_lot
+                             if risk_per_lot else np.inf,
+                'margin': (acc.equity * self.max_margin_use - book.margin(acc.leverage).sum() - pending_margin)
+                          / margin_per_lot if margin_per_lot else np.inf,
+            }
+            binding = min(limits, key=limits.get)
+            volume = request['volume']
+            if limits[binding] < volume:
+                allowed = np.floor(max(limits[binding], 0.0) / info.volume_step + 1e-9) * info.volume_step
+                if allowed < info.volume_min:
+                    return None, f"{binding} limit leaves {max(limits[binding], 0.0):.4f} lots"
+                logging.info(f"{request['symbol']}: volume {volume} cut to {allowed:g} by the {binding} limit")
+                volume = round(float(allowed), 8)
+                request = dict(request, volume=volume)
+            self._pending[id(request)] = (risk_per_lot * volume, margin_per_lot * volume)
+        return request, ''
+
+    def settle(self, request):
+        """An order accepted by check() has completed: drop it from pending and re-read the book."""
+        with self._lock:
+            self._pending.pop(id(request), None)
+            self._stamp = None
+
+
+_risk = None
+
+def get_risk():
+    """Process-wide portfolio risk, shared by the lot sizers and the order gateway."""
+    global _risk
+    if _risk is None:
+        _risk = PortfolioRisk()
+    return _risk
@@ -1,8 +1,10 @@
-import MetaTrader5 as mt5
+from mt5_wrapper import mt5
 import pandas as pd
 from datetime import datetime, timedelta
 import numpy as np
 
+from backtesting.bar_engine import run_backtest, signal_changes
+
 # === MT5 ACCOUNT CONFIG ===
 LOGIN    = 52278049
 PASSWORD = "c$O1f@g3S@hUqs"
@@ -12,6 +14,7 @@ SYMBOL   = "XAUUSD"
 TIMEFRAME = mt5.TIMEFRAME_M5  # 5-minute
 RR_RATIO = 2.0
 RISK_PER_TRADE = 0.03  # 3%
+LOOKAHEAD = 49  # bars followed after entry (old iloc[i+1:i+50] window)
 
 # === INIT CONNECTION ===
 mt5.initialize(path=MT5_PATH, login=LOGIN, password=PASSWORD, server=SERVER)
@@ -34,60 +37,25 @@ df.set_index('time', inplace=True)
 df['ema_fast'] = df['close'].ewm(span=9).mean()
 df['ema_slow'] = df['close'].ewm(span=21).mean()
 
-df['signal'] = np.where((df['close'] > df['ema_fast']) & (df['ema_fast'] > df['ema_slow']), 'BUY',
-                np.where((df['close'] < df['ema_fast']) & (df['ema_fast'] < df['ema_slow']), 'SELL', None))
-
-entries = []
-results = []
+df['signal'] = np.where((df['close'] > df['ema_fast']) & (df['ema_fast'] > df['ema_slow']), 1,
+                np.where((df['close'] < df['ema_fast']) & (df['ema_fast'] < df['ema_slow']), -1, 0))
 
-for i in range(1, len(df)):
-    row = df.iloc[i]
-    if row['signal'] and df.iloc[i - 1]['signal'] != row['signal']:
-        entry_price = row['close']
-        sl = entry_price - 100 if row['signal'] == 'BUY' else entry_price + 100
-        tp = entry_price + (RR_RATIO * 100) if row['signal'] == 'BUY' else entry_price - (RR_RATIO * 100)
-        entries.append({
-            'entry_time': row.name,
-            'direction': row['signal'],
-            'entry': entry_price,
-            'sl': sl,
-            'tp': tp
-        })
+# entry on every bar where the signal starts or flips, SL 100 / TP RR*100 away
+entries = signal_changes(df['signal'].values)
+entries = entries[entries > 0]
+sl = df['close'].values - 100 * df['signal'].values
+tp = df['close'].values + RR_RATIO * 100 * df['signal'].values
 
 # === SIMULATE TRADES ===
-for trade in entries:
-    entry_index = df.index.get_loc(trade['entry_time'])
-    candles = df.iloc[entry_index + 1:entry_index + 50]  # look 50 candles ahead
-    hit_tp = False
-    hit_sl = False
-
-    for _, candle in candles.iterrows():
-        if trade['direction'] == 'BUY':
-            if candle['low'] <= trade['sl']:
-                hit_sl = True
-                break
-            elif candle['high'] >= trade['tp']:
-                hit_tp = True
-                break
-        else:
-            if candle['high'] >= trade['sl']:
-                hit_sl = True
-                break
-            elif candle['low'] <= trade['tp']:
-                hit_tp = True
-                break
-
-    if hit_tp:
-        results.append(1 * RR_RATIO)  # profit
-    elif hit_sl:
-        results.append(-1)  # loss
+res = run_backtest(df['high'].values, df['low'].values, df['close'].values,
+                   df['signal'].values, sl, tp, max_bars=LOOKAHEAD, entries=entries)
 
 # === REPORT ===
-total = len(results)
-wins = sum(1 for r in results if r > 0)
-losses = total - wins
-net_rr = sum(results)
-winrate = (wins / total) * 100 if total > 0 else 0
+total = res.trades
+wins = res.wins
+losses = res.losses
+net_rr = res.net_r
+winrate = res.win_rate * 100
 
 print("\n🔥 EMA Smart Scalper v3.0 Backtest (Last 30 Days - XAUUSD)")
 print("────────────────────────────────────────────")
@@ -95,3 +63,4 @@ print(f"Total Trades: {total}")
 print(f"Wins: {wins} | Losses: {losses}")
 print(f"Win Rate: {winrate:.2f}%")
 print(f"Net RR Units: {net_rr:.2f}")
+print(f"Max Drawdown: {res.max_drawdown:.2f} R")
@@ -0,0 +1,122 @@
+from collections import deque
+
+import numpy as np
+
+from mt5_wrapper import mt5, TickCursor, sleep, now
+from latency import timings
+
+# === CONFIG ===
+BAR_SECONDS   = 60
+IDLE_POLL     = 0.25    # seconds between tick polls mid-bar
+FAST_POLL     = 0.002   # seconds between quote probes around a bar boundary
+GUARD         = 0.02    # seconds before the estimated boundary that fast probing starts
+FAST_WINDOW   = 2.0     # seconds after the boundary to keep probing before a quiet bar falls back to IDLE_POLL
+OFFSET_WINDOW = 2400    # polls in the rolling clock-offset estimate (~10 minutes at IDLE_POLL)
+
+
+def local_ms():
+    return int(now().timestamp() * 1000)
+
+
+# === SERVER CLOCK ===
+# Ticks carry the broker's time_msc. For each poll that brought new ticks,
+# (local receive time - newest tick time) is the clock offset plus that
+# tick's delivery delay; the minimum over a rolling window is the offset plus
+# the fastest delivery seen, which tracks drift (and a server time zone)
+# without trusting the local clock to be in sync.
+class ServerClock:
+    __slots__ = ('_lags', 'offset_ms')
+
+    def __init__(self, window=OFFSET_WINDOW):
+        self._lags = deque(maxlen=window)
+        self.offset_ms = None
+
+    def observe(self, time_msc, received_ms=None):
+        lag = (local_ms() if received_ms is None else received_ms) - int(time_msc)
+        evicted = self._lags[0] if len(self._lags) == self._lags.maxlen else None
+        self._lags.append(lag)
+        if self.offset_ms is None or lag < self.offset_ms:
+            self.offset_ms = lag
+        elif evicted == self.offset_ms:
+            self.offset_ms = min(self._lags)
+
+    def server_ms(self, local=None):
+        """Estimated server time in epoch ms (the local clock until the first tick arrives)."""
+        return (local_ms() if local is None else local) - (self.offset_ms or 0)
+
+
+# === DISPATCHER ===
+# Streams one symbol's ticks and reports a bar as closed when the first tick
+# of the next bar shows up, keyed on time_msc rather than a local timer.
+# Mid-bar it polls every IDLE_POLL; from GUARD before the boundary (in
+# estimated server time) it probes the quote every FAST_POLL and pulls the
+# ticks as soon as one is newer than the last seen, so the close is reported
+# a few ms after that tick reaches the terminal.
+class BarCloseDispatcher:
+    def __init__(self, symbol, bar_seconds=BAR_SECONDS, cursor=None, clock=None,
+                 idle_poll=IDLE_POLL, fast_poll=FAST_POLL, guard=GUARD, fast_window=FAST_WINDOW):
+        self.symbol = symbol
+        self.bar_ms = bar_seconds * 1000
+        self.cursor = cursor or TickCursor(symbol)
+        self.clock = clock or ServerClock()
+        self.idle_poll = idle_poll
+        self.fast_poll = fast_poll
+        self.guard_ms = guard * 1000
+        self.fast_window_ms = fast_window * 1000
+        self.bar_open = None      # open (epoch seconds, server time) of the forming bar
+        self.last_msc = None
+        self.closed = []          # bar opens closed by the last poll()
+        self.handlers = []
+        self.probes = 0
+
+    def subscribe(self, handler):
+        """handler(bar_open) is called for every bar close, oldest first."""
+        self.handlers.append(handler)
+        return handler
+
+    def _fast(self, server):
+        if self.bar_open is None:
+            return False
+        boundary = (self.bar_open * 1000) + self.bar_ms
+        return boundary - self.guard_ms <= server < boundary + self.fast_window_ms
+
+    def poll(self):
+        """New ticks since the last call (or None); bar closes they reveal go to self.closed and the handlers."""
+        self.closed = []
+        if self.last_msc is not None and self._fast(self.clock.server_ms()):
+            self.probes += 1
+            tick = mt5.symbol_info_tick(self.symbol)
+            if tick is None or tick.time_msc <= self.last_msc:
+                return None
+        ticks = self.cursor.poll()
+        if ticks is None:
+            return None
+        received = local_ms()
+        msc = np.asarray(ticks['time_msc'], dtype=np.int64)
+        self.last_msc = int(msc[-1])
+        self.clock.observe(self.last_msc, received)
+
+        opens = np.unique(msc // self.bar_ms) * (self.bar_ms // 1000)
+        if self.bar_open is not None and int(opens[-1]) != self.bar_open:
+            self.closed = [self.bar_open] + [int(t) for t in opens[:-1] if t > self.bar_open]
+            # time from the new bar's first tick (server clock) to it being seen here
+            first = msc[np.searchsorted(msc, (self.bar_open * 1000) + self.bar_ms)]
+            timings.record('bar_wake', (self.clock.server_ms(received) - first) / 1000)
+        self.bar_open = int(opens[-1])
+        for bar_open in self.closed:
+            for handler in self.handlers:
+                handler(bar_open)
+        return ticks
+
+    def delay(self):
+        """Seconds to sleep before the next poll()."""
+        server = self.clock.server_ms()
+        if self._fast(server):
+            return self.fast_poll
+        if self.bar_open is None:
+            return self.idle_poll
+        until = ((self.bar_open * 1000) + self.bar_ms - self.guard_ms - server) / 1000
+        return min(self.idle_poll, until) if until > 0 else self.idle_poll
+
+    def wait(self):
+        sleep(self.delay())
@@ -0,0 +1,353 @@
+import argparse
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from mt5_wrapper import mt5, TickCursor, sleep, now
+from indicators.streaming import StreamingEMA, StreamingRSI, StreamingATR, RollingMean
+from indicators.rolling_profile import BarVolumeProfile
+from indicators.volume_baseline import VolumeBaseline
+from order_gateway import get_gateway
+from latency import timings
+from runtime.bar_clock import BarCloseDispatcher, ServerClock
+from strategy.trailing import TrailingEngine, SYNC_INTERVAL
+from tick_store import RATE_DTYPE
+from symbol_cache import quotes
+from sessions import spreads
+
+# === CONFIG ===
+POLL_INTERVAL = 0.25    # seconds between tick polls mid-bar
+BAR_SECONDS   = 60
+TIMEFRAME     = mt5.TIMEFRAME_M1
+HISTORY       = 200     # closed bars used to seed the indicators at start
+DEVIATION     = 10
+
+INDICATORS = {'ema': StreamingEMA, 'rsi': StreamingRSI, 'atr': StreamingATR, 'sma': RollingMean,
+              'baseline': VolumeBaseline}
+
+
+Quote = namedtuple('Quote', ['bid', 'ask', 'time_msc'])
+
+
+def indicator(kind, *args, **kwargs):
+    """Hashable spec of a shared indicator, e.g. indicator('ema', 9, adjust=True).
+
+    Strategies asking for the same spec on the same symbol share one instance.
+    """
+    return (kind, args, tuple(sorted(kwargs.items())))
+
+
+def _build(spec):
+    kind, args, kwargs = spec
+    return INDICATORS[kind](*args, **dict(kwargs))
+
+
+# === STRATEGY ===
+# Base class for plug-ins. Declare what is needed as class attributes and
+# override the hooks; the engine feeds every strategy from the same data:
+#   symbols       symbols to trade (empty: all of the engine's symbols)
+#   indicators    {name: indicator(...)}, values arrive in BarEvent.values
+#   profile_step  price step of the per-bar volume profile (None: no profile)
+#   magic         magic number of its orders and positions
+#   trail         (trigger, distance[, min_interval]) in points: its positions'
+#                 stops are trailed on every quote by a TrailingEngine
+class Strategy:
+    name = None
+    symbols = ()
+    indicators = {}
+    profile_step = None
+    magic = 0
+    trail = None
+
+    def on_start(self, engine):
+        self.engine = engine
+
+    def on_tick(self, symbol, ticks):
+        """New ticks (TICK_DTYPE rows) of `symbol` since the last poll."""
+
+    def on_bar(self, event):
+        """A bar of event.symbol closed (BarEvent)."""
+
+    def on_stop(self):
+        pass
+
+
+class BarEvent:
+    __slots__ = ('symbol', 'time', 'bar', 'values', 'profile')
+
+    def __init__(self, symbol, time, bar, values, profile):
+        self.symbol = symbol
+        self.time = time          # bar open, epoch seconds
+        self.bar = bar            # RATE_DTYPE row built from the ticks
+        self.values = values      # {name: indicator value on this bar}
+        self.profile = profile    # VolumeProfile of the bar at the strategy's price step, or None
+
+
+# === FEED ===
+# Everything derived from one symbol's tick stream: the forming bar, the
+# shared indicators (one instance per spec) and the bar profiles (one per
+# price step). Bars are built from the ticks the way the terminal builds them
+# (bid OHLC, tick_volume = number of ticks), so a closed bar costs no
+# copy_rates call. The bar in progress at start-up is taken from the terminal
+# and the stream starts after its latest tick, so that bar keeps its real
+# open and tick count; its profile only covers part of it and is not handed
+# out.
+class _Feed:
+    __slots__ = ('symbol', 'stream', 'bar_seconds', 'indicators', 'profiles', 'forming', 'partial',
+                 'tick', 'tick_strategies', 'bar_strategies')
+
+    def __init__(self, symbol, bar_seconds):
+        self.symbol = symbol
+        self.stream = None
+        self.bar_seconds = bar_seconds
+        self.indicators = {}       # spec -> streaming indicator
+        self.profiles = {}         # price step -> BarVolumeProfile
+        self.forming = None
+        self.partial = None        # open time of the start-up bar, whose profile is incomplete
+        self.tick = None
+        self.tick_strategies = []
+        self.bar_strategies = []
+
+    def seed(self, timeframe, history, clock, poll_interval):
+        """Indicators from the closed history, the forming bar from the terminal, ticks from here on."""
+        rates = mt5.copy_rates_from_pos(self.symbol, timeframe, 0, history + 1)
+        last = mt5.symbol_info_tick(self.symbol)   # after the rates: a tick in between is missed, not counted twice
+        cursor = None
+        if rates is not None and len(rates):
+            for bar in rates[:-1]:
+                for ind in self.indicators.values():
+                    ind.update_bar(bar)
+            self.forming = np.zeros(1, RATE_DTYPE)[0]
+            for name in RATE_DTYPE.names:
+                self.forming[name] = rates[-1][name]
+            self.partial = int(self.forming['time'])
+            if last is not None:
+                cursor = TickCursor(self.symbol, int(last.time_msc) + 1)
+        self.stream = BarCloseDispatcher(self.symbol, self.bar_seconds, cursor=cursor, clock=clock,
+                                         idle_poll=poll_interval)
+
+    def bars(self, ticks):
+        """Bars closed by this batch of ticks, oldest first."""
+        bar_ms = self.bar_seconds * 1000
+        bar_id = np.asarray(ticks['time_msc'], dtype=np.int64) // bar_ms
+        bid = np.asarray(ticks['bid'], dtype=np.float64)
+        cuts = np.flatnonzero(np.diff(bar_id)) + 1
+        closed = []
+        for s, e in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(bar_id)]))):
+            t = int(bar_id[s]) * self.bar_seconds
+            seg = bid[s:e]
+            bar = self.forming
+            if bar is not None and bar['time'] != t:
+                closed.append(bar)
+                bar = None
+            if bar is None:
+                bar = self.forming = np.zeros(1, RATE_DTYPE)[0]
+                bar['time'], bar['open'], bar['high'], bar['low'] = t, seg[0], seg.max(), seg.min()
+            else:
+                bar['high'] = max(bar['high'], seg.max())
+                bar['low'] = min(bar['low'], seg.min())
+            bar['close'] = seg[-1]
+            bar['tick_volume'] += e - s
+        return closed
+
+
+# === ENGINE ===
+# One data feed and one clock for any number of strategies: each symbol's
+# ticks are polled once per cycle, bars, indicators and volume profiles are
+# computed once and fanned out through on_tick / on_bar, positions are read
+# once per cycle and orders go through the shared order gateway. Running N
+# strategies on a symbol costs the same terminal calls as running one.
+# Cycles are paced by runtime/bar_clock.py, so bar closes are dispatched
+# within milliseconds of the next bar's first tick.
+class Engine:
+    def __init__(self, symbols=(), poll_interval=POLL_INTERVAL, bar_seconds=BAR_SECONDS,
+                 timeframe=TIMEFRAME, history=HISTORY):
+        self.symbols = list(symbols)
+        self.poll_interval = poll_interval
+        self.bar_seconds = bar_seconds
+        self.timeframe = timeframe
+        self.history = history
+        self.strategies = []
+        self.trailers = []
+        self.feeds = {}
+        self.clock = ServerClock()   # one server-time estimate shared by every symbol's stream
+        self._positions = None
+        self._account = None
+        self._synced = None
+        self.cycles = 0
+
+    def add(self, strategy):
+        self.strategies.append(strategy)
+        return strategy
+
+    # --- data ---
+    def quote(self, symbol):
+        """Latest quote of the stream (.bid / .ask), or the terminal's before the first poll."""
+        feed = self.feeds.get(symbol)
+        if feed is not None and feed.tick is not None:
+            return feed.tick
+        return mt5.symbol_info_tick(symbol)
+
+    def positions(self, symbol=None, magic=None):
+        """Open positions, read from the terminal once per cycle (and again after an order)."""
+        if self._positions is None:
+            self._positions = mt5.positions_get() or ()
+        return [p for p in self._positions
+                if (symbol is None or p.symbol == symbol) and (magic is None or p.magic == magic)]
+
+    def account_balance(self):
+        """Account balance, read once per cycle."""
+        if self._account is None:
+            self._account = mt5.account_info()
+        return self._account.balance
+
+    # --- orders ---
+    def submit(self, request, on_done=None):
+        self._positions = None
+        return get_gateway().submit(request, on_done)
+
+    def market_order(self, symbol, side, volume, sl=0.0, tp=0.0, magic=0, comment='',
+                     deviation=DEVIATION, on_done=None):
+        """Queue a market order at the stream's latest quote; returns its Future."""
+        tick = self.quote(symbol)
+        buy = side == "BUY"
+        request = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": symbol,
+            "volume": volume,
+            "type": mt5.ORDER_TYPE_BUY if buy else mt5.ORDER_TYPE_SELL,
+            "price": tick.ask if buy else tick.bid,
+            "sl": sl,
+            "tp": tp,
+            "deviation": deviation,
+            "magic": magic,
+            "comment": comment,
+            "type_time": mt5.ORDER_TIME_GTC,
+        }
+        return self.submit(request, on_done)
+
+    def close_position(self, position, comment='', deviation=DEVIATION, on_done=None):
+        tick = self.quote(position.symbol)
+        buy = position.type == mt5.POSITION_TYPE_BUY
+        request = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": position.symbol,
+            "volume": position.volume,
+            "type": mt5.ORDER_TYPE_SELL if buy else mt5.ORDER_TYPE_BUY,
+            "position": position.ticket,
+            "price": tick.bid if buy else tick.ask,
+            "deviation": deviation,
+            "magic": position.magic,
+            "comment": comment,
+            "type_time": mt5.ORDER_TIME_GTC,
+        }
+        return self.submit(request, on_done)
+
+    # --- lifecycle ---
+    def start(self):
+        for s in self.strategies:
+            symbols = list(s.symbols) or self.symbols
+            s.symbols = symbols
+            for symbol in symbols:
+                feed = self.feeds.get(symbol)
+                if feed is None:
+                    feed = self.feeds[symbol] = _Feed(symbol, self.bar_seconds)
+                for spec in s.indicators.values():
+                    if spec not in feed.indicators:
+                        feed.indicators[spec] = _build(spec)
+                if s.profile_step is not None and s.profile_step not in feed.profiles:
+                    feed.profiles[s.profile_step] = BarVolumeProfile(s.profile_step, bar_seconds=self.bar_seconds)
+                if type(s).on_tick is not Strategy.on_tick:
+                    feed.tick_strategies.append(s)
+                if type(s).on_bar is not Strategy.on_bar:
+                    feed.bar_strategies.append(s)
+            if s.trail is not None:
+                s.trailer = TrailingEngine(*s.trail, symbols=symbols, magic=s.magic)
+                self.trailers.append(s.trailer)
+        for feed in self.feeds.values():
+            feed.seed(self.timeframe, self.history, self.clock, self.poll_interval)
+        for s in self.strategies:
+            s.on_start(self)
+        logging.info(f"Engine: {len(self.strategies)} strategies on {sorted(self.feeds)}")
+
+    def step(self):
+        """One cycle: poll every symbol once and dispatch ticks and closed bars."""
+        self._positions = self._account = None
+        quotes.clear()
+        self.cycles += 1
+        if self.trailers and (self._synced is None or (now() - self._synced).total_seconds() >= SYNC_INTERVAL):
+            positions = self.positions()
+            for trailer in self.trailers:
+                trailer.sync(positions)
+            self._synced = now()
+        for feed in self.feeds.values():
+            with timings.stage('engine_poll'):
+                ticks = feed.stream.poll()
+            if ticks is None:
+                continue
+            last = ticks[-1]
+            feed.tick = Quote(float(last['bid']), float(last['ask']), int(last['time_msc']))
+            quotes.put(feed.symbol, feed.tick)
+            spreads.update(feed.symbol, ticks)
+            for trailer in self.trailers:
+                trailer.on_tick(feed.symbol, *feed.tick)
+            for s in feed.tick_strategies:
+                s.on_tick(feed.symbol, ticks)
+            with timings.stage('engine_bars'):
+                profiles = {step: dict(p.update(ticks)) for step, p in feed.profiles.items()}
+                closed = feed.bars(ticks)
+            for bar in closed:
+                self._dispatch_bar(feed, bar, profiles)
+
+    def delay(self):
+        """Seconds until the next step: short around a bar boundary, POLL_INTERVAL mid-bar."""
+        return min((feed.stream.delay() for feed in self.feeds.values()), default=self.poll_interval)
+
+    def _dispatch_bar(self, feed, bar, profiles):
+        t = int(bar['time'])
+        for ind in feed.indicators.values():
+            ind.update_bar(bar)
+        partial, feed.partial = t == feed.partial, None
+        for s in feed.bar_strategies:
+            values = {name: feed.indicators[spec].value for name, spec in s.indicators.items()}
+            profile = profiles[s.profile_step].get(t) if s.profile_step is not None and not partial else None
+            s.on_bar(BarEvent(feed.symbol, t, bar, values, profile))
+        timings.maybe_report()
+
+    def run(self, until=None):
+        """Poll and dispatch until `until` (a datetime; None: forever), then stop the strategies."""
+        self.start()
+        try:
+            while until is None or now() < until:
+                self.step()
+                sleep(self.delay())
+        finally:
+            self.stop()
+
+    def stop(self):
+        for s in self.strategies:
+            s.on_stop()
+        get_gateway().close()
+
+
+if __name__ == "__main__":
+    from mt5_wrapper import connect_to_mt5, shutdown
+    from strategy.plugins import PLUGINS
+
+    ap = argparse.ArgumentParser(description="Run strategy plug-ins on one shared data feed")
+    ap.add_argument("strategies", nargs="+", choices=sorted(PLUGINS))
+    ap.add_argument("--symbols", nargs="+", default=None, help="override the plug-ins' own symbols")
+    args = ap.parse_args()
+
+    connect_to_mt5()
+    engine = Engine(args.symbols or ())
+    for name in args.strategies:
+        plugin = PLUGINS[name]()
+        if args.symbols:
+            plugin.symbols = args.symbols
+        engine.add(plugin)
+    try:
+        engine.run()
+    finally:
+        shutdown()
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BUDGET = 1.0   # seconds a scan cycle may take before slow symbols are skipped
+
+
+# === TIMING ===
+class SymbolTiming:
+    __slots__ = ('symbol', 'status', 'queued', 'fetch', 'evaluate', 'error')
+
+    def __init__(self, symbol, status='ok', queued=0.0, fetch=0.0, evaluate=0.0, error=None):
+        self.symbol = symbol
+        self.status = status      # ok | timeout | busy (still running from an earlier cycle) | error
+        self.queued = queued      # seconds waiting for a worker thread
+        self.fetch = fetch
+        self.evaluate = evaluate
+        self.error = error
+
+    @property
+    def total(self):
+        return self.queued + self.fetch + self.evaluate
+
+    def __repr__(self):
+        if self.status == 'error':
+            return f"{self.symbol} error: {self.error!r}"
+        if self.status != 'ok':
+            return f"{self.symbol} {self.status}"
+        return f"{self.symbol} {self.total * 1e3:.0f}ms"
+
+
+class CycleReport:
+    __slots__ = ('elapsed', 'budget', 'timings')
+
+    def __init__(self, elapsed, budget, timings):
+        self.elapsed = elapsed
+        self.budget = budget
+        self.timings = timings
+
+    @property
+    def over_budget(self):
+        return self.elapsed > self.budget
+
+    @property
+    def slowest(self):
+        done = [t for t in self.timings if t.status == 'ok']
+        return max(done, key=lambda t: t.total) if done else None
+
+    def __str__(self):
+        flag = " ⚠️ over budget" if self.over_budget else ""
+        return f"⏱ cycle {self.elapsed * 1e3:.0f}ms{flag} | " + ", ".join(map(repr, self.timings))
+
+
+# === SCHEDULER ===
+# Runs fetch(symbol) and then evaluate(symbol, data) for every symbol on a
+# thread pool, driven by an asyncio event loop that waits at most `budget`
+# seconds per cycle. The MT5 calls block on IPC with the GIL released, so the
+# per-symbol round trips overlap and a cycle costs roughly the slowest symbol
+# instead of the sum. A symbol that misses the budget is reported as 'timeout'
+# and skipped ('busy') until its worker finishes; order sending stays with the
+# caller on the main thread.
+class SymbolScheduler:
+    def __init__(self, symbols, fetch, evaluate=None, budget=BUDGET, workers=None):
+        self.symbols = list(symbols)
+        self.fetch = fetch
+        self.evaluate = evaluate
+        self.budget = budget
+        self._pool = ThreadPoolExecutor(max_workers=workers or max(1, min(32, len(self.symbols))),
+                                        thread_name_prefix='scan')
+        self._loop = asyncio.new_event_loop()
+        self._running = {}
+        self.last_report = None
+
+    def _work(self, symbol, submitted):
+        t0 = time.perf_counter()
+        data = self.fetch(symbol)
+        t1 = time.perf_counter()
+        result = self.evaluate(symbol, data) if self.evaluate is not None else data
+        return result, t0 - submitted, t1 - t0, time.perf_counter() - t1
+
+    async def scan(self):
+        """({symbol: result} for symbols that finished in budget, CycleReport)."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        timings, tasks = {}, {}
+        for symbol in self.symbols:
+            prev = self._running.get(symbol)
+            if prev is not None and not prev.done():
+                timings[symbol] = SymbolTiming(symbol, 'busy')
+                continue
+            job = self._pool.submit(self._work, symbol, time.perf_counter())
+            self._running[symbol] = job
+            task = asyncio.wrap_future(job, loop=loop)
+            task.add_done_callback(lambda f: f.cancelled() or f.exception())   # late errors are not "unretrieved"
+            tasks[task] = symbol
+
+        done = set()
+        if tasks:
+            done, _ = await asyncio.wait(tasks, timeout=self.budget)
+        results = {}
+        for task, symbol in tasks.items():
+            if task not in done:
+                timings[symbol] = SymbolTiming(symbol, 'timeout')
+            elif task.exception() is not None:
+                timings[symbol] = SymbolTiming(symbol, 'error', error=task.exception())
+            else:
+                result, queued, fetch, evaluate = task.result()
+                results[symbol] = result
+                timings[symbol] = SymbolTiming(symbol, 'ok', queued, fetch, evaluate)
+
+        report = CycleReport(time.perf_counter() - start, self.budget, [timings[s] for s in self.symbols])
+        self.last_report = report
+        return results, report
+
+    def cycle(self):
+        """Blocking wrapper around scan() for the synchronous bot loops."""
+        return self._loop.run_until_complete(self.scan())
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._loop.close()
@@ -0,0 +1,188 @@
+from datetime import datetime, date, time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from mt5_wrapper import now
+from symbol_cache import specs
+from config import TRADING_SESSIONS
+
+# === CONFIG ===
+SPREAD_WINDOW     = 5000   # ticks per symbol in the rolling spread distribution
+SPREAD_PCTL       = 90     # a quote is tradable up to this percentile of recent spreads
+SPREAD_REFRESH    = 250    # new ticks between recomputations of the percentile limit
+SPREAD_WARMUP     = 500    # ticks seen before the rolling limit applies
+BAR_SPREAD_WINDOW = 1440   # bars behind spread_mask()'s percentile (a day of M1)
+BAR_SPREAD_WARMUP = 60
+DAY               = 86400
+WEEK              = 7 * DAY
+WEEKDAYS          = (0, 1, 2, 3, 4)   # Monday..Friday
+ALL_DAYS          = tuple(range(7))
+
+
+def _seconds(t):
+    """Seconds into the day of a time or an 'HH:MM[:SS]' string."""
+    if isinstance(t, str):
+        t = time.fromisoformat(t)
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def _epoch(t):
+    if t is None:
+        t = now()
+    if isinstance(t, datetime):
+        return int(t.timestamp())
+    return int(t)
+
+
+def second_of_week(epoch):
+    """Seconds since Monday 00:00 UTC (epoch day 0 was a Thursday); works on scalars and arrays."""
+    return ((epoch // DAY + 3) % 7) * DAY + epoch % DAY
+
+
+# === CALENDAR ===
+# Trading windows (UTC, both ends inclusive like the bots' old
+# `start <= t <= end`; a window whose end is before its start runs past
+# midnight) expanded once into a table with one flag per second of the week.
+# mask() gates a whole array of bar times with one gather and is_open() is a
+# single lookup, so backtests and live loops drop ineligible bars before any
+# profile or indicator work. Holidays are whole UTC dates.
+class SessionCalendar:
+    __slots__ = ('windows', 'days', 'holidays', '_week')
+
+    def __init__(self, windows, days=ALL_DAYS, holidays=()):
+        if isinstance(windows, dict):
+            windows = windows.values()
+        self.windows = [(_seconds(s), _seconds(e)) for s, e in windows]
+        self.days = tuple(days)
+        self.holidays = {(d - date(1970, 1, 1)).days for d in holidays}
+        self._week = np.zeros(WEEK, dtype=bool)
+        for d in self.days:
+            for s, e in self.windows:
+                end = e if e >= s else e + DAY
+                self._week[(d * DAY + np.arange(s, end + 1)) % WEEK] = True
+
+    @classmethod
+    def from_config(cls, sessions=TRADING_SESSIONS, days=WEEKDAYS, holidays=()):
+        """The union of config.TRADING_SESSIONS (London / New York), weekdays only."""
+        return cls(sessions, days, holidays)
+
+    def mask(self, times):
+        """Bool array: which epoch-second times (e.g. bars['time']) fall inside a session."""
+        t = np.asarray(times, dtype=np.int64)
+        out = self._week[second_of_week(t)]
+        if self.holidays:
+            out &= ~np.isin(t // DAY, list(self.holidays))
+        return out
+
+    def is_open(self, t=None):
+        """Whether t (epoch seconds, datetime, default: terminal now) is inside a session."""
+        t = _epoch(t)
+        return bool(self._week[second_of_week(t)]) and t // DAY not in self.holidays
+
+
+@lru_cache(maxsize=None)
+def window(start, end, days=ALL_DAYS):
+    """Shared calendar of one daily window, e.g. a strategy's trading_start / trading_end."""
+    return SessionCalendar([(start, end)], days)
+
+
+SESSIONS = SessionCalendar.from_config()
+
+
+# === SPREADS ===
+# Spread in points of every streamed tick, kept in a ring buffer per symbol.
+# The percentile limit is recomputed every SPREAD_REFRESH new ticks, so ok()
+# is a comparison against a cached number; until SPREAD_WARMUP ticks have been
+# seen only the absolute cap (if any) applies.
+class _SpreadRing:
+    __slots__ = ('buf', 'n', 'pos', 'since', 'limit', 'last')
+
+    def __init__(self, size):
+        self.buf = np.zeros(size, dtype=np.float64)
+        self.n = 0
+        self.pos = 0
+        self.since = 0
+        self.limit = np.inf
+        self.last = np.nan
+
+
+class SpreadTracker:
+    def __init__(self, window=SPREAD_WINDOW, pctl=SPREAD_PCTL, refresh=SPREAD_REFRESH, warmup=SPREAD_WARMUP):
+        self.window = window
+        self.pctl = pctl
+        self.refresh = refresh
+        self.warmup = warmup
+        self._rings = {}
+
+    def update(self, symbol, ticks):
+        """Add a batch of ticks (structured array with bid/ask) or a single tick; returns the last spread in points."""
+        if ticks is None:
+            return None
+        info = specs.get(symbol)
+        if info is None:
+            return None
+        if hasattr(ticks, 'dtype'):
+            if len(ticks) == 0:
+                return None
+            spread = np.round((np.asarray(ticks['ask'], dtype=np.float64) - ticks['bid']) / info.point, 3)
+        else:
+            spread = np.array([round((ticks.ask - ticks.bid) / info.point, 3)])
+        ring = self._rings.get(symbol)
+        if ring is None:
+            ring = self._rings[symbol] = _SpreadRing(self.window)
+        spread = spread[-self.window:]
+        k = len(spread)
+        idx = (ring.pos + np.arange(k)) % self.window
+        ring.buf[idx] = spread
+        ring.pos = (ring.pos + k) % self.window
+        ring.n = min(ring.n + k, self.window)
+        ring.since += k
+        ring.last = float(spread[-1])
+        if ring.n >= self.warmup and (ring.since >= self.refresh or ring.limit == np.inf):
+            ring.limit = float(np.percentile(ring.buf[:ring.n], self.pctl))
+            ring.since = 0
+        return ring.last
+
+    def percentile(self, symbol, q=None):
+        """q-th percentile (default: the tracker's) of the symbol's recent spreads in points, NaN if none seen."""
+        ring = self._rings.get(symbol)
+        if ring is None or ring.n == 0:
+            return np.nan
+        if q is None and ring.limit != np.inf:
+            return ring.limit
+        return float(np.percentile(ring.buf[:ring.n], self.pctl if q is None else q))
+
+    def last(self, symbol):
+        ring = self._rings.get(symbol)
+        return np.nan if ring is None else ring.last
+
+    def ok(self, symbol, spread=None, max_points=None):
+        """Whether a spread (points, default the last one seen) is within the rolling limit and max_points."""
+        ring = self._rings.get(symbol)
+        if spread is None:
+            if ring is None:
+                return False
+            spread = ring.last
+        if max_points is not None and spread > max_points:
+            return False
+        return ring is None or spread <= ring.limit
+
+
+def spread_mask(spread, window=BAR_SPREAD_WINDOW, pctl=SPREAD_PCTL, max_points=None, warmup=BAR_SPREAD_WARMUP):
+    """Backtest counterpart of SpreadTracker.ok() over an array of per-bar spreads (any one unit).
+
+    Each bar is compared with the percentile of the `window` bars before it,
+    so no bar sees its own or later spreads; the first `warmup` bars only
+    face max_points.
+    """
+    s = pd.Series(np.asarray(spread, dtype=np.float64))
+    limit = s.rolling(window, min_periods=warmup).quantile(pctl / 100).shift(1).to_numpy()
+    out = np.isnan(limit) | (s.to_numpy() <= limit)
+    if max_points is not None:
+        out &= s.to_numpy() <= max_points
+    return out
+
+
+spreads = SpreadTracker()
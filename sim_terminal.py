@@ -0,0 +1,431 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+
+from tick_store import DATA_ROOT, RATE_DTYPE, TICK_DTYPE, TickStore, bars_from_ticks
+
+# === MT5 CONSTANTS (same values as the MetaTrader5 package) ===
+TIMEFRAME_M1, TIMEFRAME_M5, TIMEFRAME_M15, TIMEFRAME_M30 = 1, 5, 15, 30
+TIMEFRAME_H1, TIMEFRAME_H4, TIMEFRAME_D1 = 16385, 16388, 16408
+TIMEFRAME_SECONDS = {TIMEFRAME_M1: 60, TIMEFRAME_M5: 300, TIMEFRAME_M15: 900, TIMEFRAME_M30: 1800,
+                     TIMEFRAME_H1: 3600, TIMEFRAME_H4: 14400, TIMEFRAME_D1: 86400}
+
+COPY_TICKS_ALL, COPY_TICKS_INFO, COPY_TICKS_TRADE = -1, 1, 2
+ORDER_TYPE_BUY, ORDER_TYPE_SELL = 0, 1
+POSITION_TYPE_BUY, POSITION_TYPE_SELL = 0, 1
+TRADE_ACTION_DEAL, TRADE_ACTION_SLTP = 1, 6
+ORDER_TIME_GTC = 0
+ORDER_FILLING_FOK, ORDER_FILLING_IOC, ORDER_FILLING_RETURN = 0, 1, 2
+SYMBOL_FILLING_FOK, SYMBOL_FILLING_IOC = 1, 2
+DEAL_ENTRY_IN, DEAL_ENTRY_OUT = 0, 1
+
+TRADE_RETCODE_REQUOTE         = 10004
+TRADE_RETCODE_DONE            = 10009
+TRADE_RETCODE_INVALID         = 10013
+TRADE_RETCODE_INVALID_VOLUME  = 10014
+TRADE_RETCODE_INVALID_STOPS   = 10016
+TRADE_RETCODE_MARKET_CLOSED   = 10018
+TRADE_RETCODE_NO_MONEY        = 10019
+TRADE_RETCODE_INVALID_FILL    = 10030
+TRADE_RETCODE_POSITION_CLOSED = 10036
+
+RES_S_OK, RES_E_NOT_FOUND = 1, -5
+
+# === RECORDS (field names as returned by the terminal) ===
+Tick = namedtuple('Tick', TICK_DTYPE.names)
+SymbolInfo = namedtuple('SymbolInfo', [
+    'name', 'visible', 'point', 'digits', 'spread', 'trade_contract_size', 'trade_tick_size',
+    'trade_tick_value', 'trade_stops_level', 'volume_min', 'volume_max', 'volume_step',
+    'filling_mode', 'margin_initial', 'bid', 'ask', 'currency_profit'])
+AccountInfo = namedtuple('AccountInfo', [
+    'login', 'balance', 'equity', 'profit', 'margin', 'margin_free', 'leverage', 'currency', 'server'])
+TradePosition = namedtuple('TradePosition', [
+    'ticket', 'time', 'time_msc', 'type', 'magic', 'volume', 'price_open', 'sl', 'tp',
+    'price_current', 'profit', 'symbol', 'comment'])
+TradeDeal = namedtuple('TradeDeal', [
+    'ticket', 'order', 'time', 'time_msc', 'type', 'entry', 'magic', 'position_id', 'volume',
+    'price', 'profit', 'symbol', 'comment'])
+OrderSendResult = namedtuple('OrderSendResult', [
+    'retcode', 'deal', 'order', 'volume', 'price', 'bid', 'ask', 'comment', 'request_id',
+    'retcode_external', 'request'])
+
+# Contract specs; symbols not listed fall back to DEFAULT_SPEC.
+DEFAULT_SPEC = {'point': 0.001, 'digits': 3, 'trade_contract_size': 100.0, 'volume_min': 0.01,
+                'volume_max': 200.0, 'volume_step': 0.01, 'trade_stops_level': 0,
+                'filling_mode': SYMBOL_FILLING_FOK | SYMBOL_FILLING_IOC, 'currency_profit': 'USD'}
+SPECS = {
+    'XAUUSDm': {},
+    'EURUSDm': {'point': 0.00001, 'digits': 5, 'trade_contract_size': 100000.0},
+    'GBPUSDm': {'point': 0.00001, 'digits': 5, 'trade_contract_size': 100000.0},
+}
+
+WARMUP = 6 * 3600   # default clock start: this long after the first cached tick
+
+
+class SimulationFinished(SystemExit):
+    """Raised when the clock runs past the end of the cached data."""
+
+
+def _epoch(t):
+    if isinstance(t, datetime):
+        return (t if t.tzinfo else t.replace(tzinfo=timezone.utc)).timestamp()
+    return float(t)
+
+
+class _Position:
+    __slots__ = ('ticket', 'symbol', 'type', 'volume', 'price_open', 'sl', 'tp', 'magic', 'comment', 'time_msc')
+
+    def __init__(self, ticket, symbol, type_, volume, price_open, magic, comment, time_msc):
+        self.ticket = ticket
+        self.symbol = symbol
+        self.type = type_
+        self.volume = volume
+        self.price_open = price_open
+        self.sl = 0.0
+        self.tp = 0.0
+        self.magic = magic
+        self.comment = comment
+        self.time_msc = time_msc
+
+
+class _Feed:
+    """Cached ticks of one symbol plus the bar arrays built from them."""
+
+    def __init__(self, ticks):
+        self.ticks = ticks
+        self.msc = np.ascontiguousarray(ticks['time_msc'], dtype=np.int64)
+        self.bid = np.ascontiguousarray(ticks['bid'], dtype=np.float64)
+        self.ask = np.ascontiguousarray(ticks['ask'], dtype=np.float64)
+        self.bars = {}
+
+    def visible(self, now_msc):
+        """Number of ticks stamped at or before now."""
+        return int(np.searchsorted(self.msc, now_msc, side='right'))
+
+
+# === TERMINAL ===
+# Drop-in stand-in for the MetaTrader5 module, driven by the local tick store.
+# Time only moves through sleep()/advance() (and order latency), so a run is
+# fully deterministic and goes as fast as the strategy code allows. Data after
+# the simulated "now" is never returned.
+class SimTerminal:
+    def __init__(self, root=DATA_ROOT, start=None, end=None, balance=10000.0, leverage=2000,
+                 latency_ms=0, specs=None):
+        self.store = TickStore(root, online=False)
+        self.start = None if start is None else _epoch(start)
+        self.end = None if end is None else _epoch(end)
+        self.initial_balance = balance
+        self.leverage = leverage
+        self.latency_ms = latency_ms
+        self.specs = {**SPECS, **(specs or {})}
+        self.feeds = {}
+        self.now_msc = None if start is None else int(self.start * 1000)
+        self.balance = balance
+        self.positions = []
+        self.deals = []
+        self._ticket = 0
+        self._error = (RES_S_OK, 'Success')
+
+    def __getattr__(self, name):
+        # constants are looked up on the module, like mt5.TIMEFRAME_M1
+        value = globals().get(name)
+        if value is None or not name.isupper():
+            raise AttributeError(name)
+        return value
+
+    # --- session ---
+    def initialize(self, *args, **kwargs):
+        return True
+
+    def login(self, *args, **kwargs):
+        return True
+
+    def shutdown(self):
+        return True
+
+    def last_error(self):
+        return self._error
+
+    def terminal_info(self):
+        return None    # never "online" for the tick store
+
+    def account_info(self):
+        profit = sum(self._profit(p) for p in self.positions)
+        margin = sum(self._margin(p.symbol, p.volume, p.price_open) for p in self.positions)
+        equity = self.balance + profit
+        return AccountInfo(0, round(self.balance, 2), round(equity, 2), round(profit, 2),
+                           round(margin, 2), round(equity - margin, 2), self.leverage, 'USD', 'SimTerminal')
+
+    # --- clock ---
+    def now(self):
+        return datetime.fromtimestamp(self.now_msc / 1000, tz=timezone.utc)
+
+    def sleep(self, seconds):
+        self.advance(int(round(seconds * 1000)))
+
+    def advance(self, ms):
+        """Move the clock forward, triggering any SL/TP hit on the way."""
+        if self.now_msc is None:   # no symbol loaded yet, nothing to replay
+            return
+        target = self.now_msc + ms
+        if self.end is not None and target >= self.end * 1000:
+            self._trigger_stops(int(self.end * 1000))
+            raise SimulationFinished("end of simulated data")
+        self._trigger_stops(target)
+        self.now_msc = target
+
+    # --- data ---
+    def _feed(self, symbol):
+        feed = self.feeds.get(symbol)
+        if feed is not None:
+            return feed
+        span = self.store.span(symbol)
+        if span is None:
+            self._error = (RES_E_NOT_FOUND, f'no cached ticks for {symbol}')
+            return None
+        ticks = self.store.ticks(symbol, *span)
+        if len(ticks) == 0:
+            return None
+        feed = self.feeds[symbol] = _Feed(ticks)
+        if self.now_msc is None:
+            start = self.start if self.start is not None else int(feed.msc[0]) // 1000 + WARMUP
+            self.now_msc = int(start * 1000)
+        if self.end is None:
+            self.end = int(feed.msc[-1]) / 1000 + 1
+        return feed
+
+    def symbol_select(self, symbol, enable=True):
+        return self._feed(symbol) is not None
+
+    def symbol_info_tick(self, symbol):
+        feed = self._feed(symbol)
+        if feed is None:
+            return None
+        i = feed.visible(self.now_msc)
+        return Tick(*feed.ticks[i - 1].tolist()) if i else None
+
+    def symbol_info(self, symbol):
+        if self._feed(symbol) is None:
+            return None
+        spec = {**DEFAULT_SPEC, **self.specs.get(symbol, {})}
+        tick = self.symbol_info_tick(symbol)
+        bid, ask = (tick.bid, tick.ask) if tick else (0.0, 0.0)
+        point = spec['point']
+        return SymbolInfo(
+            symbol, True, point, spec['digits'], int(round((ask - bid) / point)),
+            spec['trade_contract_size'], point, spec['trade_contract_size'] * point,
+            spec['trade_stops_level'], spec['volume_min'], spec['volume_max'], spec['volume_step'],
+            spec['filling_mode'], 0.0, bid, ask, spec['currency_profit'])
+
+    def copy_ticks_from(self, symbol, date_from, count, flags=COPY_TICKS_ALL):
+        feed = self._feed(symbol)
+        if feed is None:
+            return None
+        i0 = int(np.searchsorted(feed.msc, int(_epoch(date_from) * 1000), side='left'))
+        i1 = min(i0 + int(count), feed.visible(self.now_msc))
+        return feed.ticks[i0:max(i0, i1)].copy()
+
+    def copy_ticks_range(self, symbol, date_from, date_to, flags=COPY_TICKS_ALL):
+        feed = self._feed(symbol)
+        if feed is None:
+            return None
+        hi = min(int(_epoch(date_to) * 1000), self.now_msc)
+        i0 = int(np.searchsorted(feed.msc, int(_epoch(date_from) * 1000), side='left'))
+        i1 = int(np.searchsorted(feed.msc, hi, side='right'))
+        return feed.ticks[i0:max(i0, i1)].copy()
+
+    def _rates(self, symbol, timeframe):
+        """(closed bars, forming bar as a 0/1-row array) as of now."""
+        feed = self._feed(symbol)
+        if feed is None or timeframe not in TIMEFRAME_SECONDS:
+            return None, None
+        sec = TIMEFRAME_SECONDS[timeframe]
+        bars = feed.bars.get(timeframe)
+        if bars is None:
+            bars = feed.bars[timeframe] = bars_from_ticks(feed.ticks, sec)
+        now_s = self.now_msc // 1000
+        closed = bars[:int(np.searchsorted(bars['time'], now_s - sec, side='right'))]
+        bar_open = now_s // sec * sec
+        i0 = int(np.searchsorted(feed.msc, bar_open * 1000, side='left'))
+        forming = bars_from_ticks(feed.ticks[i0:feed.visible(self.now_msc)], sec)
+        return closed, forming
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        closed, forming = self._rates(symbol, timeframe)
+        if closed is None:
+            return None
+        end = len(closed) + len(forming) - int(start_pos)
+        if end <= 0:
+            return np.empty(0, RATE_DTYPE)
+        begin = max(0, end - int(count))
+        if end <= len(closed):
+            return closed[begin:end].copy()
+        return np.concatenate((closed[begin:], forming))
+
+    def copy_rates_from(self, symbol, timeframe, date_from, count):
+        closed, forming = self._rates(symbol, timeframe)
+        if closed is None:
+            return None
+        t = _epoch(date_from)
+        end = int(np.searchsorted(closed['time'], t, side='right'))
+        if len(forming) and forming['time'][0] <= t:
+            return np.concatenate((closed[max(0, end - int(count) + 1):end], forming))[-int(count):]
+        return closed[max(0, end - int(count)):end].copy()
+
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        closed, forming = self._rates(symbol, timeframe)
+        if closed is None:
+            return None
+        lo, hi = _epoch(date_from), _epoch(date_to)
+        i0 = int(np.searchsorted(closed['time'], lo, side='left'))
+        i1 = int(np.searchsorted(closed['time'], hi, side='right'))
+        bars = closed[i0:i1]
+        if len(forming) and lo <= forming['time'][0] <= hi:
+            return np.concatenate((bars, forming))
+        return bars.copy()
+
+    # --- trading ---
+    def _spec(self, symbol):
+        return {**DEFAULT_SPEC, **self.specs.get(symbol, {})}
+
+    def _margin(self, symbol, volume, price):
+        return volume * self._spec(symbol)['trade_contract_size'] * price / self.leverage
+
+    def _profit(self, pos, price=None):
+        if price is None:
+            tick = self.symbol_info_tick(pos.symbol)
+            price = tick.bid if pos.type == POSITION_TYPE_BUY else tick.ask
+        sign = 1 if pos.type == POSITION_TYPE_BUY else -1
+        return (price - pos.price_open) * sign * pos.volume * self._spec(pos.symbol)['trade_contract_size']
+
+    def _deal(self, pos, volume, price, entry, comment, time_msc):
+        self._ticket += 1
+        sign = 1 if pos.type == POSITION_TYPE_BUY else -1
+        profit = 0.0
+        type_ = pos.type
+        if entry == DEAL_ENTRY_OUT:
+            profit = (price - pos.price_open) * sign * volume * self._spec(pos.symbol)['trade_contract_size']
+            self.balance += profit
+            type_ = 1 - pos.type
+        self.deals.append(TradeDeal(self._ticket, self._ticket, time_msc // 1000, time_msc, type_, entry,
+                                    pos.magic, pos.ticket, volume, price, round(profit, 2), pos.symbol, comment))
+        return self._ticket
+
+    def _close(self, pos, volume, price, comment, time_msc):
+        deal = self._deal(pos, volume, price, DEAL_ENTRY_OUT, comment, time_msc)
+        pos.volume = round(pos.volume - volume, 8)
+        if pos.volume <= 0:
+            self.positions.remove(pos)
+        return deal
+
+    def _trigger_stops(self, until_msc):
+        hits = []
+        for pos in self.positions:
+            if not pos.sl and not pos.tp:
+                continue
+            feed = self.feeds[pos.symbol]
+            i0, i1 = feed.visible(self.now_msc), feed.visible(until_msc)
+            if i0 >= i1:
+                continue
+            buy = pos.type == POSITION_TYPE_BUY
+            px = feed.bid[i0:i1] if buy else feed.ask[i0:i1]
+            touched = np.zeros(i1 - i0, dtype=bool)
+            if pos.sl:
+                touched |= px <= pos.sl if buy else px >= pos.sl
+            if pos.tp:
+                touched |= px >= pos.tp if buy else px <= pos.tp
+            j = int(np.argmax(touched))
+            if touched[j]:
+                hits.append((int(feed.msc[i0 + j]), i0 + j, pos))
+        for msc, i, pos in sorted(hits, key=lambda h: (h[0], h[2].ticket)):
+            feed = self.feeds[pos.symbol]
+            price = feed.bid[i] if pos.type == POSITION_TYPE_BUY else feed.ask[i]
+            hit_sl = pos.sl and (price <= pos.sl if pos.type == POSITION_TYPE_BUY else price >= pos.sl)
+            digits = self._spec(pos.symbol)['digits']
+            self._close(pos, pos.volume, float(price), f"[{'sl' if hit_sl else 'tp'} {price:.{digits}f}]", msc)
+
+    def _result(self, retcode, request, comment, deal=0, volume=0.0, price=0.0, tick=None):
+        bid, ask = (tick.bid, tick.ask) if tick else (0.0, 0.0)
+        return OrderSendResult(retcode, deal, deal, volume, price, bid, ask, comment, 0, 0, request)
+
+    def order_send(self, request):
+        if self.latency_ms:
+            self.advance(self.latency_ms)
+        symbol = request.get('symbol')
+        action = request.get('action')
+        if self._feed(symbol) is None:
+            return self._result(TRADE_RETCODE_INVALID, request, 'Invalid request')
+        tick = self.symbol_info_tick(symbol)
+        if tick is None:
+            return self._result(TRADE_RETCODE_MARKET_CLOSED, request, 'Market closed')
+        spec = self._spec(symbol)
+        ticket = request.get('position', 0)
+        pos = next((p for p in self.positions if p.ticket == ticket), None) if ticket else None
+        if ticket and pos is None:
+            return self._result(TRADE_RETCODE_POSITION_CLOSED, request, 'Position closed', tick=tick)
+
+        if action == TRADE_ACTION_SLTP:
+            if pos is None:
+                return self._result(TRADE_RETCODE_INVALID, request, 'Invalid request', tick=tick)
+            sl, tp = float(request.get('sl', 0.0)), float(request.get('tp', 0.0))
+            gap = spec['trade_stops_level'] * spec['point']
+            buy = pos.type == POSITION_TYPE_BUY
+            if (sl and (sl > tick.bid - gap if buy else sl < tick.ask + gap)) or \
+               (tp and (tp < tick.bid + gap if buy else tp > tick.ask - gap)):
+                return self._result(TRADE_RETCODE_INVALID_STOPS, request, 'Invalid stops', tick=tick)
+            pos.sl, pos.tp = sl, tp
+            return self._result(TRADE_RETCODE_DONE, request, 'Request executed', tick=tick)
+
+        if action != TRADE_ACTION_DEAL:
+            return self._result(TRADE_RETCODE_INVALID, request, 'Invalid request', tick=tick)
+        type_ = request.get('type')
+        volume = float(request.get('volume', 0.0))
+        steps = volume / spec['volume_step']
+        if volume < spec['volume_min'] or volume > spec['volume_max'] or abs(steps - round(steps)) > 1e-6 \
+                or (pos is not None and volume > pos.volume + 1e-9):
+            return self._result(TRADE_RETCODE_INVALID_VOLUME, request, 'Invalid volume', tick=tick)
+        filling = request.get('type_filling', ORDER_FILLING_FOK)
+        if not spec['filling_mode'] & (1 << filling):    # market execution: FOK/IOC only
+            return self._result(TRADE_RETCODE_INVALID_FILL, request, 'Unsupported filling mode', tick=tick)
+
+        price = tick.ask if type_ == ORDER_TYPE_BUY else tick.bid
+        requested = request.get('price')
+        if requested and abs(price - requested) > request.get('deviation', 0) * spec['point']:
+            return self._result(TRADE_RETCODE_REQUOTE, request, 'Requote', tick=tick)
+
+        if pos is not None:
+            if type_ == pos.type:
+                return self._result(TRADE_RETCODE_INVALID, request, 'Invalid request', tick=tick)
+            deal = self._close(pos, volume, price, request.get('comment', ''), self.now_msc)
+            return self._result(TRADE_RETCODE_DONE, request, 'Request executed', deal, volume, price, tick)
+
+        if self._margin(symbol, volume, price) > self.account_info().margin_free:
+            return self._result(TRADE_RETCODE_NO_MONEY, request, 'No money', tick=tick)
+        self._ticket += 1
+        pos = _Position(self._ticket, symbol, type_, volume, price, request.get('magic', 0),
+                        request.get('comment', ''), self.now_msc)
+        pos.sl, pos.tp = float(request.get('sl', 0.0)), float(request.get('tp', 0.0))
+        self.positions.append(pos)
+        deal = self._deal(pos, volume, price, DEAL_ENTRY_IN, pos.comment, self.now_msc)
+        return self._result(TRADE_RETCODE_DONE, request, 'Request executed', deal, volume, price, tick)
+
+    def positions_get(self, symbol=None, ticket=None, group=None):
+        out = []
+        for p in self.positions:
+            if (symbol and p.symbol != symbol) or (ticket and p.ticket != ticket):
+                continue
+            tick = self.symbol_info_tick(p.symbol)
+            current = tick.bid if p.type == POSITION_TYPE_BUY else tick.ask
+            out.append(TradePosition(p.ticket, p.time_msc // 1000, p.time_msc, p.type, p.magic, p.volume,
+                                     p.price_open, p.sl, p.tp, current, round(self._profit(p, current), 2),
+                                     p.symbol, p.comment))
+        return tuple(out)
+
+    def positions_total(self):
+        return len(self.positions)
+
+    def history_deals_get(self, date_from=None, date_to=None, **kwargs):
+        lo = 0 if date_from is None else _epoch(date_from) * 1000
+        hi = self.now_msc if date_to is None else _epoch(date_to) * 1000
+        return tuple(d for d in self.deals if lo <= d.time_msc <= hi)
@@ -2,7 +2,7 @@ from indicators.ema import calculate_ema
 from indicators.rsi import calculate_rsi
 from indicators.atr import calculate_atr
 from config import MIN_WIN_PROB
-from ml_model.model_loader import predict_trade  # Placeholder
+from ml_model.model_loader import predict_trade
 
 def check_entry(df, symbol):
     df['ema9'] = calculate_ema(df, 9)
@@ -15,7 +15,10 @@ def check_entry(df, symbol):
     else:
         return None
 
-    confidence = predict_trade(df.tail(50))  # Last 50 candles
+    probs = predict_trade(df.tail(50), symbol)  # Last 50 candles
+    if probs is None:
+        return None
+    confidence = probs[signal]
     if confidence >= MIN_WIN_PROB:
         return signal, confidence
     return None
@@ -0,0 +1,57 @@
+from mt5_wrapper import mt5
+from indicators.atr import calculate_atr
+from order_gateway import get_gateway
+from symbol_cache import specs
+from portfolio_risk import get_risk, risk_lots, value_per_price
+from config import RISK_PER_TRADE
+
+# === CONFIG ===
+ATR_PERIOD    = 14
+SL_ATR        = 1.5    # stop distance in M1 ATRs
+TP_ATR        = 3.0
+DEVIATION     = 20
+MAGIC         = 77777
+
+
+def risk_lot(balance, sl_distance, info, risk=RISK_PER_TRADE):
+    """Volume risking `risk` of balance over sl_distance, snapped to the symbol's volume step."""
+    return float(risk_lots(balance, sl_distance, value_per_price(info), info.volume_min, info.volume_step,
+                           info.volume_max, risk))
+
+
+def _report(outcome):
+    req = outcome.request
+    side = "BUY" if req['type'] == mt5.ORDER_TYPE_BUY else "SELL"
+    mark = "⚡" if outcome.ok else "❌"
+    print(f"{mark} {side} {req['symbol']} {req['volume']} @ {req['price']} | {outcome!r}")
+
+
+# === EXECUTION ===
+def execute_trade(symbol, signal, on_done=_report):
+    """Queue a market order with ATR-based SL/TP on the order gateway; returns its Future."""
+    info = specs.get(symbol)
+    tick = mt5.symbol_info_tick(symbol)
+    rates = mt5.copy_rates_from_pos(symbol, mt5.TIMEFRAME_M1, 1, ATR_PERIOD + 1)
+    if info is None or tick is None or rates is None or len(rates) <= ATR_PERIOD:
+        print(f"⚠️ {symbol}: no quote/history, trade skipped")
+        return None
+    atr = calculate_atr(rates, ATR_PERIOD)[-1]
+
+    buy = signal == "BUY"
+    price = tick.ask if buy else tick.bid
+    sl = price - SL_ATR * atr if buy else price + SL_ATR * atr
+    tp = price + TP_ATR * atr if buy else price - TP_ATR * atr
+    request = {
+        "action": mt5.TRADE_ACTION_DEAL,
+        "symbol": symbol,
+        "volume": get_risk().lot(symbol, SL_ATR * atr),
+        "type": mt5.ORDER_TYPE_BUY if buy else mt5.ORDER_TYPE_SELL,
+        "price": price,
+        "sl": round(sl, info.digits),
+        "tp": round(tp, info.digits),
+        "deviation": DEVIATION,
+        "magic": MAGIC,
+        "comment": "main.py",
+        "type_time": mt5.ORDER_TIME_GTC,
+    }
+    return get_gateway().submit(request, on_done)
@@ -0,0 +1,154 @@
+import math
+
+from journal import get_journal
+from runtime.engine import Strategy, indicator
+from strategy.executor import risk_lot
+from strategy.position_manager import PositionManager
+from strategy.vp_recovery import PARAMS, entry_side
+from sessions import window, spreads
+from symbol_cache import specs
+
+# The standalone bots as plug-ins for runtime/engine.py. Each keeps its
+# script's rules and parameters; data, quotes, positions and order routing
+# come from the engine, so any mix of them shares one feed per symbol.
+# Sizing goes through strategy.executor.risk_lot instead of each script's
+# own calc_lot.
+
+
+def bar_range(bar):
+    return float(bar['high']) - float(bar['low'])
+
+
+def _session_ok(event, p=PARAMS):
+    return window(p['trading_start'], p['trading_end']).is_open(event.time)
+
+
+def _spike_side(event, p=PARAMS):
+    """entry_side() of the closed bar against its tick baseline, None until the filters have enough bars."""
+    avg = event.values['avg_ticks']
+    if event.profile is None or math.isnan(event.values['atr']) or math.isnan(avg):
+        return None
+    return entry_side(event.profile.skew, event.bar['tick_volume'], avg * p['vol_spike_factor'],
+                      p['skew_threshold'])
+
+
+# === VOLUME-PROFILE SKEW (vpt-bot.py) ===
+class VolumeSkew(Strategy):
+    """Enter with the closed bar's profile skew on a tick-count spike, flat again one bar later."""
+    name = 'vp_skew'
+    symbols = ("XAUUSDm",)
+    profile_step = PARAMS['price_step']
+    indicators = {'atr': indicator('atr', PARAMS['atr_period']),
+                  'avg_ticks': indicator('baseline')}
+    magic = 123456
+
+    def on_bar(self, event):
+        for pos in self.engine.positions(event.symbol, self.magic):
+            self.engine.close_position(pos, 'HFT_DP_CLOSE')
+        if not _session_ok(event):
+            return
+        side = _spike_side(event)
+        if side is None:
+            return
+        get_journal().signal(event.symbol, side, event.profile.skew, self.name)
+        self.engine.market_order(event.symbol, side, PARAMS['lot_size'], magic=self.magic, comment='HFT_DP')
+
+
+# === VP RECOVERY (vpt-bot2.py) ===
+class VPRecovery(Strategy):
+    """Stacked skew entries up to max_positions; POC-recovery and cluster exits, stops trailed per quote."""
+    name = 'vp_recovery'
+    symbols = ("XAUUSDm",)
+    profile_step = PARAMS['price_step']
+    indicators = VolumeSkew.indicators
+    magic = 123457
+    trail = (PARAMS['trail_trigger'], PARAMS['trail_buffer'])
+
+    def on_start(self, engine):
+        super().on_start(engine)
+        self.managers = {s: PositionManager(s, self.magic, trail=False) for s in self.symbols}
+
+    def on_bar(self, event):
+        if not _session_ok(event) or event.profile is None:
+            return
+        side = _spike_side(event)
+        if side is not None:
+            get_journal().signal(event.symbol, side, event.profile.skew, self.name)
+            if len(self.engine.positions(event.symbol, self.magic)) < PARAMS['max_positions']:
+                self.engine.market_order(event.symbol, side, PARAMS['lot_size'], magic=self.magic,
+                                         comment='VP_MULTI_ENTRY', deviation=PARAMS['deviation'])
+        self.managers[event.symbol].manage(event.profile.poc)
+
+
+# === TREND MOMENTUM (bot4.py) ===
+class TrendMomentum(Strategy):
+    """EMA 9/21 slope confirmed by RSI away from 50 on a bar with a real body."""
+    name = 'trend'
+    symbols = ("XAUUSDm", "EURUSDm")
+    indicators = {'ema9': indicator('ema', 9, adjust=True), 'ema21': indicator('ema', 21, adjust=True),
+                  'rsi': indicator('rsi', 14), 'atr': indicator('atr', 10)}
+    magic = 77777
+    trail = (6, 3, 2)
+    sl_atr = 0.5
+    tp_atr = 2.2
+
+    def signal(self, v, bar):
+        body = abs(bar['close'] - bar['open'])
+        slope = v['ema9'] - v['ema21']
+        choppy = 45 < v['rsi'] < 55 or body < bar_range(bar) * 0.4 or v['atr'] < 0.05
+        if choppy or abs(slope) < 0.03:
+            return None
+        if slope > 0 and v['rsi'] > 58:
+            return "BUY"
+        if slope < 0 and v['rsi'] < 42:
+            return "SELL"
+        return None
+
+    def on_bar(self, event):
+        v = event.values
+        side = self.signal(v, event.bar)
+        if side is None:
+            return
+        get_journal().signal(event.symbol, side, note=self.name)
+        self.engine.market_order(event.symbol, side, *_bracket(self.engine, event.symbol, side, v['atr'],
+                                                              self.sl_atr, self.tp_atr),
+                                 magic=self.magic, comment="Ironman V12 ⚡", deviation=20)
+
+
+# === EMA CROSS (hft.py) ===
+class EmaCross(Strategy):
+    """Side of EMA 5 vs EMA 10 every bar while the spread is tight, stop 1.5 bar ranges away."""
+    name = 'ema_cross'
+    symbols = ("XAUUSD", "EURUSD")
+    indicators = {'ema5': indicator('ema', 5, adjust=True), 'ema10': indicator('ema', 10, adjust=True)}
+    magic = 99988
+    trail = (5, 3)
+    spread_limit = 300    # points
+    sl_range = 1.5
+    tp_range = 3.0
+
+    def on_bar(self, event):
+        v = event.values
+        if not spreads.ok(event.symbol, max_points=self.spread_limit) or v['ema5'] == v['ema10']:
+            return
+        side = "BUY" if v['ema5'] > v['ema10'] else "SELL"
+        get_journal().signal(event.symbol, side, note=self.name)
+        rng = bar_range(event.bar)
+        self.engine.market_order(event.symbol, side, *_bracket(self.engine, event.symbol, side, rng,
+                                                              self.sl_range, self.tp_range),
+                                 magic=self.magic, comment="💹HFT-BOT-PRO")
+
+
+def _bracket(engine, symbol, side, unit, sl_mult, tp_mult):
+    """(volume, sl, tp) for a market entry with stops sl_mult / tp_mult units from the quote."""
+    info = specs.get(symbol)
+    quote = engine.quote(symbol)
+    buy = side == "BUY"
+    price = quote.ask if buy else quote.bid
+    sign = 1 if buy else -1
+    volume = risk_lot(engine.account_balance(), sl_mult * unit, info)
+    return (volume, round(price - sign * sl_mult * unit, info.digits),
+            round(price + sign * tp_mult * unit, info.digits))
+
+
+PLUGINS = {cls.name: cls for cls in (VolumeSkew, VPRecovery, TrendMomentum, EmaCross)}
@@ -0,0 +1,117 @@
+import logging
+from datetime import timedelta
+
+import numpy as np
+
+from mt5_wrapper import mt5, now
+from symbol_cache import specs, quotes
+from order_gateway import get_gateway
+from strategy.vp_recovery import PARAMS, cluster_ratios, manage_positions
+
+CLUSTER_TICKS = 100   # max ticks pulled for the cluster-exit window
+
+
+# === SNAPSHOT ===
+# Everything one management pass needs, read once per cycle: the open tickets
+# as arrays, one quote and one recent-tick window for the symbol.
+class PositionSnapshot:
+    __slots__ = ('positions', 'ticket', 'is_buy', 'volume', 'price_open', 'sl', 'tick', 'window', 'point')
+
+    def __init__(self, positions, tick, window, point):
+        self.positions = positions
+        self.ticket = np.array([p.ticket for p in positions], dtype=np.int64)
+        self.is_buy = np.array([p.type == mt5.POSITION_TYPE_BUY for p in positions], dtype=bool)
+        self.volume = np.array([p.volume for p in positions], dtype=np.float64)
+        self.price_open = np.array([p.price_open for p in positions], dtype=np.float64)
+        self.sl = np.array([p.sl for p in positions], dtype=np.float64)
+        self.tick = tick
+        self.window = window
+        self.point = point
+
+    def __len__(self):
+        return len(self.positions)
+
+
+# === MANAGER ===
+# Trailing, POC-recovery and cluster exits for all tickets of one symbol in a
+# single vectorized pass. Orders are built first and queued on the order
+# gateway together at the end, so the terminal round trips per cycle are 3 +
+# one per actual order, whatever the number of stacked entries. With
+# trail=False the stops are left to a tick-driven TrailingEngine
+# (strategy/trailing.py) and only the exits are handled here.
+class PositionManager:
+    def __init__(self, symbol, magic, params=None, deviation=None, trail=True):
+        self.symbol = symbol
+        self.magic = magic
+        self.trail = trail
+        self.p = {**PARAMS, **(params or {})}
+        self.deviation = deviation if deviation is not None else self.p['deviation']
+
+    def snapshot(self):
+        positions = mt5.positions_get(symbol=self.symbol) or ()
+        if not positions:
+            return None
+        tick = quotes.tick(self.symbol)
+        window = mt5.copy_ticks_from(self.symbol, now() - timedelta(seconds=self.p['cluster_window']),
+                                     CLUSTER_TICKS, mt5.COPY_TICKS_ALL)
+        return PositionSnapshot(positions, tick, window, specs.get(self.symbol).point)
+
+    def evaluate(self, snap, poc):
+        """(clusters, new_sl, reasons) arrays aligned with snap.positions."""
+        p = self.p
+        clusters = cluster_ratios(snap.window, snap.price_open, snap.is_buy)
+        new_sl, reasons = manage_positions(
+            snap.is_buy, snap.price_open, snap.tick.bid, snap.tick.ask, poc, snap.point, clusters,
+            p['trail_trigger'], p['trail_buffer'], p['recovery_zone'], p['volume_cluster_ratio'])
+        return clusters, new_sl, reasons
+
+    def orders(self, snap, new_sl, reasons):
+        """Request dicts for one pass: SL modifications that improve the stop first, then closes."""
+        bid, ask = snap.tick.bid, snap.tick.ask
+        requests = []
+        better = (snap.sl == 0) | np.where(snap.is_buy, new_sl > snap.sl, new_sl < snap.sl)
+        trail = ~np.isnan(new_sl) & better if self.trail else np.zeros(len(snap), dtype=bool)
+        for i in np.flatnonzero(trail):
+            requests.append({
+                "action": mt5.TRADE_ACTION_SLTP,
+                "symbol": self.symbol,
+                "position": int(snap.ticket[i]),
+                "sl": float(new_sl[i]),
+                "tp": 0.0,
+            })
+        for i in np.flatnonzero(reasons != None):   # noqa: E711 - elementwise on an object array
+            is_buy = bool(snap.is_buy[i])
+            requests.append({
+                'action': mt5.TRADE_ACTION_DEAL,
+                'symbol': self.symbol,
+                'volume': float(snap.volume[i]),
+                'type': mt5.ORDER_TYPE_SELL if is_buy else mt5.ORDER_TYPE_BUY,
+                'position': int(snap.ticket[i]),
+                'price': bid if is_buy else ask,
+                'deviation': self.deviation,
+                'magic': self.magic,
+                'comment': reasons[i],
+                'type_time': mt5.ORDER_TIME_GTC,
+                'type_filling': mt5.ORDER_FILLING_IOC,
+            })
+        return requests
+
+    def manage(self, poc):
+        """One management cycle; returns [(request, Future)] for the orders queued on the gateway."""
+        snap = self.snapshot()
+        if snap is None:
+            return []
+        clusters, new_sl, reasons = self.evaluate(snap, poc)
+        for ticket, buy, cluster in zip(snap.ticket, snap.is_buy, clusters):
+            logging.info(f"Volume cluster ratio ({'BUY' if buy else 'SELL'}) ticket {ticket}: {cluster:.2f}")
+
+        gateway = get_gateway()
+        return [(req, gateway.submit(req, _log_outcome)) for req in self.orders(snap, new_sl, reasons)]
+
+
+def _log_outcome(o):
+    req = o.request
+    if req['action'] == mt5.TRADE_ACTION_SLTP:
+        logging.info(f"Trailing SL set at {req['sl']:.3f} for ticket {req['position']}, retcode={o.retcode}")
+    else:
+        logging.warning(f"{req['comment']} at {req['price']:.3f} for ticket {req['position']}, retcode={o.retcode}")
@@ -0,0 +1,163 @@
+import logging
+
+import numpy as np
+
+from mt5_wrapper import mt5, sleep, now
+from order_gateway import get_gateway
+from symbol_cache import specs
+
+# === CONFIG ===
+TRAIL_TRIGGER  = 5      # points in profit before a stop starts trailing
+TRAIL_DISTANCE = 3      # points the stop sits behind price
+TRAIL_STEP     = None   # min points a stop must improve by to be resent (None: the trail distance)
+MIN_INTERVAL   = 1.0    # seconds between SLTP requests for the same ticket
+POLL_INTERVAL  = 0.1    # seconds between quote checks in run_for()
+SYNC_INTERVAL  = 5.0    # seconds between positions_get() refreshes in run_for()
+RETCODE_POSITION_GONE = 10036
+
+
+def freeze_distance(info):
+    """Minimum stop improvement worth a request: the symbol's freeze (or stops) level, at least 1 point."""
+    level = getattr(info, 'trade_freeze_level', 0) or getattr(info, 'trade_stops_level', 0) or 1
+    return level * info.point
+
+
+# === BOOK ===
+# Open positions of one symbol as arrays, so a quote update re-prices every
+# stop in one pass.
+class _Book:
+    __slots__ = ('ticket', 'is_buy', 'price_open', 'sl', 'tp', 'point', 'digits', 'freeze', 'last_msc')
+
+    def __init__(self, positions, info):
+        self.ticket = np.array([p.ticket for p in positions], dtype=np.int64)
+        self.is_buy = np.array([p.type == mt5.POSITION_TYPE_BUY for p in positions], dtype=bool)
+        self.price_open = np.array([p.price_open for p in positions], dtype=np.float64)
+        self.sl = np.array([p.sl for p in positions], dtype=np.float64)
+        self.tp = np.array([p.tp for p in positions], dtype=np.float64)
+        self.point = info.point
+        self.digits = info.digits
+        self.freeze = freeze_distance(info)
+        self.last_msc = -1
+
+
+# === ENGINE ===
+# Trails stops on every new quote instead of once per bot cycle. Stops are
+# computed in memory; an SLTP request goes out only when the stop improves by
+# more than the freeze level and the trail step, at most once per MIN_INTERVAL
+# per ticket and never while an earlier request for that ticket is in flight.
+class TrailingEngine:
+    def __init__(self, trigger=TRAIL_TRIGGER, distance=TRAIL_DISTANCE, min_interval=MIN_INTERVAL,
+                 symbols=None, magic=None, step=TRAIL_STEP):
+        self.trigger = trigger
+        self.distance = distance
+        self.step = distance if step is None else step
+        self.min_interval = min_interval
+        self.symbols = set(symbols) if symbols else None
+        self.magic = magic
+        self.books = {}
+        self._last_sent = {}     # ticket -> epoch seconds of the last request
+        self._pending = set()
+        self._synced = None
+        self.sent = 0
+        self.updates = 0
+
+    # --- positions ---
+    def sync(self, positions=None):
+        """Reload the open positions (one positions_get unless they are passed in)."""
+        if positions is None:
+            positions = mt5.positions_get() or ()
+        by_symbol = {}
+        for p in positions:
+            if (self.symbols and p.symbol not in self.symbols) or (self.magic is not None and p.magic != self.magic):
+                continue
+            by_symbol.setdefault(p.symbol, []).append(p)
+        books = {}
+        for symbol, group in by_symbol.items():
+            info = specs.get(symbol)
+            if info is None:
+                continue
+            book = _Book(group, info)
+            old = self.books.get(symbol)
+            book.last_msc = old.last_msc if old is not None else -1
+            books[symbol] = book
+        live = {int(t) for b in books.values() for t in b.ticket}
+        self._last_sent = {t: s for t, s in self._last_sent.items() if t in live}
+        self.books = books
+        self._synced = now()
+
+    # --- quotes ---
+    def on_tick(self, symbol, bid, ask, time_msc=None):
+        """Re-price the stops of `symbol` at one quote and send the ones worth moving."""
+        book = self.books.get(symbol)
+        if book is None or len(book.ticket) == 0:
+            return 0
+        if time_msc is not None:
+            if time_msc <= book.last_msc:
+                return 0
+            book.last_msc = time_msc
+        self.updates += 1
+
+        point = book.point
+        price = np.where(book.is_buy, bid, ask)
+        profit = np.where(book.is_buy, price - book.price_open, book.price_open - price) / point
+        stop = np.where(book.is_buy, price - self.distance * point, price + self.distance * point)
+        gain = np.where(book.sl == 0, np.inf, np.where(book.is_buy, stop - book.sl, book.sl - stop))
+        move = (profit >= self.trigger) & (gain > max(book.freeze, self.step * point))
+        if not move.any():
+            return 0
+
+        t = now().timestamp()
+        sent = 0
+        for i in np.flatnonzero(move):
+            ticket = int(book.ticket[i])
+            if ticket in self._pending or t - self._last_sent.get(ticket, -np.inf) < self.min_interval:
+                continue
+            sl = round(float(stop[i]), book.digits)
+            self._pending.add(ticket)
+            self._last_sent[ticket] = t
+            self.sent += 1
+            sent += 1
+            request = {
+                "action": mt5.TRADE_ACTION_SLTP,
+                "symbol": symbol,
+                "position": ticket,
+                "sl": sl,
+                "tp": float(book.tp[i]),
+            }
+            get_gateway().submit(request, lambda o, s=symbol, k=ticket: self._done(s, k, o))
+        return sent
+
+    def _done(self, symbol, ticket, outcome):
+        self._pending.discard(ticket)
+        book = self.books.get(symbol)
+        hit = np.flatnonzero(book.ticket == ticket) if book is not None else ()
+        if outcome.ok:
+            for i in hit:
+                book.sl[i] = outcome.request['sl']
+            logging.info(f"🔁 Trailed SL {symbol} #{ticket} → {outcome.request['sl']} ({outcome.latency * 1e3:.0f}ms)")
+        elif outcome.retcode == RETCODE_POSITION_GONE:
+            for i in hit:
+                book.sl[i] = np.nan   # closed by the broker; dropped on the next sync
+        else:
+            logging.warning(f"❌ Trail SL failed on {symbol} #{ticket}: {outcome.retcode}")
+
+    def poll(self):
+        """Check each tracked symbol's latest quote once; returns the number of requests sent."""
+        sent = 0
+        for symbol in list(self.books):
+            tick = mt5.symbol_info_tick(symbol)
+            if tick is not None:
+                sent += self.on_tick(symbol, tick.bid, tick.ask, tick.time_msc)
+        return sent
+
+    def run_for(self, seconds, poll_interval=POLL_INTERVAL, sync_interval=SYNC_INTERVAL):
+        """Trail on every new quote for `seconds`; the drop-in replacement for a bot loop's sleep()."""
+        end = now().timestamp() + seconds
+        while True:
+            if self._synced is None or (now() - self._synced).total_seconds() >= sync_interval:
+                self.sync()
+            self.poll()
+            remaining = end - now().timestamp()
+            if remaining <= 0:
+                break
+            sleep(min(poll_interval, remaining))
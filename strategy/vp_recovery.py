@@ -0,0 +1,73 @@
+from datetime import time
+
+import numpy as np
+
+from indicators.volume_profile import tick_prices, tick_volumes
+
+# Decision rules of the VP Recovery multi-entry strategy (vpt-bot2.py), kept
+# free of MT5 calls so the live bot and the tick replay run the same code.
+
+PARAMS = {
+    'price_step':           0.01,
+    'atr_period':           14,
+    'skew_threshold':       0.1,
+    'vol_spike_factor':     0.8,
+    'trading_start':        time(0, 0),
+    'trading_end':          time(20, 55),
+    'lot_size':             0.01,
+    'trail_trigger':        5,      # points in profit before the SL trails
+    'trail_buffer':         3,      # points behind price
+    'recovery_zone':        2,      # points around the POC for the recovery exit
+    'volume_cluster_ratio': 1,
+    'cluster_window':       10,     # seconds of ticks for the cluster exit
+    'max_positions':        5,
+    'deviation':            10,
+}
+
+
+# === ENTRY ===
+def entry_side(skew, tick_volume, tick_thresh, skew_threshold):
+    if skew is None or not tick_volume >= tick_thresh or abs(skew) < skew_threshold:   # NaN: no baseline yet
+        return None
+    return 'BUY' if skew > 0 else 'SELL'
+
+
+# === EXITS ===
+# Evaluated for every open ticket of a symbol at once, so the cost per cycle
+# doesn't grow with the stack. A position in profit by more than
+# trail_trigger points gets a stop trail_buffer points behind price; a losing
+# one is closed when price is back within recovery_zone points of the POC, or
+# when more than volume_cluster_ratio of the recent volume trades against it.
+def cluster_ratios(ticks, entry_prices, is_buy):
+    """Share of the window's volume trading against each position (below entry for BUY, above for SELL)."""
+    entry_prices = np.asarray(entry_prices, dtype=np.float64)
+    if ticks is None or len(ticks) == 0 or len(entry_prices) == 0:
+        return np.zeros(len(entry_prices))
+    price = tick_prices(ticks)
+    vol = tick_volumes(ticks)
+    total = vol.sum()
+    if total <= 0:
+        return np.zeros(len(entry_prices))
+    below = price[None, :] < entry_prices[:, None]
+    above = price[None, :] > entry_prices[:, None]
+    against = np.where(np.asarray(is_buy, dtype=bool)[:, None], below, above)
+    return np.where(against, vol, 0.0).sum(axis=1) / total
+
+def manage_positions(is_buy, price_open, bid, ask, poc, point, clusters,
+                     trail_trigger=PARAMS['trail_trigger'], trail_buffer=PARAMS['trail_buffer'],
+                     recovery_zone=PARAMS['recovery_zone'],
+                     volume_cluster_ratio=PARAMS['volume_cluster_ratio']):
+    """(new_sl with NaN for no change, exit comment or None) per ticket."""
+    is_buy = np.asarray(is_buy, dtype=bool)
+    price_open = np.asarray(price_open, dtype=np.float64)
+    current = np.where(is_buy, bid, ask)
+    profit_points = np.where(is_buy, current - price_open, price_open - current) / point
+    new_sl = np.where(profit_points > trail_trigger,
+                      np.where(is_buy, current - trail_buffer * point, current + trail_buffer * point), np.nan)
+    losing = profit_points < 0
+    recovery = losing & (abs(current - poc) <= recovery_zone * point) if poc is not None else np.zeros_like(losing)
+    cluster = losing & ~recovery & (np.asarray(clusters) > volume_cluster_ratio)
+    reasons = np.full(len(is_buy), None, dtype=object)
+    reasons[recovery] = 'POC_RECOVERY_EXIT'
+    reasons[cluster] = 'CLUSTER_EXIT'
+    return new_sl, reasons
@@ -0,0 +1,71 @@
+import time
+
+from mt5_wrapper import mt5
+
+# === CONFIG ===
+SPEC_TTL = 300   # seconds before a symbol's contract spec is fetched again
+
+
+# === SPEC REGISTRY ===
+# symbol_info() results keyed by symbol. Only the static fields (point, digits,
+# trade_tick_value, volume_min/step, freeze_level, filling_mode, ...) should be
+# read from these; bid/ask/spread inside them go stale - use QuoteSnapshot.
+class SymbolSpecs:
+    def __init__(self, ttl=SPEC_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._specs = {}
+        self.fetches = 0
+
+    def get(self, symbol):
+        """Cached symbol_info(symbol); None (and not cached) if the terminal has none."""
+        entry = self._specs.get(symbol)
+        now = self.clock()
+        if entry is not None and now - entry[1] < self.ttl:
+            return entry[0]
+        info = mt5.symbol_info(symbol)
+        self.fetches += 1
+        if info is None:
+            self._specs.pop(symbol, None)
+            return None
+        self._specs[symbol] = (info, now)
+        return info
+
+    __getitem__ = get
+
+    def invalidate(self, symbol=None):
+        if symbol is None:
+            self._specs.clear()
+        else:
+            self._specs.pop(symbol, None)
+
+
+# === QUOTES ===
+# One symbol_info_tick() per symbol per loop cycle, shared by the signal check
+# and every open position of that symbol. Call clear() when a cycle starts.
+class QuoteSnapshot:
+    def __init__(self):
+        self._ticks = {}
+        self.fetches = 0
+
+    def tick(self, symbol):
+        tick = self._ticks.get(symbol)
+        if tick is None:
+            tick = mt5.symbol_info_tick(symbol)
+            self.fetches += 1
+            if tick is not None:
+                self._ticks[symbol] = tick
+        return tick
+
+    __getitem__ = tick
+
+    def put(self, symbol, tick):
+        """Use a quote the caller already has (e.g. the last streamed tick) for this cycle."""
+        self._ticks[symbol] = tick
+
+    def clear(self):
+        self._ticks.clear()
+
+
+specs = SymbolSpecs()
+quotes = QuoteSnapshot()
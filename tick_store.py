@@ -0,0 +1,197 @@
+import os
+import glob
+import time as ptime
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import MetaTrader5 as mt5
+except ImportError:   # Linux backtest/CI boxes: cache only
+    mt5 = None
+
+# === CONFIG ===
+DATA_ROOT    = os.path.join("data", "store")
+DAY          = 86400
+SETTLE_DELAY = 120    # seconds after midnight before a day is treated as final
+
+TICK_DTYPE = np.dtype([
+    ('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+    ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8'),
+])
+RATE_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8'),
+])
+TIMEFRAME_SECONDS = {'M1': 60, 'M5': 300, 'M15': 900, 'M30': 1800, 'H1': 3600, 'H4': 14400, 'D1': 86400}
+
+
+def _utc(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+# === BAR SPLITTING ===
+def bar_slices(ticks, bar_times, bar_seconds=60):
+    """(starts, ends) so that ticks[starts[i]:ends[i]] are the ticks of the bar opening at bar_times[i]."""
+    msc = np.asarray(ticks['time_msc'], dtype=np.int64)
+    t = np.asarray(bar_times, dtype=np.int64) * 1000
+    return np.searchsorted(msc, t, side='left'), np.searchsorted(msc, t + bar_seconds * 1000, side='left')
+
+
+def bars_from_ticks(ticks, bar_seconds=60):
+    """OHLC bars built from bid prices, tick_volume = number of ticks (how MT5 builds them)."""
+    msc = np.asarray(ticks['time_msc'], dtype=np.int64)
+    if len(msc) == 0:
+        return np.empty(0, RATE_DTYPE)
+    bid = np.asarray(ticks['bid'], dtype=np.float64)
+    bar_id = msc // (bar_seconds * 1000)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bar_id)) + 1))
+    ends = np.concatenate((starts[1:], [len(msc)]))
+    bars = np.zeros(len(starts), RATE_DTYPE)
+    bars['time'] = bar_id[starts] * bar_seconds
+    bars['open'] = bid[starts]
+    bars['close'] = bid[ends - 1]
+    bars['high'] = np.maximum.reduceat(bid, starts)
+    bars['low'] = np.minimum.reduceat(bid, starts)
+    bars['tick_volume'] = ends - starts
+    return bars
+
+
+# === STORE ===
+# One .npy file per symbol / kind / UTC day. Finished days are written once and
+# read back memory-mapped; the current day lives in a .partial.npy file and only
+# its tail is fetched again on the next run.
+class TickStore:
+    def __init__(self, root=DATA_ROOT, online=None):
+        self.root = root
+        if online is None:
+            online = mt5 is not None and mt5.terminal_info() is not None
+        self.online = online
+
+    # --- files ---
+    def _dir(self, symbol, kind):
+        return os.path.join(self.root, symbol, kind)
+
+    def _path(self, symbol, kind, day, partial=False):
+        name = _utc(day * DAY).strftime("%Y-%m-%d") + (".partial.npy" if partial else ".npy")
+        return os.path.join(self._dir(symbol, kind), name)
+
+    def _save(self, path, arr):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp.npy"
+        np.save(tmp, np.ascontiguousarray(arr))
+        os.replace(tmp, path)
+
+    # --- terminal ---
+    def _fetch(self, symbol, kind, t0, t1):
+        if kind == 'ticks':
+            data = mt5.copy_ticks_range(symbol, _utc(t0), _utc(t1), mt5.COPY_TICKS_ALL)
+            dtype = TICK_DTYPE
+        else:
+            tf = getattr(mt5, 'TIMEFRAME_' + kind)
+            data = mt5.copy_rates_range(symbol, tf, _utc(t0), _utc(t1 - 1))
+            dtype = RATE_DTYPE
+        if data is None:   # terminal error or history not downloaded yet: not the same as no data
+            return None
+        if len(data) == 0:
+            return np.empty(0, dtype)
+        return data
+
+    @staticmethod
+    def _key(kind):
+        return 'time_msc' if kind == 'ticks' else 'time'
+
+    def _day(self, symbol, kind, day, now):
+        full = self._path(symbol, kind, day)
+        if os.path.exists(full):
+            return np.load(full, mmap_mode='r')
+        part = self._path(symbol, kind, day, partial=True)
+        cached = np.load(part) if os.path.exists(part) else None
+        dtype = TICK_DTYPE if kind == 'ticks' else RATE_DTYPE
+        if not self.online:
+            return cached if cached is not None else np.empty(0, dtype)
+
+        day_start, day_end = day * DAY, (day + 1) * DAY
+        key = self._key(kind)
+        keep = cached[:0] if cached is not None else np.empty(0, dtype)
+        since = day_start
+        if cached is not None and len(cached):
+            # refetch from the last stamp: it may have been a forming bar or a split millisecond
+            last = int(cached[key][-1])
+            keep = cached[cached[key] < last]
+            since = last // 1000 if kind == 'ticks' else last
+        new = self._fetch(symbol, kind, since, min(day_end, int(now) + 1))
+        if new is None:
+            # keep what is cached (last stamp included) and retry on the next read; never finalise a failed fetch
+            return cached if cached is not None else np.empty(0, dtype)
+        if cached is not None and len(cached):
+            new = new[new[key] >= last]
+        lo = day_start * (1000 if kind == 'ticks' else 1)
+        hi = day_end * (1000 if kind == 'ticks' else 1)
+        new = new[(new[key] >= lo) & (new[key] < hi)]
+        arr = np.concatenate((keep, new.astype(keep.dtype, copy=False))) if len(keep) else new
+
+        if now >= day_end + SETTLE_DELAY:
+            self._save(full, arr)
+            if os.path.exists(part):
+                os.remove(part)
+        elif len(arr):
+            self._save(part, arr)
+        return arr
+
+    def _range(self, symbol, kind, start, end):
+        now = ptime.time()
+        days = range(int(start) // DAY, (int(end) - 1) // DAY + 1)
+        parts = [self._day(symbol, kind, d, now) for d in days]
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return np.empty(0, TICK_DTYPE if kind == 'ticks' else RATE_DTYPE)
+        arr = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        key = arr[self._key(kind)]
+        scale = 1000 if kind == 'ticks' else 1
+        i0 = np.searchsorted(key, int(start) * scale, side='left')
+        i1 = np.searchsorted(key, int(end) * scale, side='left')
+        return arr[i0:i1]
+
+    # --- public ---
+    def span(self, symbol, kind='ticks'):
+        """(start, end) epoch seconds covered by the cached days of `kind`, None if nothing is cached."""
+        files = sorted(f for f in glob.glob(os.path.join(self._dir(symbol, kind), "*.npy"))
+                       if not f.endswith(".tmp.npy"))
+        if not files:
+            return None
+        day = lambda f: int(datetime.strptime(os.path.basename(f)[:10], "%Y-%m-%d")
+                            .replace(tzinfo=timezone.utc).timestamp())
+        return day(files[0]), day(files[-1]) + DAY
+
+    def ticks(self, symbol, start, end):
+        """All ticks with start <= time < end (epoch seconds)."""
+        return self._range(symbol, 'ticks', start, end)
+
+    def bars(self, symbol, timeframe, start, end):
+        """Bars of `timeframe` ('M1', 'M5', ...) opening in [start, end)."""
+        return self._range(symbol, timeframe, start, end)
+
+    def last_bars(self, symbol, timeframe, count):
+        """The `count` most recent closed bars; from the cache alone when offline."""
+        if self.online:
+            tf = getattr(mt5, 'TIMEFRAME_' + timeframe)
+            probe = mt5.copy_rates_from_pos(symbol, tf, 1, count)
+            if probe is None or len(probe) == 0:
+                return np.empty(0, RATE_DTYPE)
+            return self.bars(symbol, timeframe, int(probe['time'][0]), int(probe['time'][-1]) + 1)[-count:]
+        files = sorted(f for f in glob.glob(os.path.join(self._dir(symbol, timeframe), "*.npy"))
+                       if not f.endswith(".tmp.npy"))
+        parts, n = [], 0
+        for f in reversed(files):
+            arr = np.load(f, mmap_mode='r')
+            parts.append(arr)
+            n += len(arr)
+            if n >= count:
+                break
+        if not parts:
+            return np.empty(0, RATE_DTYPE)
+        arr = np.concatenate(parts[::-1])
+        if files and files[-1].endswith(".partial.npy"):
+            arr = arr[:-1]   # last cached bar may still have been forming
+        return arr[-count:]
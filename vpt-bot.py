@@ -1,9 +1,19 @@
-import MetaTrader5 as mt5
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta, time, timezone
-import time as ptime
+from datetime import datetime, time, timezone
 import logging
+import time as ptime
+from collections import deque
+
+from indicators.rolling_profile import BarVolumeProfile
+from indicators.atr import calculate_atr
+from indicators.volume_baseline import VolumeBaseline, SEED_BARS
+from mt5_wrapper import mt5
+from runtime.bar_clock import BarCloseDispatcher
+from order_gateway import get_gateway
+from journal import get_journal
+from latency import timings
+from sessions import window, spreads
 
 # === CONFIGURATION ===
 LOGIN            = 240512732
@@ -18,7 +28,9 @@ SKEW_THRESHOLD   = 0.1         # minimum absolute skew to trade
 VOL_SPIKE_FACTOR = 0.8         # bar tick count > factor * avg tick count
 TRADING_START    = time(0,0)   # UTC
 TRADING_END      = time(20,55) # UTC
+SESSION          = window(TRADING_START, TRADING_END)
 MAGIC            = 123456
+POLL_INTERVAL    = 0.25        # seconds between tick polls mid-bar
 
 # === SETUP LOGGING ===
 logging.basicConfig(
@@ -40,71 +52,110 @@ def initialize():
 
 # === CLEANUP ===
 def shutdown():
+    get_gateway().close()   # let queued orders finish before disconnecting
+    timings.report()
     mt5.shutdown()
     print("MT5 shutdown completed")
     logging.info("MT5 shutdown")
 
-# === FEATURE: VOLUME-PROFILE SKEW ===
-def calc_skew(df_ticks):
-    if df_ticks.empty:
-        return None
-    df = df_ticks.copy()
-    df['price'] = (df['bid'] + df['ask']) / 2
-    df['volume'] = df['volume'].replace(0, 1)
-    df['bin'] = (df['price'] / PRICE_STEP).round() * PRICE_STEP
-    vp = df.groupby('bin')['volume'].sum().sort_index()
-    if vp.empty:
-        return None
-    poc = vp.idxmax(); total = vp.sum(); cum = 0.0; inc = []
-    for p, v in vp.sort_values(ascending=False).items():
-        cum += v; inc.append(p)
-        if cum >= 0.7 * total:
-            break
-    val, vah = min(inc), max(inc)
-    width = vah - val; mid = (val + vah) / 2
-    return (poc - mid) / width if width > 0 else 0
+# === ORDERS ===
+# Entries and exits go through the order gateway. Its worker thread reports
+# each outcome into `filled` and the loop moves those into the latency
+# stages, so the histograms are only written from the main thread.
+filled = deque()
+
+def submit(req, label, clock, bar_open):
+    """Queue an order; the outcome is logged and its timings handed back through `filled`."""
+    def done(o):
+        filled.append((o.latency, clock.server_ms() / 1000 - (bar_open + 60)))
+        msg = f"{label} at {o.request['price']:.3f}, retcode={o.retcode}, {o.status}"
+        print(msg); logging.info(msg)
+    return get_gateway().submit(req, done)
+
+def close_positions(clock, bar_open):
+    """Flatten this bot's positions at market (the one-bar exit)."""
+    tick = mt5.symbol_info_tick(SYMBOL)
+    for pos in mt5.positions_get(symbol=SYMBOL) or ():
+        if pos.magic != MAGIC:
+            continue
+        buy = pos.type == mt5.POSITION_TYPE_BUY
+        close_req = {
+            'action':       mt5.TRADE_ACTION_DEAL,
+            'symbol':       SYMBOL,
+            'volume':       pos.volume,
+            'type':         mt5.ORDER_TYPE_SELL if buy else mt5.ORDER_TYPE_BUY,
+            'position':     pos.ticket,
+            'price':        tick.bid if buy else tick.ask,
+            'deviation':    10,
+            'magic':        MAGIC,
+            'comment':      'HFT_DP_CLOSE',
+            'type_time':    mt5.ORDER_TIME_GTC,
+            'type_filling': mt5.ORDER_FILLING_IOC
+        }
+        submit(close_req, f"Exit {'BUY' if buy else 'SELL'}", clock, bar_open)
 
 # === MAIN LOOP ===
 def main():
     initialize()
-    # Precompute average tick count per bar
-    bars_hist = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, 200)
-    df_hist = pd.DataFrame(bars_hist)
-    avg_ticks = df_hist['tick_volume'].mean()
-    tick_thresh = avg_ticks * VOL_SPIKE_FACTOR
-    print(f"Avg tick count: {avg_ticks:.0f}, threshold: {tick_thresh:.0f}")
+    # Tick-count baseline per time of day, seeded once and then fed every closed bar
+    baseline = VolumeBaseline()
+    baseline.sync(mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, SEED_BARS))
+    print(f"Tick baseline seeded from {baseline.n} bars")
 
     logging.info("Live bot started")
     print("Live bot started. Entering main loop...")
+    bar_clock = BarCloseDispatcher(SYMBOL, idle_poll=POLL_INTERVAL)   # wakes on the new bar's first tick
+    bar_profile = BarVolumeProfile(PRICE_STEP)
+    holding = False   # an entry went out on the previous bar: exit at this bar's close
     while True:
-        # sync to top of minute
-        now = datetime.now(timezone.utc)
-        next_min = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
-        ptime.sleep(max((next_min - datetime.now(timezone.utc)).total_seconds(), 0))
-
-        bar_time = next_min - timedelta(minutes=1)
-        t = bar_time.time()
-        if not (TRADING_START <= t <= TRADING_END):
-            print(f"Outside trading hours: {t}")
+        # stream ticks into the forming bar's profile until the next bar starts
+        with timings.stage('poll'):
+            ticks = bar_clock.poll()
+            spreads.update(SYMBOL, ticks)
+        with timings.stage('profile'):
+            closed = bar_profile.update(ticks)
+        if not closed:
+            bar_clock.wait()
+            continue
+        bar_open, vp = closed[-1]
+        while filled:
+            latency, close_to_fill = filled.popleft()
+            timings.record('order', latency)
+            timings.record('close_to_fill', close_to_fill)
+        timings.maybe_report()
+        # how long after the bar ended (server time) its close was seen: mostly the wait for the next tick
+        timings.record('close_lag', bar_clock.clock.server_ms() / 1000 - (bar_open + 60))
+        decided = ptime.perf_counter()
+
+        # exit at close of the candle after the entry
+        if holding:
+            close_positions(bar_clock.clock, bar_open)
+            holding = False
+
+        if not SESSION.is_open(bar_open):
+            print(f"Outside trading hours: {datetime.fromtimestamp(bar_open, tz=timezone.utc).time()}")
+            continue
+        if not spreads.ok(SYMBOL):
+            print(f"Spread {spreads.last(SYMBOL):.0f} pts above its recent p{spreads.pctl}, skipping")
             continue
 
-        # fetch last closed bar
-        bars = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, 1)
-        if not bars:
+        # fetch the closed bars the baseline has not seen yet (just the last one mid-session)
+        with timings.stage('rates'):
+            bars = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, baseline.missing(bar_open))
+        if bars is None or len(bars) == 0:
             print("No bars returned")
             continue
-        bar = bars[0]
+        tick_thresh = baseline.sync(bars) * VOL_SPIKE_FACTOR
+        bar = bars[-1]
         # use UTC timestamp
         open_time = datetime.fromtimestamp(bar['time'], tz=timezone.utc)
         print(f"Processing bar at {open_time.isoformat()}")
 
         # ATR check
-        atr_bars = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, ATR_PERIOD+1)
-        df_atr = pd.DataFrame(atr_bars)
-        df_atr['tr'] = df_atr[['high','low','close']].apply(
-            lambda r: max(r['high']-r['low'], abs(r['high']-r['close']), abs(r['low']-r['close'])), axis=1)
-        df_atr['atr'] = df_atr['tr'].rolling(ATR_PERIOD).mean()
-        atr = df_atr['atr'].iloc[-1]
+        with timings.stage('atr_rates'):
+            atr_bars = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, ATR_PERIOD+1)
+        with timings.stage('atr'):
+            atr = calculate_atr(atr_bars, ATR_PERIOD)[-1]
         if pd.isna(atr):
             print("ATR not ready")
             continue
@@ -112,28 +163,26 @@ def main():
 
         # tick count filter
         bar_ticks = bar['tick_volume']
-        print(f"Bar tick count: {bar_ticks}")
-        if bar_ticks < tick_thresh:
+        print(f"Bar tick count: {bar_ticks}, threshold: {tick_thresh:.0f}")
+        if not bar_ticks >= tick_thresh:   # NaN until the baseline has enough bars
             print("Tick count below threshold, skipping")
             continue
 
-        # fetch tick data
-        end_time = open_time + timedelta(minutes=1)
-        ticks = mt5.copy_ticks_range(SYMBOL, open_time, end_time, mt5.COPY_TICKS_ALL)
-        df_ticks = pd.DataFrame(ticks)
-        if df_ticks.empty:
+        # skew from the streamed profile of the bar that just closed
+        if vp is None:
             print("No tick data")
             continue
 
-        # compute skew
-        skew = calc_skew(df_ticks)
+        skew = vp.skew
         print(f"Skew: {skew:.4f}")
         if skew is None or abs(skew) < SKEW_THRESHOLD:
             print("Skew below threshold, skipping")
             continue
 
         # place entry
-        tick = mt5.symbol_info_tick(SYMBOL)
+        get_journal().signal(SYMBOL, 'BUY' if skew > 0 else 'SELL', skew, 'vpt-bot.py')
+        with timings.stage('quote'):
+            tick = mt5.symbol_info_tick(SYMBOL)
         if skew > 0:
             order_type, price, side = mt5.ORDER_TYPE_BUY, tick.ask, 'BUY'
         else:
@@ -150,32 +199,10 @@ def main():
             'type_time':    mt5.ORDER_TIME_GTC,
             'type_filling': mt5.ORDER_FILLING_IOC
         }
-        res = mt5.order_send(req)
-        print(f"Entry {side} at {price:.3f}, retcode={res.retcode}")
-        logging.info(f"Entry {side} at {price:.3f}, retcode={res.retcode}")
-
-        # exit at close of candle
-        ptime.sleep(max((end_time - datetime.now(timezone.utc)).total_seconds() - 0.5, 0))
-        positions = mt5.positions_get(symbol=SYMBOL)
-        for pos in positions:
-            close_type = mt5.ORDER_TYPE_SELL if pos.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
-            close_price = mt5.symbol_info_tick(SYMBOL).bid if close_type == mt5.ORDER_TYPE_SELL else mt5.symbol_info_tick(SYMBOL).ask
-            close_req = {
-                'action':       mt5.TRADE_ACTION_DEAL,
-                'symbol':       SYMBOL,
-                'volume':       pos.volume,
-                'type':         close_type,
-                'position':     pos.ticket,
-                'price':        close_price,
-                'deviation':    10,
-                'magic':        MAGIC,
-                'comment':      'HFT_DP_CLOSE',
-                'type_time':    mt5.ORDER_TIME_GTC,
-                'type_filling': mt5.ORDER_FILLING_IOC
-            }
-            res2 = mt5.order_send(close_req)
-            print(f"Exit {side} at {close_price:.3f}, retcode={res2.retcode}")
-            logging.info(f"Exit {side} at {close_price:.3f}, retcode={res2.retcode}")
+        with timings.stage('submit'):
+            submit(req, f"Entry {side}", bar_clock.clock, bar_open)
+        timings.record('to_order', ptime.perf_counter() - decided)
+        holding = True
 
 if __name__ == '__main__':
     try:
@@ -1,10 +1,21 @@
-import MetaTrader5 as mt5
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta, time, timezone
-import time as ptime
+from datetime import datetime, time, timezone
 import logging
 
+from indicators.rolling_profile import BarVolumeProfile
+from indicators.atr import calculate_atr
+from indicators.volume_baseline import VolumeBaseline, SEED_BARS
+from mt5_wrapper import mt5, now
+from runtime.bar_clock import BarCloseDispatcher
+from symbol_cache import quotes
+from strategy.vp_recovery import entry_side
+from sessions import window, spreads
+from strategy.position_manager import PositionManager
+from strategy.trailing import TrailingEngine, SYNC_INTERVAL
+from order_gateway import get_gateway
+from journal import get_journal
+
 # === CONFIGURATION ===
 LOGIN = 240512732
 PASSWORD = "Mgi@2005"
@@ -18,11 +29,15 @@ SKEW_THRESHOLD = 0.1
 VOL_SPIKE_FACTOR = 0.8
 TRADING_START = time(0, 0)
 TRADING_END = time(20, 55)
+SESSION = window(TRADING_START, TRADING_END)
 MAGIC = 123456
+TRAIL_TRIGGER = 5
 TRAIL_BUFFER = 3
 RECOVERY_ZONE = 2
 VOLUME_CLUSTER_RATIO = 1
+CLUSTER_WINDOW = 10
 MAX_POSITIONS = 5
+POLL_INTERVAL = 0.25   # seconds between tick polls mid-bar
 
 # === LOGGING ===
 console_handler = logging.StreamHandler()
@@ -44,41 +59,6 @@ def shutdown():
     mt5.shutdown()
     logging.info("MT5 shutdown")
 
-def calc_skew(df_ticks, return_poc=False):
-    if df_ticks.empty:
-        return (None, None) if return_poc else None
-    df = df_ticks.copy()
-    df['price'] = (df['bid'] + df['ask']) / 2
-    df['volume'] = df['volume'].replace(0, 1)
-    df['bin'] = (df['price'] / PRICE_STEP).round() * PRICE_STEP
-    vp = df.groupby('bin')['volume'].sum().sort_index()
-    if vp.empty:
-        return (None, None) if return_poc else None
-    poc = vp.idxmax(); total = vp.sum(); cum = 0.0; inc = []
-    for p, v in vp.sort_values(ascending=False).items():
-        cum += v; inc.append(p)
-        if cum >= 0.7 * total:
-            break
-    val, vah = min(inc), max(inc)
-    width = vah - val; mid = (val + vah) / 2
-    skew = (poc - mid) / width if width > 0 else 0
-    return (skew, poc) if return_poc else skew
-
-def volume_cluster_exit(df_ticks, entry_price, direction):
-    if df_ticks.empty:
-        return False
-    df = df_ticks.copy()
-    df['price'] = (df['bid'] + df['ask']) / 2
-    df['volume'] = df['volume'].replace(0, 1)
-    if direction == 'SELL':
-        above_vol = df[df['price'] > entry_price]['volume'].sum()
-    else:
-        above_vol = df[df['price'] < entry_price]['volume'].sum()
-    total_vol = df['volume'].sum()
-    ratio = above_vol / total_vol if total_vol > 0 else 0
-    logging.info(f"Volume cluster ratio ({direction}): {ratio:.2f}")
-    return ratio > VOLUME_CLUSTER_RATIO
-
 def place_entry(side, price):
     order_type = mt5.ORDER_TYPE_BUY if side == 'BUY' else mt5.ORDER_TYPE_SELL
     req = {
@@ -93,57 +73,63 @@ def place_entry(side, price):
         'type_time': mt5.ORDER_TIME_GTC,
         'type_filling': mt5.ORDER_FILLING_IOC
     }
-    result = mt5.order_send(req)
-    logging.info(f"Stacked Entry {side} at {price:.3f}, retcode={result.retcode}")
+    get_gateway().submit(req, lambda o: logging.info(
+        f"Stacked Entry {side} at {o.request['price']:.3f}, retcode={o.retcode}, {o.latency * 1e3:.0f}ms"))
 
 def main():
     initialize()
-    bars_hist = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, 200)
-    df_hist = pd.DataFrame(bars_hist)
-    avg_ticks = df_hist['tick_volume'].mean()
-    tick_thresh = avg_ticks * VOL_SPIKE_FACTOR
+    baseline = VolumeBaseline()   # tick-count baseline per time of day, fed every closed bar
+    baseline.sync(mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, SEED_BARS))
 
     logging.info("VP Recovery v1.2 with Multi-Entry Armed.")
 
+    bar_clock = BarCloseDispatcher(SYMBOL, idle_poll=POLL_INTERVAL)   # wakes on the new bar's first tick
+    bar_profile = BarVolumeProfile(PRICE_STEP)
+    manager = PositionManager(SYMBOL, MAGIC, {
+        'recovery_zone': RECOVERY_ZONE, 'volume_cluster_ratio': VOLUME_CLUSTER_RATIO,
+        'cluster_window': CLUSTER_WINDOW,
+    }, trail=False)
+    trailer = TrailingEngine(TRAIL_TRIGGER, TRAIL_BUFFER, symbols=[SYMBOL], magic=MAGIC)
+    synced = None
     while True:
-        now = datetime.now(timezone.utc)
-        next_min = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
-        ptime.sleep(max((next_min - datetime.now(timezone.utc)).total_seconds(), 0))
+        # reload the trailed book on a timer, so entries filled by the gateway join it within SYNC_INTERVAL
+        if synced is None or (now() - synced).total_seconds() >= SYNC_INTERVAL:
+            trailer.sync()
+            synced = now()
+        ticks = bar_clock.poll()
+        if ticks is not None:   # stops trail on every new tick, exits are decided per bar
+            trailer.on_tick(SYMBOL, ticks['bid'][-1], ticks['ask'][-1], int(ticks['time_msc'][-1]))
+            spreads.update(SYMBOL, ticks)
+        closed = bar_profile.update(ticks)
+        if not closed:
+            bar_clock.wait()
+            continue
+        bar_open, vp = closed[-1]
 
-        bar_time = next_min - timedelta(minutes=1)
-        if not (TRADING_START <= bar_time.time() <= TRADING_END):
+        if not SESSION.is_open(bar_open) or not spreads.ok(SYMBOL):
             continue
 
-        bars = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, 1)
-        if not bars:
+        bars = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, baseline.missing(bar_open))
+        if bars is None or len(bars) == 0:
             continue
-        bar = bars[0]
+        tick_thresh = baseline.sync(bars) * VOL_SPIKE_FACTOR
+        bar = bars[-1]
         open_time = datetime.fromtimestamp(bar['time'], tz=timezone.utc)
 
         atr_bars = mt5.copy_rates_from_pos(SYMBOL, TIMEFRAME, 1, ATR_PERIOD + 1)
-        df_atr = pd.DataFrame(atr_bars)
-        df_atr['tr'] = df_atr[['high','low','close']].apply(
-            lambda r: max(r['high']-r['low'], abs(r['high']-r['close']), abs(r['low']-r['close'])), axis=1)
-        df_atr['atr'] = df_atr['tr'].rolling(ATR_PERIOD).mean()
-        atr = df_atr['atr'].iloc[-1]
+        atr = calculate_atr(atr_bars, ATR_PERIOD)[-1]
         if pd.isna(atr):
             continue
 
-        if bar['tick_volume'] < tick_thresh:
+        if vp is None:
             continue
-
-        end_time = datetime.now(timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
-        ticks = mt5.copy_ticks_range(SYMBOL, open_time, end_time, mt5.COPY_TICKS_ALL)
-        df_ticks = pd.DataFrame(ticks)
-        if df_ticks.empty:
-            continue
-
-        skew, poc = calc_skew(df_ticks, return_poc=True)
-        if skew is None or abs(skew) < SKEW_THRESHOLD:
+        poc = vp.poc
+        side = entry_side(vp.skew, bar['tick_volume'], tick_thresh, SKEW_THRESHOLD)
+        if side is None:
             continue
 
+        get_journal().signal(SYMBOL, side, vp.skew, 'vpt-bot2.py')
         tick = mt5.symbol_info_tick(SYMBOL)
-        side = 'BUY' if skew > 0 else 'SELL'
         price = tick.ask if side == 'BUY' else tick.bid
 
         # Check open positions before placing new one
@@ -153,71 +139,10 @@ def main():
         else:
             place_entry(side, price)
 
-        # Manage all positions independently
-        for pos in mt5.positions_get(symbol=SYMBOL):
-            tick = mt5.symbol_info_tick(SYMBOL)
-            point = mt5.symbol_info(SYMBOL).point
-            current_price = tick.bid if pos.type == mt5.POSITION_TYPE_BUY else tick.ask
-            entry_price = pos.price_open
-            profit_points = (current_price - entry_price) / point if pos.type == mt5.POSITION_TYPE_BUY else (entry_price - current_price) / point
-
-            # Trailing Stop-Loss
-            if profit_points > 5:
-                sl_price = current_price - TRAIL_BUFFER * point if pos.type == mt5.POSITION_TYPE_BUY else current_price + TRAIL_BUFFER * point
-                sl_req = {
-                    "action": mt5.TRADE_ACTION_SLTP,
-                    "symbol": SYMBOL,
-                    "position": pos.ticket,
-                    "sl": sl_price,
-                    "tp": 0.0,
-                }
-                mt5.order_send(sl_req)
-                logging.info(f"Trailing SL set at {sl_price:.3f} for ticket {pos.ticket}")
-
-            # Recovery zone exit near POC
-            if profit_points < 0 and abs(current_price - poc) <= RECOVERY_ZONE * point:
-                close_type = mt5.ORDER_TYPE_SELL if pos.type == mt5.POSITION_TYPE_BUY else mt5.ORDER_TYPE_BUY
-                close_price = tick.bid if close_type == mt5.ORDER_TYPE_SELL else tick.ask
-                close_req = {
-                    'action': mt5.TRADE_ACTION_DEAL,
-                    'symbol': SYMBOL,
-                    'volume': pos.volume,
-                    'type': close_type,
-                    'position': pos.ticket,
-                    'price': close_price,
-                    'deviation': 10,
-                    'magic': MAGIC,
-                    'comment': 'POC_RECOVERY_EXIT',
-                    'type_time': mt5.ORDER_TIME_GTC,
-                    'type_filling': mt5.ORDER_FILLING_IOC
-                }
-                mt5.order_send(close_req)
-                logging.warning(f"Exited near POC at {close_price:.3f} for ticket {pos.ticket}")
-
-            # Volume cluster pressure exit
-            ticks_live = mt5.copy_ticks_from(SYMBOL, datetime.now(timezone.utc) - timedelta(seconds=10), 100, mt5.COPY_TICKS_ALL)
-            df_live = pd.DataFrame(ticks_live)
-            direction = 'BUY' if pos.type == mt5.POSITION_TYPE_BUY else 'SELL'
-            if profit_points < 0 and volume_cluster_exit(df_live, entry_price, direction):
-                close_type = mt5.ORDER_TYPE_SELL if pos.type == mt5.POSITION_TYPE_BUY else mt5.ORDER_TYPE_BUY
-                close_price = tick.bid if close_type == mt5.ORDER_TYPE_SELL else tick.ask
-                close_req = {
-                    'action': mt5.TRADE_ACTION_DEAL,
-                    'symbol': SYMBOL,
-                    'volume': pos.volume,
-                    'type': close_type,
-                    'position': pos.ticket,
-                    'price': close_price,
-                    'deviation': 10,
-                    'magic': MAGIC,
-                    'comment': 'CLUSTER_EXIT',
-                    'type_time': mt5.ORDER_TIME_GTC,
-                    'type_filling': mt5.ORDER_FILLING_IOC
-                }
-                mt5.order_send(close_req)
-                logging.warning(f"Cluster exit @ {close_price:.3f} for ticket {pos.ticket}")
-
-        ptime.sleep(1)
+        # Manage all stacked positions in one pass against one quote snapshot
+        quotes.clear()
+        manager.manage(poc)
+        synced = None   # positions may have been closed: resync on the next cycle
 
     shutdown()
 
@@ -1,9 +1,12 @@
-import MetaTrader5 as mt5
+from mt5_wrapper import mt5
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 
+from indicators.volume_profile import profile_from_histogram
+from indicators.profile_index import ProfileIndex
+
 # === MT5 Login === #
 login = 240512732
 password = "Mgi@2005"
@@ -25,49 +28,32 @@ if candles is None or len(candles) == 0:
     mt5.shutdown()
     quit()
 
+# === One tick pull for all candles, indexed per minute === #
+range_start = datetime.fromtimestamp(candles['time'][0])
+range_end = datetime.fromtimestamp(candles['time'][-1]) + timedelta(minutes=1)
+ticks = mt5.copy_ticks_range(symbol, range_start, range_end, mt5.COPY_TICKS_ALL)
+index = ProfileIndex.from_ticks(ticks, price_step=price_step)
+
 # === Create the plot === #
 fig, axs = plt.subplots(num_candles, 1, figsize=(8, num_candles * 2.2), sharex=True)
 if num_candles == 1:
     axs = [axs]
-def calculate_value_area(volume_profile, percentage=0.7):
-    total_volume = volume_profile.sum()
-    sorted_profile = volume_profile.sort_values(ascending=False)
-    
-    cum_volume = 0
-    included_prices = []
-
-    for price, vol in sorted_profile.items():
-        cum_volume += vol
-        included_prices.append(price)
-        if cum_volume >= total_volume * percentage:
-            break
-
-    return min(included_prices), max(included_prices)
-
 # === Loop over each candle === #
 for i, candle in enumerate(candles):
     start_time = datetime.fromtimestamp(candle['time'])
-    end_time = start_time + timedelta(minutes=1)
-    ticks = mt5.copy_ticks_range(symbol, start_time, end_time, mt5.COPY_TICKS_ALL)
-    df = pd.DataFrame(ticks)
+    lo, hist = index.histogram(candle['time'], candle['time'] + 60)
 
-    if df.empty:
+    if hist.size == 0:
         axs[i].set_title(f"No Tick Data @ {start_time.strftime('%H:%M')}")
         continue
 
-    # Price calculation
-    df['price'] = (df['bid'] + df['ask']) / 2
-    if df['volume'].sum() == 0:
-        df['volume'] = 1
-
     # Volume profile
-    df['binned'] = (df['price'] / price_step).round() * price_step
-    vp = df.groupby('binned')['volume'].sum()
-    poc = vp.idxmax()
-    val, vah = calculate_value_area(vp)
+    vp = profile_from_histogram(lo, hist, price_step)
+    poc, val, vah = vp.poc, vp.val, vp.vah
+    nz = np.flatnonzero(hist)
 
     # Plot
-    axs[i].barh(vp.index.astype(str), vp.values, color='gold')
+    axs[i].barh(((lo + nz) * price_step).round(2).astype(str), hist[nz], color='gold')
     axs[i].axhline(y=poc, color='red', linestyle='--', linewidth=1.2, label=f"POC: {poc:.2f}")
     axs[i].axhline(y=vah, color='green', linestyle=':', linewidth=1.2, label=f"VAH: {vah:.2f}")
     axs[i].axhline(y=val, color='blue', linestyle=':', linewidth=1.2, label=f"VAL: {val:.2f}")
@@ -1,45 +1,19 @@
-import MetaTrader5 as mt5
-from datetime import datetime, timedelta
+from mt5_wrapper import mt5
+from datetime import datetime, timezone
 import pandas as pd
-import time
+
+from indicators.rolling_profile import BarVolumeProfile
+from runtime.bar_clock import BarCloseDispatcher
 
 # Connect to MT5
 mt5.initialize(server="Exness-MT5Trial6", login=240512732, password="Mgi@2005")
 symbol = "XAUUSDm"
 lot_size = 0.01
 
-def get_last_candle():
-    rates = mt5.copy_rates_from_pos(symbol, mt5.TIMEFRAME_M1, 1, 2)
-    if rates is not None and len(rates) == 2:
-        return rates[0], rates[1]  # closed, current
-    return None, None
-
 def get_tick_price():
     tick = mt5.symbol_info_tick(symbol)
     return tick.ask if tick else None
 
-def get_volume_profile(start, end):
-    ticks = mt5.copy_ticks_range(symbol, start, end, mt5.COPY_TICKS_ALL)
-    df = pd.DataFrame(ticks)
-    df['price'] = (df['bid'] + df['ask']) / 2
-    if df['volume'].sum() == 0:
-        df['volume'] = 1
-    df['binned'] = (df['price'] / 0.01).round() * 0.01
-    vp = df.groupby('binned')['volume'].sum()
-    return vp
-
-def calculate_value_area(vp, percentage=0.7):
-    total_volume = vp.sum()
-    sorted_profile = vp.sort_values(ascending=False)
-    cum_volume = 0
-    included = []
-    for price, vol in sorted_profile.items():
-        cum_volume += vol
-        included.append(price)
-        if cum_volume >= total_volume * percentage:
-            break
-    return min(included), max(included)
-
 def place_trade():
     price = get_tick_price()
     sl = price - 1.0
@@ -64,30 +38,25 @@ def place_trade():
 # === LIVE MONITOR LOOP === #
 print("Sniper mode ON. Waiting for next POC retest...")
 
+bar_clock = BarCloseDispatcher(symbol)
+bar_profile = BarVolumeProfile(0.01)
+vp, watch_until = None, 0
 while True:
-    closed_candle, _ = get_last_candle()
-    start = datetime.fromtimestamp(closed_candle['time'])
-    end = start + timedelta(minutes=1)
-    
-    vp = get_volume_profile(start, end)
-    if vp.empty:
-        time.sleep(10)
-        continue
-
-    poc = vp.idxmax()
-    val, vah = calculate_value_area(vp)
-
-    print(f"[{start.strftime('%H:%M')}] POC: {poc}, VAH: {vah}, VAL: {val}")
+    ticks = bar_clock.poll()
+    closed = bar_profile.update(ticks)
+    if closed:
+        # new candle: watch the last one's POC for a retest during the first 30 s
+        bar_open, vp = closed[-1]
+        watch_until = (bar_open + 90) * 1000
+        if vp is not None:
+            start = datetime.fromtimestamp(bar_open, tz=timezone.utc)
+            print(f"[{start.strftime('%H:%M')}] POC: {vp.poc}, VAH: {vp.vah}, VAL: {vp.val}")
 
     # Wait for live price to dip into POC range
-    for _ in range(30):  # 30 checks (~30 secs)
-        live_price = get_tick_price()
-        if live_price and (poc - 0.01 <= live_price <= poc + 0.01):
+    if vp is not None and ticks is not None and ticks['time_msc'][-1] <= watch_until:
+        live_price = ticks['ask'][-1]
+        if vp.poc - 0.01 <= live_price <= vp.poc + 0.01:
             print("🔥 Retest detected. Sending BUY.")
             place_trade()
-            break
-        time.sleep(1)
-
-    # Wait for next minute
-    print("Waiting for next candle...")
-    time.sleep(30)
+            vp = None
+    bar_clock.wait()